@@ -0,0 +1,204 @@
+"""Pages with the markup of the site, rendered from a seeded library.
+
+The templates are the parts of the recorded pages the parsers read, with
+the surrounding markup cut down, so the pages stay the same between runs
+and commits.
+"""
+import hashlib
+import random
+from dataclasses import dataclass
+from functools import lru_cache
+
+LISTS = ('reading', 'pending', 'follow', 'wish', 'completed')
+LANGS = ('es', 'mx', 'ar', 'pe')
+
+LOGIN_PAGE = '''<!DOCTYPE html>
+<html lang="es"><head><title>Iniciar sesión</title></head>
+<body><div id="app"><section><main><div class="container">
+<form method="POST" action="{base_url}/login">
+<input type="hidden" name="_token" value="{token}">
+<input type="email" name="email"><input type="password" name="password">
+<input type="checkbox" name="remember"><button type="submit">Ingresar</button>
+</form></div></main></section></div></body></html>'''
+
+GROUPS_PAGE = '''<!DOCTYPE html>
+<html lang="es"><head><title>Mis listas</title></head>
+<body><div id="app"><section><header>
+<section class="element-header-bar"><div class="container"><div class="row">
+<div class="col-12 text-center">{links}</div>
+</div></div></section></header>
+<main><div class="container"><p>Listas</p></div></main></section></div>
+</body></html>'''
+
+GROUP_LINK = '''<a class="btn btn-light" href="{base_url}/profile/groups/{name}?page=1">
+<small> {name} </small></a>'''
+
+LIST_PAGE = '''<!DOCTYPE html>
+<html lang="es"><head><title>{name}</title></head>
+<body><div id="app"><section><main><div class="container"><div class="row">
+<div class="col-12 col-lg-8"><div class="row">{books}</div>
+<div class="row"><nav><ul class="pagination">{links}</ul>{next_link}</nav></div>
+</div><div class="col-12 col-lg-4"><aside>Populares</aside></div>
+</div></div></main></section></div></body></html>'''
+
+LIST_BOOK = '''<a href=" {base_url}/library/manga/{book_id}/{slug} ">
+<div class="element"><style>.book-thumbnail-{book_id}::before {{
+background-image: url('{base_url}/uploads/{book_id}.jpg'); }}</style>
+<div class="thumbnail book book-thumbnail-{book_id}">
+<div class="thumbnail-title"><h4 class="text-truncate" title=" {title} ">
+{title}</h4></div><span class="book-type badge">MANGA</span>
+</div></div></a>'''
+
+PAGE_LINK = '''<li class="page-item"><a class="relative page-link"
+href="{base_url}/profile/groups/{name}?page={page}">{page}</a></li>'''
+
+NEXT_LINK = '''<a class="relative inline-flex" rel="next"
+href="{base_url}/profile/groups/{name}?page={page}">Siguiente</a>'''
+
+BOOK_PAGE = '''<!DOCTYPE html>
+<html lang="es"><head><title>{title}</title>
+<meta name="csrf-token" content="{token}"></head>
+<body><div id="app"><section><header><h1 class="element-title">{title}</h1>
+</header><main class="container"><div class="row"><div class="col-12">
+<div id="chapters"><ul class="list-group list-group-flush">{chapters}</ul>
+<div id="chapters-collapsed" class="collapse">{collapsed}</div></div>
+</div></div></main><footer class="footer">Ads {token}</footer></section>
+</div></body></html>'''
+
+CHAPTER = '''<li class="list-group-item p-0 bg-light upload-link">
+<h4 class="px-2 py-3 m-0"><div class="row"><div class="col-10 text-truncate">
+<a class="btn-collapse" role="button">Capítulo {number}.00</a></div>
+<div class="col-2 text-right"><span class="chapter-viewed-icon{viewed}"
+data-chapter="{chapter_id}"></span></div></div></h4>
+<div class="chapter-list-element"><div class="collapse show">
+<ul class="list-group list-group-flush chapter-list">{options}</ul>
+</div></div></li>'''
+
+OPTION = '''<li class="list-group-item"><div class="row">
+<div class="col-4 col-md-6 text-truncate"><span>{groups}</span></div>
+<div class="col-4 col-md-2 text-center"><span class="badge badge-primary p-2">
+{date}</span></div>
+<div class="col-2 col-md-1 text-center"><i class="flag-icon flag-icon-{lang}"></i></div>
+<div class="col-2 col-md-1"></div><div class="col-md-1 d-none d-md-block"></div>
+<div class="col-2 col-sm-1 text-right"><a href="{base_url}/view_uploads/{upload_id}"
+class="btn btn-default btn-sm"><span class="fa fa-play fa-2x"></span></a></div>
+</div></li>'''
+
+GROUP = '<a href="{base_url}/groups/{group_id}/scan-{group_id}">Scan {group_id}</a>'
+
+
+@dataclass(frozen=True)
+class Library:
+    """Sizes of the library behind the pages."""
+
+    base_url: str
+    lists: int = 2
+    pages: int = 3
+    books: int = 10
+    chapters: int = 200
+    large_chapters: int = 2000
+    seed: int = 0
+
+    def book_ids(self, name: str, page: int) -> list[str]:
+        list_index = LISTS.index(name)
+        return [
+            f'{list_index}{page:03d}{index:03d}'
+            for index in range(self.books)
+        ]
+
+    @property
+    def book_count(self) -> int:
+        return self.lists * self.pages * self.books
+
+
+def token(*keys) -> str:
+    return hashlib.sha1(repr(keys).encode()).hexdigest()
+
+
+def login_page(library: Library) -> str:
+    return LOGIN_PAGE.format(
+        base_url=library.base_url,
+        token=token('login', library.seed),
+    )
+
+
+def groups_page(library: Library) -> str:
+    return GROUPS_PAGE.format(links=''.join(
+        GROUP_LINK.format(base_url=library.base_url, name=name)
+        for name in LISTS[:library.lists]
+    ))
+
+
+def list_page(library: Library, name: str, page: int) -> str:
+    if name not in LISTS[:library.lists] or not 1 <= page <= library.pages:
+        page_books = []
+    else:
+        page_books = library.book_ids(name, page)
+
+    next_link = ''
+    if page < library.pages:
+        next_link = NEXT_LINK.format(
+            base_url=library.base_url,
+            name=name,
+            page=page + 1,
+        )
+
+    return LIST_PAGE.format(
+        name=name,
+        books=''.join(
+            LIST_BOOK.format(
+                base_url=library.base_url,
+                book_id=book_id,
+                slug=f'book-{book_id}',
+                title=f'Book {book_id}',
+            )
+            for book_id in page_books
+        ),
+        links=''.join(
+            PAGE_LINK.format(base_url=library.base_url, name=name, page=page)
+            for page in range(1, library.pages + 1)
+        ),
+        next_link=next_link,
+    )
+
+
+def chapter_item(library: Library, rng: random.Random, number: int) -> str:
+    options = []
+    for _ in range(rng.choice((1, 1, 2, 3))):
+        options.append(OPTION.format(
+            base_url=library.base_url,
+            groups=' '.join(
+                GROUP.format(
+                    base_url=library.base_url,
+                    group_id=rng.randrange(300),
+                )
+                for _ in range(rng.choice((1, 1, 1, 2)))
+            ),
+            date=f'20{rng.randrange(15, 24)}-{rng.randrange(1, 13):02d}'
+                 f'-{rng.randrange(1, 29):02d}',
+            lang=rng.choice(LANGS),
+            upload_id=rng.randrange(10 ** 7),
+        ))
+
+    return CHAPTER.format(
+        number=number,
+        viewed=' viewed' if rng.random() < 0.4 else '',
+        chapter_id=rng.randrange(10 ** 7),
+        options=''.join(options),
+    )
+
+
+@lru_cache(maxsize=None)
+def book_page(library: Library, book_id: str) -> str:
+    rng = random.Random(f'{library.seed}:{book_id}')
+    count = library.large_chapters if book_id == 'large' else library.chapters
+    chapters = [
+        chapter_item(library, rng, number)
+        for number in range(count, 0, -1)
+    ]
+    return BOOK_PAGE.format(
+        title=f'Book {book_id}',
+        token=token('book', library.seed, book_id),
+        chapters=''.join(chapters[:5]),
+        collapsed=''.join(chapters[5:]),
+    )
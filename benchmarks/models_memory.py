@@ -0,0 +1,112 @@
+"""Compare the memory of a scraped library in the old and new models.
+
+Run from the project root with `python -m benchmarks.models_memory`.
+"""
+import argparse
+import random
+import tracemalloc
+from dataclasses import dataclass, field
+
+from src.utils import manager
+
+
+@dataclass
+class LegacyGroup:
+    title: str
+    url: str
+
+
+@dataclass
+class LegacyOption:
+    groups: list[LegacyGroup]
+    date: str
+    lang: str
+    chapter_url: str
+
+
+@dataclass
+class LegacyChapter:
+    title: str
+    viewed: bool
+    options: list[LegacyOption]
+
+
+@dataclass
+class LegacyBook:
+    title: str
+    url: str
+    image: str
+    chapters: list[LegacyChapter] = field(default_factory=list)
+
+
+LEGACY = (LegacyBook, LegacyChapter, LegacyOption, LegacyGroup)
+COMPACT = (manager.Book, manager.Chapter, manager.Option, manager.Group)
+
+
+def scraped_rows(books: int, chapters: int, seed: int = 0):
+    """Build the rows of a generated library."""
+    rng = random.Random(seed)
+    rows = []
+    for book in range(books):
+        rows.append((f'Book {book}', f'/library/manga/{book}', []))
+        for number in range(chapters, 0, -1):
+            options = []
+            for upload in range(rng.randint(1, 3)):
+                group = rng.randrange(200)
+                day = rng.randrange(28) + 1
+                options.append((
+                    [(f'Group {group}', f'/groups/{group}/scan')],
+                    f'2023-{rng.randrange(12) + 1:02d}-{day:02d}',
+                    rng.choice(('es', 'mx')),
+                    f'/view_uploads/{book}{number}{upload}',
+                ))
+            rows[-1][2].append((f'Capítulo {number}.00', False, options))
+    return rows
+
+
+def build(models, rows) -> list:
+    # Joining copies the strings, like a parser reading them from html.
+    Book, Chapter, Option, Group = models
+    return [
+        Book(title, url, f'{url}.jpg', chapters=[
+            Chapter(chapter_title, viewed, [
+                Option(
+                    [Group(''.join(name), ''.join(href))
+                     for name, href in groups],
+                    ''.join(date),
+                    ''.join(lang),
+                    chapter_url,
+                )
+                for groups, date, lang, chapter_url in options
+            ])
+            for chapter_title, viewed, options in chapters
+        ])
+        for title, url, chapters in rows
+    ]
+
+
+def measure(models, rows) -> int:
+    manager.interned_groups.clear()
+    manager.parse_date.cache_clear()
+    tracemalloc.start()
+    books = build(models, rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del books
+    return size
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=200)
+    parser.add_argument('--chapters', type=int, default=100)
+    args = parser.parse_args()
+
+    rows = scraped_rows(args.books, args.chapters)
+    legacy = measure(LEGACY, rows)
+    compact = measure(COMPACT, rows)
+
+    print(f'{args.books} books of {args.chapters} chapters')
+    print(f'legacy models:  {legacy / 2 ** 20:.1f} MiB')
+    print(f'compact models: {compact / 2 ** 20:.1f} MiB')
+    print(f'saved: {1 - compact / legacy:.0%}')
@@ -0,0 +1,236 @@
+"""Benchmark the scraping hot paths of Manager against the fixture server.
+
+Run from the project root with `python -m benchmarks.run`. The results
+are saved as JSON, named by the current commit, and `--compare` prints
+the change from an earlier result file.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from os.path import dirname, join
+
+from httpx import Client
+
+from benchmarks import fixtures
+from benchmarks.server import FixtureServer
+from src.utils import manager as scraper
+from src.utils.parsers import PARSERS, load_parser
+from src.utils.tracing import MemorySink, instrument_client, tracer
+
+RESULTS_DIRECTORY = join(dirname(__file__), 'results')
+METRICS = ('wall', 'cpu', 'peak_memory', 'requests')
+
+
+def no_wait(low: float, high: float):
+    pass
+
+
+class RequestCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, request):
+        self.count += 1
+
+
+def get_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = 'unknown'
+    return commit
+
+
+def get_cases(server: FixtureServer) -> dict:
+    library = server.library
+    list_url = f'{library.base_url}/profile/groups/{fixtures.LISTS[0]}?page=1'
+    book_url = f'{library.base_url}/library/manga/large/book-large'
+
+    return {
+        'get_url_state': lambda manager: manager.get_url_state(),
+        'get_iter_books_from_list': lambda manager: list(
+            manager.get_iter_books_from_list(list_url)
+        ),
+        'get_chapters_from_url': lambda manager: (
+            manager.get_chapters_from_url(book_url)
+        ),
+        'get_all_books': lambda manager: manager.get_all_books(),
+    }
+
+
+def measure(run, counter: RequestCounter, repeat: int) -> dict:
+    """Run a case `repeat` times for the timings, then once traced."""
+    walls, cpus = [], []
+    for _ in range(repeat):
+        counter.count = 0
+        wall, cpu = time.perf_counter(), time.process_time()
+        run()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    requests = counter.count
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'wall': statistics.median(walls),
+        'wall_min': min(walls),
+        'cpu': statistics.median(cpus),
+        'peak_memory': peak,
+        'requests': requests,
+    }
+
+
+def run_benchmarks(server: FixtureServer, parser: str, repeat: int) -> dict:
+    counter = RequestCounter()
+    sink = tracer.add_sink(MemorySink(maxlen=1))
+    results = {}
+
+    with Client(
+        base_url=server.base_url,
+        timeout=30,
+        event_hooks={'request': [counter]},
+    ) as client:
+        instrument_client(client)
+        manager = scraper.Manager(client, parser=load_parser(parser))
+        manager.login('reader@example.com', 'password')
+
+        for name, case in get_cases(server).items():
+            sink.clear()
+            results[name] = measure(lambda: case(manager), counter, repeat)
+            # Where the time of one run goes: requests, parsing, waits.
+            results[name]['spans'] = {
+                kind: total['seconds'] / (repeat + 1)
+                for kind, total in sink.summary().items()
+            }
+            print(
+                f'{parser:>5} {name:<25}'
+                f' wall {results[name]["wall"] * 1000:9.1f} ms'
+                f' cpu {results[name]["cpu"] * 1000:9.1f} ms'
+                f' peak {results[name]["peak_memory"] / 2 ** 20:7.1f} MiB'
+                f' requests {results[name]["requests"]:5d}'
+            )
+
+    tracer.remove_sink(sink)
+    return results
+
+
+def check_parity(server: FixtureServer, parsers: list[str]) -> dict:
+    """Compare what every parser gets from the same pages."""
+    library = server.library
+    pages = {
+        'csrf_token': fixtures.login_page(library),
+        'url_state': fixtures.groups_page(library),
+        'books': fixtures.list_page(library, fixtures.LISTS[0], 1),
+        'chapters': fixtures.book_page(library, 'large'),
+    }
+    loaded = {name: load_parser(name) for name in parsers}
+    parity = {}
+
+    for method, text in pages.items():
+        results = [
+            getattr(parser, method)(text) for parser in loaded.values()
+        ]
+        parity[method] = all(result == results[0] for result in results)
+        if not parity[method]:
+            print(f'parsers disagree on {method}', file=sys.stderr)
+
+    return parity
+
+
+def available_parsers() -> list[str]:
+    parsers = []
+    for name in PARSERS:
+        try:
+            load_parser(name)
+        except ImportError:
+            continue
+        parsers.append(name)
+    return parsers
+
+
+def compare(baseline: dict, results: dict):
+    for parser, cases in results['parsers'].items():
+        for name, metrics in cases.items():
+            old = baseline.get('parsers', {}).get(parser, {}).get(name)
+            if not old:
+                continue
+            changes = ' '.join(
+                f'{metric} {(metrics[metric] / old[metric] - 1) * 100:+6.1f}%'
+                for metric in METRICS
+                if old.get(metric)
+            )
+            print(f'{parser:>5} {name:<25} {changes}')
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--parser', action='append', choices=list(PARSERS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--lists', type=int, default=2)
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--books', type=int, default=10)
+    parser.add_argument('--chapters', type=int, default=200)
+    parser.add_argument('--large-chapters', type=int, default=2000)
+    parser.add_argument('--output', help='defaults to results/<commit>.json')
+    parser.add_argument('--compare', help='result file to compare with')
+    args = parser.parse_args(argv)
+
+    parsers = args.parser or available_parsers()
+    sizes = {
+        'lists': args.lists,
+        'pages': args.pages,
+        'books': args.books,
+        'chapters': args.chapters,
+        'large_chapters': args.large_chapters,
+    }
+    commit = get_commit()
+
+    # The random waits are there for the real site, not for timing.
+    scraper.random_wait = no_wait
+
+    with FixtureServer(**sizes) as server:
+        parity = check_parity(server, parsers)
+        results = {
+            'commit': commit,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': sizes,
+            'repeat': args.repeat,
+            'parity': parity,
+            'parsers': {
+                name: run_benchmarks(server, name, args.repeat)
+                for name in parsers
+            },
+        }
+
+    output = args.output or join(RESULTS_DIRECTORY, f'{commit}.json')
+    os.makedirs(dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'Saved {output}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(json.load(file), results)
+
+    if not all(parity.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
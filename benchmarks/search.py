@@ -0,0 +1,102 @@
+"""Time the library search while typing, with the full-text index and
+with the scans it replaces.
+
+Run from the project root with `python -m benchmarks.search`. The times
+depend on the machine and the SQLite build, compare the two columns of
+one run rather than the numbers of different machines.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from os.path import join
+
+WORDS = (
+    'solanin', 'noche', 'dragon', 'espada', 'academia', 'mágica', 'reino',
+    'última', 'ciudad', 'sombra', 'corazón', 'guerrero', 'leyenda', 'mar',
+    'luna', 'héroe', 'torre', 'fuego', 'invierno', 'escuela', 'bestia',
+)
+
+QUERIES = (
+    'c', 'ca', 'cap', 'capi', 'capitulo 1',
+    's', 'so', 'sol', 'sola', 'solan', 'solanin',
+    'solamin', 'guerero',
+    'reino 12',
+    'ninguno',
+)
+
+
+def library(books: int, chapters: int, seed: int = 0):
+    from src.utils import manager
+
+    rng = random.Random(seed)
+    for number in range(books):
+        title = ' '.join(rng.sample(WORDS, 3)).title()
+        yield manager.Book(
+            title,
+            f'/library/manga/{number}/x',
+            '',
+            rng.choice(('Leyendo', 'Pendiente', 'Favorito')),
+            [
+                manager.Chapter(
+                    f'Capítulo {chapter}.00',
+                    False,
+                    [manager.Option(
+                        [manager.Group(
+                            f'{rng.choice(WORDS)} scan',
+                            f'/groups/{rng.randrange(300)}',
+                        )],
+                        '2023-01-01',
+                        'es',
+                        f'/view_uploads/{number}-{chapter}',
+                    )],
+                )
+                for chapter in range(chapters, 0, -1)
+            ],
+        )
+
+
+def median_ms(function, *args, repeat: int = 7) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=200)
+    parser.add_argument('--chapters', type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
+    os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+    from src.common.database import database
+
+    with tempfile.TemporaryDirectory() as directory:
+        database.init(join(directory, 'search.db'), pragmas=database._pragmas)
+
+        from src.books import models, search
+
+        models.create_tables()
+        start = time.perf_counter()
+        models.save_books(list(library(args.books, args.chapters)))
+        print(f'{args.books * args.chapters} chapters saved and indexed '
+              f'in {time.perf_counter() - start:.1f} s')
+
+        # The scan matches the titles as written, without the accents
+        # folded, the groups or the typos: its results are shown too.
+        print(f'{"query":>12}  {"index":>9}  {"scan":>9}  results')
+        for query in QUERIES:
+            words = models.search_text(query).split()
+            indexed = median_ms(search.search, query)
+            scan = median_ms(search.like_rows, words, 50)
+            print(f'{query:>12}  {indexed:6.2f} ms  {scan:6.2f} ms  '
+                  f'{len(search.search(query)):>3} '
+                  f'{len(search.like_rows(words, 50)):>3}')
+
+        database.close()
@@ -0,0 +1,142 @@
+"""Local stand-in for the site, serving the fixture pages.
+
+The server runs in its own process so its work is not counted in the
+cpu time and allocations of the benchmarks.
+"""
+import multiprocessing
+import socket
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks import fixtures
+
+SESSION_COOKIE = 'tmo_session=benchmark; Path=/; HttpOnly'
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    library: fixtures.Library
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+
+        if url.path == '/login':
+            self.send_page(fixtures.login_page(self.library))
+        elif url.path == '/profile/groups':
+            self.send_page(fixtures.groups_page(self.library))
+        elif parts[:2] == ['profile', 'groups'] and len(parts) == 3:
+            page = int(query.get('page', ['1'])[0])
+            self.send_page(fixtures.list_page(self.library, parts[2], page))
+        elif parts[:2] == ['library', 'manga'] and len(parts) >= 3:
+            self.send_book(parts[2])
+        elif url.path == '/':
+            self.send_page('<html><body>home</body></html>')
+        else:
+            self.send_page('<html><body>not found</body></html>', 404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.send_response(302)
+        self.send_header('Location', '/')
+        self.send_header('Set-Cookie', SESSION_COOKIE)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def send_book(self, book_id: str):
+        etag = f'"{fixtures.token("etag", self.library.seed, book_id)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_page(
+            fixtures.book_page(self.library, book_id),
+            headers={'ETag': etag},
+        )
+
+    def send_page(self, text: str, status: int = 200, headers: dict = None):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(library: fixtures.Library, port: int, ready):
+    handler = type(
+        'LibraryHandler',
+        (FixtureHandler,),
+        {'library': library},
+    )
+    with ThreadingHTTPServer(('127.0.0.1', port), handler) as server:
+        ready.send(server.server_address[1])
+        server.serve_forever()
+
+
+class FixtureServer:
+    """Serve a library from a child process while in the `with` block."""
+
+    def __init__(self, port: int = 0, **sizes):
+        self.port = port
+        self.sizes = sizes
+        self.library: fixtures.Library | None = None
+        self.__process = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        receiver, sender = context.Pipe(duplex=False)
+
+        if not self.port:
+            # The pages link to the server, so the port must be known
+            # before they are rendered.
+            with socket.socket() as sock:
+                sock.bind(('127.0.0.1', 0))
+                self.port = sock.getsockname()[1]
+
+        self.library = fixtures.Library(self.base_url, **self.sizes)
+        self.__process = context.Process(
+            target=serve,
+            args=(self.library, self.port, sender),
+            daemon=True,
+        )
+        self.__process.start()
+        receiver.recv()
+        return self
+
+    def stop(self):
+        if self.__process is not None:
+            self.__process.terminate()
+            self.__process.join()
+            self.__process = None
+
+    def wait(self):
+        self.__process.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == '__main__':
+    with FixtureServer(port=8765) as server:
+        print(f'Serving the fixtures on {server.base_url}')
+        try:
+            server.wait()
+        except KeyboardInterrupt:
+            pass
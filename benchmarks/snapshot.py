@@ -0,0 +1,63 @@
+"""Time the export and the import of a library snapshot, with the peak
+memory of each. The second import replaces the books of the first.
+
+Run from the project root with `python -m benchmarks.snapshot`. The rates
+depend on the machine and its disk, the import most of all.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from os.path import getsize, join
+
+
+def measure(function, *args) -> tuple[float, int]:
+    """Time a run, then trace the memory of another one, tracing slows
+    the allocations down."""
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=200)
+    parser.add_argument('--chapters', type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
+    os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+    from src.common.database import database
+
+    from benchmarks.search import library
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = join(directory, 'library.jsonl.gz')
+        chapters = args.books * args.chapters
+
+        database.init(join(directory, 'source.db'), pragmas=database._pragmas)
+        from src.books import models, snapshot
+
+        models.create_tables()
+        models.save_books(list(library(args.books, args.chapters)))
+
+        seconds, peak = measure(snapshot.export_library, path)
+        print(f'export: {chapters / seconds:,.0f} chapters/s, '
+              f'{getsize(path) / 1024:,.0f} KiB, '
+              f'peak {peak / 1024 / 1024:.1f} MiB')
+        database.close()
+
+        database.init(join(directory, 'target.db'), pragmas=database._pragmas)
+        models.create_tables()
+
+        seconds, peak = measure(snapshot.import_library, path)
+        print(f'import: {chapters / seconds:,.0f} chapters/s, '
+              f'peak {peak / 1024 / 1024:.1f} MiB')
+        database.close()
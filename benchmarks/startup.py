@@ -0,0 +1,65 @@
+"""Time the import of the app in fresh interpreters, the part of the
+cold start before Kivy opens the window.
+
+Run from the project root with `python -m benchmarks.startup`. On a
+device, the time to the first frame is logged by the app at startup.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+SCRIPT = '''
+import time
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start)
+'''
+
+
+def import_time() -> float:
+    env = {**os.environ, 'KIVY_NO_ARGS': '1', 'KIVY_NO_CONSOLELOG': '1'}
+    output = subprocess.run(
+        [sys.executable, '-c', SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    ).stdout
+    return float(output.split()[-1])
+
+
+def slowest_imports(count: int) -> list[tuple[int, str]]:
+    """Get the modules of the app taking the longest to import, in us."""
+    env = {**os.environ, 'KIVY_NO_ARGS': '1', 'KIVY_NO_CONSOLELOG': '1'}
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    ).stderr
+
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        if '.' not in name or name.startswith('src.'):
+            imports.append((int(cumulative), name))
+    return sorted(imports, reverse=True)[:count]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    times = [import_time() for _ in range(args.repeat)]
+    print(f'import main: {statistics.median(times) * 1000:.0f} ms median, '
+          f'{min(times) * 1000:.0f} ms min')
+    for cumulative, name in slowest_imports(args.top):
+        print(f'{cumulative / 1000:8.1f} ms  {name}')
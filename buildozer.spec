@@ -37,7 +37,7 @@ version = 0.1
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,kivy,sqlite3,httpx,beautifulsoup4,peewee,faker,plyer,sniffio,httpcore,h11,python-dateutil,soupsieve
+requirements = python3,kivy,sqlite3,httpx,beautifulsoup4,lxml,pillow,peewee,faker,plyer,sniffio,httpcore,h11,h2,hpack,hyperframe,python-dateutil,soupsieve
 
 # (str) Custom source folders for requirements
 # Sets custom source for any requirements with recipes
@@ -55,6 +55,9 @@ orientation = portrait
 
 # (list) List of service to declare
 #services = NAME:ENTRYPOINT_TO_PY,NAME2:ENTRYPOINT2_TO_PY
+# Foreground, a background service is stopped by Android 8+ soon after
+# the app leaves the screen, before the next sync of its loop.
+services = Manga:service.py:foreground
 
 #
 # OSX Specific
@@ -95,7 +98,7 @@ fullscreen = 0
 
 # (list) Permissions
 # (See https://python-for-android.readthedocs.io/en/latest/buildoptions/#build-options-1 for all the supported syntaxes and properties)
-android.permissions = android.permission.INTERNET,android.permission.VIBRATE,android.permission.ACCESS_WIFI_STATE,android.permission.CHANGE_WIFI_STATE,android.permission.CHANGE_NETWORK_STATE
+android.permissions = android.permission.INTERNET,android.permission.VIBRATE,android.permission.ACCESS_WIFI_STATE,android.permission.CHANGE_WIFI_STATE,android.permission.CHANGE_NETWORK_STATE,android.permission.ACCESS_NETWORK_STATE,android.permission.FOREGROUND_SERVICE,android.permission.POST_NOTIFICATIONS
 
 # (list) features (adds uses-feature -tags to manifest)
 #android.features = android.hardware.usb.host
@@ -1,27 +1,172 @@
-import httpx
+# First, to time the startup from the earliest point of the app.
+from src.utils.startup import process_uptime, since_main
+
+import sys
+import time
+from functools import cached_property
+from os.path import join
+
 from kivy.app import App
+from kivy.clock import Clock
+from kivy.logger import Logger
 
-from src.auth.screens import *
-from src.books.screens import *
-from src.utils.manager import Manager
+from src.auth.models import User
+from src.books.models import create_tables
+from src.common.screens import LazyScreenManager
+from src.common.storage import storage
+from src.utils.path import app_storage_path
+from src.utils.services import start_service
+from src.utils.tracing import MemorySink, Span, tracer
+
+KEY_F12 = 293
+# Viewed states set within this many seconds are sent together.
+VIEWED_DELAY = 5
 
 
 class BrowserApp(App):
+    """The http client, the caches and the screens are built when first
+    used, so the first frame waits only for what it shows."""
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.client_manager = Manager(
-            httpx.Client(
-                base_url='https://visortmo.com',
+        self.trace_sink = tracer.add_sink(MemorySink())
+        self.send_viewed_later = Clock.create_trigger(
+            self.send_viewed,
+            VIEWED_DELAY,
+        )
+
+    @cached_property
+    def session(self):
+        from src.auth.session import Session
+
+        return Session('https://visortmo.com')
+
+    @property
+    def client_manager(self):
+        return self.session.manager
+
+    @cached_property
+    def worker(self):
+        from src.utils.executor import Worker
+
+        return Worker()
+
+    @cached_property
+    def covers(self):
+        from src.utils.covers import CoverCache
+
+        return CoverCache(
+            self.session.client,
+            self.worker,
+            join(app_storage_path(), 'covers'),
+        )
+
+    @cached_property
+    def downloads(self):
+        from src.books.downloads import ChapterDownloads
+        from src.utils.downloads import Downloader
+
+        return ChapterDownloads(
+            self.client_manager,
+            Downloader(self.session.client),
+            join(app_storage_path(), 'downloads'),
+        )
+
+    def build(self):
+        create_tables()
+        return super().build()
+
+    def on_start(self):
+        from kivy.core.window import Window
+
+        Window.bind(on_keyboard=self.on_keyboard)
+        # Android's onLowMemory, through SDL.
+        Window.bind(on_memorywarning=self.on_memorywarning)
+        Window.fbind('on_flip', self.on_first_frame)
+        if User.exists():
+            start_service()
+            # The ones a closed app could not send.
+            self.send_viewed_later()
+
+    def on_first_frame(self, window):
+        window.funbind('on_flip', self.on_first_frame)
+
+        main_seconds = since_main()
+        process_seconds = process_uptime()
+        duration = process_seconds or main_seconds
+        tracer.emit(Span(
+            'first_frame',
+            'startup',
+            time.time() - duration,
+            duration,
+            {'since_main': main_seconds},
+        ))
+        Logger.info(
+            'Startup: first frame %.0f ms after main, %s after launch',
+            main_seconds * 1000,
+            f'{process_seconds * 1000:.0f} ms'
+            if process_seconds is not None else 'unknown',
+        )
+
+    def send_viewed(self, *args):
+        """Send the viewed states queued in the app to the site."""
+        from src.books.viewed import flush_viewed, pending_count
+
+        if not pending_count():
+            return
+        self.worker.submit(
+            flush_viewed,
+            self.client_manager,
+            key='send_viewed',
+            on_error=lambda error: Logger.warning(
+                'Viewed states kept queued: %s', error,
             ),
         )
 
+    def on_keyboard(self, window, key, *args):
+        if key == KEY_F12:
+            self.toggle_trace()
+            return True
+        return False
+
+    def toggle_trace(self):
+        """Show the trace screen over the current one, or close it."""
+        screen_manager = self.root
+        if screen_manager.current == 'trace':
+            screen_manager.get_screen('trace').close()
+        else:
+            screen_manager.get_screen('trace').previous = screen_manager.current
+            screen_manager.current = 'trace'
+
+    def save_cookies(self):
+        if 'session' in self.__dict__:
+            self.session.save_cookies()
+
+    def on_stop(self):
+        storage.flush()
+        self.save_cookies()
+        # Only what was used was built.
+        if 'worker' in self.__dict__:
+            self.worker.shutdown()
+        if 'downloads' in self.__dict__:
+            self.downloads.shutdown()
+
     def on_pause(self):
+        # The app may be killed while paused, without on_stop.
+        storage.flush()
+        self.save_cookies()
         for screen in self.root.screens:
             if hasattr(screen, 'on_pause'):
                 if not screen.on_pause():
                     return False
         return True
 
+    def on_memorywarning(self, window):
+        # The WebView classes are only loaded once a page was opened.
+        webview = sys.modules.get('src.utils.webview')
+        if webview is not None:
+            webview.clear_pool()
+
     def on_resume(self):
         for screen in self.root.screens:
             if hasattr(screen, 'on_resume'):
@@ -22,13 +22,16 @@ class User:
 
     @classmethod
     def load(cls) -> 'User':
-        email = storage.get('user')['email']
+        email = storage.get('email')['email']
         password = keystore.get_key('manga.app.read', 'password')
         return cls(email, password)
 
     def save(self):
         storage.put('email', email=self.email)
         keystore.set_key('manga.app.read', 'password', self.password)
+        # The sync service, started next, reads them from the database.
+        storage.flush()
 
     def delete(self):
         storage.delete('email')
+        storage.flush()
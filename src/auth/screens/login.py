@@ -1,9 +1,11 @@
 from kivy.app import App
+from kivy.logger import Logger
 from kivy.properties import NumericProperty
 from kivy.uix.screenmanager import Screen
 from kivy.uix.textinput import TextInput
 
 from src.auth.models import User
+from src.utils.services import start_service
 
 
 class TextInputValidation(TextInput):
@@ -14,20 +16,43 @@ class TextInputValidation(TextInput):
             substring = ""
         super().insert_text(substring, from_undo)
 
-from kivy.clock import Clock
+
 class LoginScreen(Screen):
     def on_pre_enter(self, *args):
         if User.exists():
-            Clock.schedule_once(self.go_to_book_list)
+            app = App.get_running_app()
+            app.worker.submit(
+                app.session.ensure_login,
+                User.load(),
+                key='login',
+                owner=self,
+                on_result=self.go_to_book_list,
+                on_error=self.on_login_error,
+            )
 
     def go_to_book_list(self, *args):
         self.manager.current = 'book_list'
 
+    def on_leave(self, *args):
+        App.get_running_app().worker.cancel(self)
+
     def login(self, email, password, remember):
-        App.get_running_app().client_manager.login(
+        app = App.get_running_app()
+        app.worker.submit(
+            app.session.login,
             email=email,
             password=password,
             remember=remember,
+            key='login',
+            owner=self,
+            on_result=lambda response: self.on_login(email, password, remember),
+            on_error=self.on_login_error,
         )
+
+    def on_login(self, email, password, remember):
         User(email, password, remember).save()
+        start_service()
         self.manager.current = 'book_list'
+
+    def on_login_error(self, error):
+        Logger.error(f'LoginScreen: login failed: {error}')
@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+from http.cookiejar import Cookie
+from os.path import exists, join
+
+import httpx
+
+from src.auth.models import User
+from src.utils.manager import Manager
+from src.utils.path import app_storage_path
+from src.utils.resilience import AuthError
+from src.utils.tracing import instrument_client
+
+COOKIE_FIELDS = (
+    'name',
+    'value',
+    'domain',
+    'path',
+    'secure',
+    'expires',
+)
+# Laravel sets its cookies on every response, they are written at most
+# this often.
+SAVE_INTERVAL = 30.0
+
+
+def has_http2() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def cookie_to_dict(cookie: Cookie) -> dict:
+    return {field: getattr(cookie, field) for field in COOKIE_FIELDS}
+
+
+def cookie_from_dict(data: dict) -> Cookie:
+    domain = data['domain']
+    return Cookie(
+        version=0,
+        name=data['name'],
+        value=data['value'],
+        port=None,
+        port_specified=False,
+        domain=domain,
+        domain_specified=bool(domain),
+        domain_initial_dot=domain.startswith('.'),
+        path=data['path'],
+        path_specified=True,
+        secure=data['secure'],
+        expires=data['expires'],
+        discard=data['expires'] is None,
+        comment=None,
+        comment_url=None,
+        rest={},
+    )
+
+
+def is_expired(cookie: Cookie, now: float = None) -> bool:
+    return cookie.is_expired(now or time.time())
+
+
+def is_login_cookie(cookie: Cookie) -> bool:
+    # Laravel sets a session cookie for guests too, only the "remember
+    # me" cookie proves a login.
+    return cookie.name.startswith('remember_web_')
+
+
+class Session:
+    """Keep one pooled client and its login cookies across launches."""
+
+    def __init__(self, base_url: str, path: str = None):
+        self.path = path or join(app_storage_path(), 'cookies.json')
+        self.client = httpx.Client(
+            base_url=base_url,
+            http2=has_http2(),
+            limits=httpx.Limits(
+                max_connections=8,
+                max_keepalive_connections=4,
+                keepalive_expiry=120,
+            ),
+            timeout=30,
+        )
+        instrument_client(self.client)
+        self.client.event_hooks['response'].append(self.on_response)
+        self.manager = Manager(self.client)
+        self.manager.relogin = self.relogin
+        self.user: User | None = None
+        self.__lock = threading.Lock()
+        self.__saved_at = 0.0
+        self.load_cookies()
+
+    def load_cookies(self):
+        if not exists(self.path):
+            return
+
+        with open(self.path) as file:
+            try:
+                cookies = json.load(file)
+            except ValueError:
+                return
+
+        now = time.time()
+        for data in cookies:
+            cookie = cookie_from_dict(data)
+            if not is_expired(cookie, now):
+                self.client.cookies.jar.set_cookie(cookie)
+
+    def save_cookies(self):
+        with self.__lock:
+            cookies = [
+                cookie_to_dict(cookie)
+                for cookie in self.client.cookies.jar
+                if not is_expired(cookie)
+            ]
+
+            # The app and the service write the same file.
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as file:
+                json.dump(cookies, file)
+            os.replace(tmp_path, self.path)
+            self.__saved_at = time.monotonic()
+
+    def on_response(self, response: httpx.Response):
+        """Keep the cookies the site rotates, a relaunch needs the last
+        session cookie."""
+        if 'set-cookie' not in response.headers:
+            return
+        if time.monotonic() - self.__saved_at >= SAVE_INTERVAL:
+            self.save_cookies()
+
+    def clear(self):
+        self.client.cookies.clear()
+        if exists(self.path):
+            os.remove(self.path)
+
+    @property
+    def is_logged_in(self) -> bool:
+        """Whether a login cookie is still valid, without any request.
+
+        The site may have ended the session anyway, the manager then
+        calls `relogin` from the failing request.
+        """
+        now = time.time()
+        return any(
+            not is_expired(cookie, now)
+            for cookie in self.client.cookies.jar
+            if is_login_cookie(cookie)
+        )
+
+    def login(self, email: str, password: str, remember: bool = False):
+        response = self.manager.login(email, password, remember)
+        self.user = User(email, password, remember)
+        self.save_cookies()
+        return response
+
+    def relogin(self):
+        """Login again with the last user, the site dropped the session."""
+        if self.user is None:
+            raise AuthError(str(self.client.base_url), 401)
+        self.client.cookies.clear()
+        self.login(self.user.email, self.user.password, True)
+
+    def ensure_login(self, user: User) -> bool:
+        """Login only when the saved cookies expired, True when it did."""
+        self.user = user
+        if self.is_logged_in:
+            return False
+
+        self.login(user.email, user.password, True)
+        return True
+
+    def webview_cookies(self) -> list[tuple[str, str]]:
+        """Get the cookies as `(url, Set-Cookie value)` for the WebView."""
+        cookies = []
+
+        for cookie in self.client.cookies.jar:
+            if is_expired(cookie):
+                continue
+
+            domain = cookie.domain.lstrip('.')
+            value = f'{cookie.name}={cookie.value}; Path={cookie.path}'
+            if cookie.domain_initial_dot:
+                value += f'; Domain={cookie.domain}'
+            if cookie.expires:
+                value += '; Expires=' + time.strftime(
+                    '%a, %d %b %Y %H:%M:%S GMT',
+                    time.gmtime(cookie.expires),
+                )
+            if cookie.secure:
+                value += '; Secure'
+
+            scheme = 'https' if cookie.secure else 'http'
+            cookies.append((f'{scheme}://{domain}', value))
+
+        return cookies
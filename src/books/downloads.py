@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict
+from html import escape
+from os.path import basename, exists, getsize, join, splitext
+from urllib.parse import urlsplit
+
+from src.books.models import next_unread_chapter
+from src.utils.downloads import DownloadItem, Downloader
+from src.utils.manager import Chapter, Manager, Option
+
+READER_PAGE = (
+    '<!DOCTYPE html><meta charset="utf-8">'
+    '<meta name="viewport" content="width=device-width">'
+    '<style>body{{margin:0}}img{{display:block;width:100%}}</style>'
+    '{images}'
+)
+
+
+def choose_option(chapter: Chapter, langs: list[str] = None) -> Option | None:
+    """Get the option in the first preferred language, or the first one."""
+    for lang in langs or []:
+        for option in chapter.options:
+            if option.lang == lang:
+                return option
+    return chapter.options[0] if chapter.options else None
+
+
+class ChapterDownloads:
+    """Keep chapters on disk for offline reading, within a quota.
+
+    Every chapter gets a directory with its pages and a manifest holding
+    their checksums; the least recently read chapters are removed first
+    when the quota is exceeded.
+    """
+
+    def __init__(
+        self,
+        manager: Manager,
+        downloader: Downloader,
+        directory: str,
+        quota_bytes: int = 512 * 1024 * 1024,
+        langs: list[str] = None,
+    ):
+        self.manager = manager
+        self.downloader = downloader
+        self.directory = directory
+        self.quota_bytes = quota_bytes
+        self.langs = langs
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__lock = threading.Lock()
+        self.__quota_lock = threading.Lock()
+        self.__pending: dict[str, Future] = {}
+        # Chapters being downloaded, never evicted.
+        self.__active: set[str] = set()
+        os.makedirs(directory, exist_ok=True)
+
+    def chapter_directory(self, chapter_url: str) -> str:
+        name = hashlib.sha1(chapter_url.encode()).hexdigest()
+        return join(self.directory, name)
+
+    def manifest_path(self, chapter_url: str) -> str:
+        return join(self.chapter_directory(chapter_url), 'manifest.json')
+
+    def load_manifest(self, chapter_url: str) -> dict | None:
+        try:
+            with open(self.manifest_path(chapter_url)) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_manifest(self, chapter_url: str, manifest: dict):
+        path = self.manifest_path(chapter_url)
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(manifest, file)
+        os.replace(f'{path}.tmp', path)
+
+    def get_pages(self, chapter_url: str) -> list[str] | None:
+        """Get the downloaded page files of a chapter, marking it read."""
+        manifest = self.load_manifest(chapter_url)
+        if not manifest or not manifest['complete']:
+            return None
+        # The manifest time orders the chapters for the eviction.
+        os.utime(self.manifest_path(chapter_url))
+        return [page['path'] for page in manifest['pages']]
+
+    def reader_path(self, chapter_url: str) -> str | None:
+        """Get a page showing the downloaded pages of a chapter, to read
+        it offline, or None when it is not downloaded."""
+        pages = self.get_pages(chapter_url)
+        if pages is None:
+            return None
+
+        path = join(self.chapter_directory(chapter_url), 'index.html')
+        if not exists(path):
+            images = ''.join(
+                f'<img src="{escape(basename(page))}">' for page in pages
+            )
+            with open(f'{path}.tmp', 'w') as file:
+                file.write(READER_PAGE.format(images=images))
+            os.replace(f'{path}.tmp', path)
+        return path
+
+    def download(self, chapter_url: str) -> list[str]:
+        """Download the pages of a chapter option, resuming if partial."""
+        with self.__lock:
+            self.__active.add(chapter_url)
+        try:
+            pages = self.__download(chapter_url)
+        finally:
+            with self.__lock:
+                self.__active.discard(chapter_url)
+
+        self.enforce_quota(keep=chapter_url)
+        return pages
+
+    def __download(self, chapter_url: str) -> list[str]:
+        manifest = self.load_manifest(chapter_url)
+        directory = self.chapter_directory(chapter_url)
+        os.makedirs(directory, exist_ok=True)
+
+        if manifest is None:
+            viewer_url, images = self.manager.get_chapter_images(chapter_url)
+            manifest = {
+                'chapter_url': chapter_url,
+                'viewer_url': viewer_url,
+                'complete': False,
+                'pages': [
+                    asdict(DownloadItem(
+                        url,
+                        join(
+                            directory,
+                            f'{index:04d}{splitext(urlsplit(url).path)[1]}',
+                        ),
+                    ))
+                    for index, url in enumerate(images)
+                ],
+            }
+            self.save_manifest(chapter_url, manifest)
+
+        items = self.downloader.download_all(
+            [DownloadItem(**page) for page in manifest['pages']],
+            headers={'Referer': manifest['viewer_url']},
+        )
+        manifest['pages'] = [asdict(item) for item in items]
+        manifest['complete'] = True
+        self.save_manifest(chapter_url, manifest)
+        return [item.path for item in items]
+
+    def download_chapter(self, chapter: Chapter) -> list[str] | None:
+        option = choose_option(chapter, self.langs)
+        if option is None:
+            return None
+        return self.download(option.chapter_url)
+
+    def submit(self, chapter: Chapter) -> Future | None:
+        """Download a chapter in the background, once at a time."""
+        option = choose_option(chapter, self.langs)
+        if option is None:
+            return None
+
+        with self.__lock:
+            future = self.__pending.get(option.chapter_url)
+            if future is None or future.done():
+                future = self.__executor.submit(
+                    self.download,
+                    option.chapter_url,
+                )
+                self.__pending[option.chapter_url] = future
+            return future
+
+    def prefetch_next(self, book_url: str, title: str = None) -> Future | None:
+        """Download the next unread chapter while `title` is being read."""
+        chapter = next_unread_chapter(book_url, title)
+        if chapter is None:
+            return None
+        return self.submit(chapter)
+
+    def usage(self) -> list[tuple[float, int, str]]:
+        """Get the (last read, bytes, chapter url) of downloaded chapters."""
+        chapters = []
+        for entry in os.scandir(self.directory):
+            manifest_path = join(entry.path, 'manifest.json')
+            if not entry.is_dir() or not exists(manifest_path):
+                continue
+            try:
+                with open(manifest_path) as file:
+                    chapter_url = json.load(file)['chapter_url']
+                # Pages of a running download are renamed meanwhile.
+                size = sum(
+                    getsize(page.path)
+                    for page in os.scandir(entry.path)
+                    if exists(page.path)
+                )
+                last_read = os.stat(manifest_path).st_mtime
+            except (FileNotFoundError, ValueError):
+                continue
+            chapters.append((last_read, size, chapter_url))
+        return sorted(chapters)
+
+    def enforce_quota(self, keep: str = None):
+        with self.__quota_lock:
+            chapters = self.usage()
+            total = sum(size for _, size, _ in chapters)
+
+            for _, size, chapter_url in chapters:
+                if total <= self.quota_bytes:
+                    break
+                with self.__lock:
+                    if chapter_url == keep or chapter_url in self.__active:
+                        continue
+                    shutil.rmtree(self.chapter_directory(chapter_url))
+                total -= size
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,158 @@
+import re
+from array import array
+from datetime import date
+
+from src.utils.manager import Chapter
+
+re_number = re.compile(r'(\d+(?:\.\d+)?)')
+
+SORTS = ('position', 'number', 'date')
+
+
+def chapter_number(title: str) -> float:
+    matches = re_number.search(title)
+    return float(matches.group(1)) if matches else -1.0
+
+
+def date_ordinal(value: 'date | str | None') -> int:
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(value).toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+
+class ChapterIndex:
+    """Columns of the chapters of a book with bitset indexes.
+
+    Row `i` of every column is the chapter `i` in site order. Languages,
+    groups and the viewed state are kept as int bitsets, so a filter is
+    a few big int operations instead of a scan over the chapters.
+    """
+
+    def __init__(self, chapters: list[Chapter] = ()):
+        self.titles: list[str] = []
+        self.search_titles: list[str] = []
+        self.numbers = array('d')
+        self.dates = array('l')
+        self.rows: list[dict] = []
+        self.viewed = 0
+        self.langs: dict[str, int] = {}
+        self.groups: dict[str, int] = {}
+        self.orders: dict[str, list[int]] = {}
+        self.__search: tuple[str, int] = ('', 0)
+        self.extend(chapters)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    @property
+    def all(self) -> int:
+        return (1 << len(self)) - 1
+
+    def extend(self, chapters: list[Chapter]):
+        for chapter in chapters:
+            row = len(self.titles)
+            bit = 1 << row
+
+            self.titles.append(chapter.title)
+            self.search_titles.append(chapter.title.casefold())
+            self.numbers.append(chapter_number(chapter.title))
+            self.dates.append(max(
+                (date_ordinal(option.date) for option in chapter.options),
+                default=0,
+            ))
+            self.rows.append({'text': chapter.title, 'row': row})
+
+            if chapter.viewed:
+                self.viewed |= bit
+            for option in chapter.options:
+                self.langs[option.lang] = self.langs.get(option.lang, 0) | bit
+                for group in option.groups:
+                    self.groups[group.title] = (
+                        self.groups.get(group.title, 0) | bit
+                    )
+
+        rows = range(len(self))
+        self.orders = {
+            'position': list(rows),
+            'number': sorted(rows, key=self.numbers.__getitem__),
+            'date': sorted(rows, key=self.dates.__getitem__),
+        }
+        self.__search = ('', self.all)
+
+    def set_viewed(self, row: int, viewed: bool):
+        if viewed:
+            self.viewed |= 1 << row
+        else:
+            self.viewed &= ~(1 << row)
+
+    def search_mask(self, text: str) -> int:
+        """Get the rows whose title contains `text`.
+
+        While typing every query extends the previous one, so only the
+        rows matched by the previous query are checked again.
+        """
+        text = text.casefold()
+        last_text, last_mask = self.__search
+
+        if text == last_text:
+            return last_mask
+
+        if last_text and text.startswith(last_text):
+            candidates = self.iter_rows(last_mask)
+        else:
+            candidates = range(len(self))
+
+        mask = 0
+        for row in candidates:
+            if text in self.search_titles[row]:
+                mask |= 1 << row
+
+        self.__search = (text, mask)
+        return mask
+
+    def iter_rows(self, mask: int):
+        bits = format(mask, f'0{len(self)}b')[::-1]
+        return (row for row, bit in enumerate(bits) if bit == '1')
+
+    def query(
+        self,
+        langs: list[str] = None,
+        groups: list[str] = None,
+        viewed: bool = None,
+        search: str = '',
+        sort: str = 'position',
+        reverse: bool = False,
+    ) -> list[int]:
+        """Get the rows matching every given filter, sorted."""
+        mask = self.all
+
+        if langs:
+            lang_mask = 0
+            for lang in langs:
+                lang_mask |= self.langs.get(lang, 0)
+            mask &= lang_mask
+        if groups:
+            group_mask = 0
+            for group in groups:
+                group_mask |= self.groups.get(group, 0)
+            mask &= group_mask
+        if viewed is not None:
+            mask &= self.viewed if viewed else ~self.viewed
+        if search:
+            mask &= self.search_mask(search)
+
+        bits = format(mask & self.all, f'0{len(self)}b')[::-1]
+        order = self.orders[sort]
+        if reverse:
+            order = reversed(order)
+        return [row for row in order if bits[row] == '1']
+
+    def data(self, **filters) -> list[dict]:
+        """Get the RecycleView data of the rows matching the filters."""
+        return [
+            {**self.rows[row], 'viewed': bool(self.viewed >> row & 1)}
+            for row in self.query(**filters)
+        ]
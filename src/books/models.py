@@ -0,0 +1,558 @@
+import re
+import unicodedata
+from itertools import islice
+from typing import Iterable
+
+from peewee import (JOIN, BooleanField, CharField, DateField, FloatField,
+                    ForeignKeyField, IntegerField, TextField)
+from playhouse.sqlite_ext import RowIDField, SearchField
+
+from src.common.database import Model, SearchModel
+from src.common.database import create_tables as create_model_tables
+from src.common.database import database, has_search
+from src.utils import manager
+
+BATCH_SIZE = 200
+
+re_word = re.compile(r'\w+')
+
+
+def batched(iterable, size: int = BATCH_SIZE):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Book(Model):
+    title = CharField()
+    url = CharField(unique=True)
+    image = TextField(null=True)
+    list_name = CharField(default='', index=True)
+    etag = CharField(null=True)
+    last_modified = CharField(null=True)
+    digest = CharField(null=True)
+    # Seconds between the chapter checks, adapted to the updates found.
+    poll_interval = FloatField(null=True)
+    next_poll = FloatField(null=True, index=True)
+    # When the book was first found in no list, it is deleted if still
+    # missing at a later check.
+    missing_since = FloatField(null=True)
+
+
+class Chapter(Model):
+    book = ForeignKeyField(Book, backref='chapters', on_delete='CASCADE')
+    title = CharField()
+    viewed = BooleanField(default=False)
+    position = IntegerField(default=0)
+    site_id = CharField(null=True)
+
+    class Meta:
+        indexes = (
+            (('book', 'title'), True),
+            (('book', 'viewed'), False),
+        )
+
+
+class Group(Model):
+    title = CharField()
+    url = CharField(unique=True)
+
+
+class Option(Model):
+    chapter = ForeignKeyField(Chapter, backref='options', on_delete='CASCADE')
+    date = DateField(null=True)
+    lang = CharField(index=True)
+    chapter_url = CharField(unique=True)
+
+
+class OptionGroup(Model):
+    option = ForeignKeyField(Option, backref='groups', on_delete='CASCADE')
+    group = ForeignKeyField(Group, on_delete='CASCADE')
+
+    class Meta:
+        indexes = (
+            (('option', 'group'), True),
+        )
+
+
+class ViewedChange(Model):
+    """A viewed state set in the app and not yet sent to the site."""
+
+    chapter = ForeignKeyField(Chapter, unique=True, on_delete='CASCADE')
+    viewed = BooleanField()
+    # The state of the site, a change back to it is dropped.
+    site_viewed = BooleanField()
+    changed_at = FloatField()
+    attempts = IntegerField(default=0)
+
+
+class BookList(Model):
+    """A list of an account on the site, checked on its own schedule."""
+
+    account = CharField(default='')
+    name = CharField()
+    url = CharField()
+    checked_at = FloatField(null=True)
+    next_check = FloatField(null=True)
+
+    class Meta:
+        indexes = (
+            (('account', 'url'), True),
+        )
+
+
+class ListEntry(Model):
+    """A book listed in a list, a book may be in the lists of several
+    accounts."""
+
+    book_list = ForeignKeyField(
+        BookList, backref='entries', on_delete='CASCADE',
+    )
+    book = ForeignKeyField(Book, backref='entries', on_delete='CASCADE')
+
+    class Meta:
+        indexes = (
+            (('book_list', 'book'), True),
+        )
+
+
+class SearchEntry(SearchModel):
+    """Search text of the books, at rowid -id, and of the chapters, at
+    their id."""
+
+    rowid = RowIDField()
+    text = SearchField()
+
+
+# How many rows have each trigram.
+SearchVocab = SearchEntry.VocabModel()
+
+MODELS = [
+    Book, Chapter, Group, Option, OptionGroup, ViewedChange, BookList,
+    ListEntry,
+]
+
+
+def create_tables():
+    create_model_tables(MODELS)
+
+    if has_search() and not SearchEntry.table_exists():
+        SearchEntry.create_table()
+        SearchVocab.create_table()
+        rebuild_search()
+
+
+def insert_rows(fields: list, rows: Iterable[tuple], **on_conflict):
+    """Insert the rows of `fields` with a statement compiled once, peewee
+    builds the SQL of `insert_many` value by value, most of the time of
+    saving a large book. `on_conflict` takes the arguments of
+    `Insert.on_conflict`."""
+    query = fields[0].model.insert({field: None for field in fields})
+    if on_conflict:
+        query = query.on_conflict(**on_conflict)
+    sql, _ = query.sql()
+    database.cursor().executemany(sql, (
+        tuple(field.db_value(value) for field, value in zip(fields, row))
+        for row in rows
+    ))
+
+
+def search_text(*values: str) -> str:
+    """Get the words in lower case and without accents, the same for
+    the indexed text and the queries."""
+    text = unicodedata.normalize('NFKD', ' '.join(values).casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re_word.findall(text))
+
+
+def unindex(rowids: list[int]):
+    if not has_search():
+        return
+    # A statement compiled once, like `insert_rows`.
+    sql, _ = SearchEntry.delete().where(SearchEntry.rowid == 0).sql()
+    database.cursor().executemany(sql, ((rowid,) for rowid in rowids))
+
+
+def index(rows: list[tuple[int, str]]):
+    """Replace the search text of the `(rowid, text)` rows."""
+    if not has_search():
+        return
+    unindex([rowid for rowid, _ in rows])
+    # Spaces around the words index their first and last letters.
+    insert_rows(
+        [SearchEntry.rowid, SearchEntry.text],
+        ((rowid, f' {text} ') for rowid, text in rows),
+    )
+
+
+def chapter_text(chapter: manager.Chapter) -> str:
+    groups = {
+        group.title: None
+        for option in chapter.options
+        for group in option.groups
+    }
+    return search_text(chapter.title, *groups)
+
+
+def rebuild_search():
+    """Index the whole catalog, for a database older than the index."""
+    chapters: dict[int, tuple[str, dict]] = {}
+    query = (
+        Chapter
+        .select(Chapter.id, Chapter.title, Group.title)
+        .join(Option, JOIN.LEFT_OUTER)
+        .join(OptionGroup, JOIN.LEFT_OUTER)
+        .join(Group, JOIN.LEFT_OUTER)
+        .tuples()
+    )
+    for chapter_id, title, group in query:
+        chapters.setdefault(chapter_id, (title, {}))[1][group or ''] = None
+
+    with database.atomic():
+        SearchEntry.delete().execute()
+        index([
+            (-book_id, search_text(title, list_name))
+            for book_id, title, list_name in Book
+            .select(Book.id, Book.title, Book.list_name)
+            .tuples()
+        ])
+        index([
+            (chapter_id, search_text(title, *groups))
+            for chapter_id, (title, groups) in chapters.items()
+        ])
+
+
+def save_books(books: list[manager.Book]):
+    """Insert or update the books, and their chapters when loaded."""
+    with database.atomic():
+        for batch in batched(books):
+            Book.insert_many([
+                {
+                    Book.title: book.title,
+                    Book.url: book.url,
+                    Book.image: book.image,
+                    Book.list_name: book.list_name,
+                }
+                for book in batch
+            ]).on_conflict(
+                conflict_target=[Book.url],
+                preserve=[Book.title, Book.image, Book.list_name],
+            ).execute()
+
+            index([
+                (-book_id, search_text(title, list_name))
+                for book_id, title, list_name in Book
+                .select(Book.id, Book.title, Book.list_name)
+                .where(Book.url.in_([book.url for book in batch]))
+                .tuples()
+            ])
+
+        for book in books:
+            if book.chapters:
+                save_chapters(book.url, book.chapters)
+
+
+def delete_books(book_ids: list[int]):
+    """Remove the books, with their chapters, from the catalog."""
+    with database.atomic():
+        for batch in batched(book_ids):
+            unindex([-book_id for book_id in batch] + [
+                chapter_id
+                for chapter_id, in Chapter
+                .select(Chapter.id)
+                .where(Chapter.book.in_(batch))
+                .tuples()
+            ])
+            Book.delete().where(Book.id.in_(batch)).execute()
+
+
+def missing_books(before: float) -> dict[int, str]:
+    """Get the ids and urls of the books in no list since before
+    `before`, but for the ones with viewed states to send."""
+    return dict(
+        Book
+        .select(Book.id, Book.url)
+        .where(
+            (Book.missing_since < before)
+            & Book.id.not_in(ListEntry.select(ListEntry.book))
+            & Book.id.not_in(
+                ViewedChange.select(Chapter.book).join(Chapter)
+            )
+        )
+        .tuples()
+    )
+
+
+def apply_viewed_changes(book_id: int, chapters: list[manager.Chapter]):
+    """Keep the viewed state of the changes not sent yet over the
+    scraped one, the changes the site already shows are done."""
+    pending = {
+        title: (change_id, viewed)
+        for change_id, title, viewed in ViewedChange
+        .select(ViewedChange.id, Chapter.title, ViewedChange.viewed)
+        .join(Chapter)
+        .where(Chapter.book == book_id)
+        .tuples()
+    }
+    if not pending:
+        return
+
+    done = []
+    for chapter in chapters:
+        change_id, viewed = pending.get(chapter.title, (None, None))
+        if change_id is None:
+            continue
+        if chapter.viewed == viewed:
+            done.append(change_id)
+        else:
+            chapter.viewed = viewed
+
+    for batch in batched(done):
+        ViewedChange.delete().where(ViewedChange.id.in_(batch)).execute()
+
+
+def save_chapters(book_url: str, chapters: list[manager.Chapter]):
+    """Replace the chapters of a book with the scraped ones."""
+    with database.atomic():
+        Book.insert(title='', url=book_url).on_conflict_ignore().execute()
+        book_id = Book.get(Book.url == book_url).id
+        apply_viewed_changes(book_id, chapters)
+
+        # Compared here, an IN of every title is slow to build.
+        titles = {chapter.title for chapter in chapters}
+        removed = [
+            chapter_id
+            for chapter_id, title in Chapter
+            .select(Chapter.id, Chapter.title)
+            .where(Chapter.book == book_id)
+            .tuples()
+            if title not in titles
+        ]
+        unindex(removed)
+        for batch in batched(removed):
+            Chapter.delete().where(Chapter.id.in_(batch)).execute()
+
+        insert_rows(
+            [
+                Chapter.book,
+                Chapter.title,
+                Chapter.viewed,
+                Chapter.position,
+                Chapter.site_id,
+            ],
+            (
+                (book_id, chapter.title, chapter.viewed, position,
+                 chapter.site_id)
+                for position, chapter in enumerate(chapters)
+            ),
+            conflict_target=[Chapter.book, Chapter.title],
+            preserve=[Chapter.viewed, Chapter.position, Chapter.site_id],
+        )
+
+        chapter_ids = dict(
+            Chapter
+            .select(Chapter.title, Chapter.id)
+            .where(Chapter.book == book_id)
+            .tuples()
+        )
+        index([
+            (chapter_ids[chapter.title], chapter_text(chapter))
+            for chapter in chapters
+        ])
+
+        options = [
+            (chapter_ids[chapter.title], option)
+            for chapter in chapters
+            for option in chapter.options
+        ]
+        groups = {
+            group.url: group
+            for _, option in options
+            for group in option.groups
+        }
+
+        # Options no longer listed, in chapters that still are, go with
+        # their groups.
+        urls = {option.chapter_url for _, option in options}
+        for batch in batched(
+            option_id
+            for option_id, url in Option
+            .select(Option.id, Option.chapter_url)
+            .join(Chapter)
+            .where(Chapter.book == book_id)
+            .tuples()
+            if url not in urls
+        ):
+            Option.delete().where(Option.id.in_(batch)).execute()
+
+        for batch in batched(groups.values()):
+            Group.insert_many([
+                {Group.title: group.title, Group.url: group.url}
+                for group in batch
+            ]).on_conflict(
+                conflict_target=[Group.url],
+                preserve=[Group.title],
+            ).execute()
+
+        insert_rows(
+            [Option.chapter, Option.date, Option.lang, Option.chapter_url],
+            (
+                (chapter_id, option.date, option.lang, option.chapter_url)
+                for chapter_id, option in options
+            ),
+            conflict_target=[Option.chapter_url],
+            preserve=[Option.chapter, Option.date, Option.lang],
+        )
+
+        group_ids = {}
+        for batch in batched(groups):
+            group_ids.update(
+                Group
+                .select(Group.url, Group.id)
+                .where(Group.url.in_(batch))
+                .tuples()
+            )
+
+        option_ids = dict(
+            Option
+            .select(Option.chapter_url, Option.id)
+            .join(Chapter)
+            .where(Chapter.book == book_id)
+            .tuples()
+        )
+
+        OptionGroup.delete().where(OptionGroup.option.in_(
+            Option.select(Option.id).join(Chapter).where(Chapter.book == book_id)
+        )).execute()
+
+        insert_rows(
+            [OptionGroup.option, OptionGroup.group],
+            (
+                (option_ids[option.chapter_url], group_ids[group.url])
+                for _, option in options
+                for group in option.groups
+            ),
+            action='IGNORE',
+        )
+
+
+def load_books(list_name: str = None) -> list[manager.Book]:
+    """Get the books of the catalog, without chapters."""
+    query = Book.select().order_by(Book.title)
+    if list_name is not None:
+        query = query.where(Book.list_name == list_name)
+
+    return [
+        manager.Book(book.title, book.url, book.image, book.list_name)
+        for book in query
+    ]
+
+
+def load_book(book_url: str) -> manager.Book | None:
+    """Get a book of the catalog, without chapters."""
+    book = Book.get_or_none(Book.url == book_url)
+    if book is None:
+        return None
+    return manager.Book(book.title, book.url, book.image, book.list_name)
+
+
+def next_unread_chapter(
+    book_url: str,
+    title: str = None,
+) -> manager.Chapter | None:
+    """Get the first unread chapter after `title`, chapters are listed
+    newest first."""
+    query = (
+        Chapter
+        .select(Chapter.title, Chapter.position)
+        .join(Book)
+        .where((Book.url == book_url) & ~Chapter.viewed)
+        .order_by(Chapter.position.desc())
+    )
+
+    if title is not None:
+        current = (
+            Chapter
+            .select(Chapter.position)
+            .join(Book)
+            .where((Book.url == book_url) & (Chapter.title == title))
+            .scalar()
+        )
+        if current is None:
+            return None
+        query = query.where(Chapter.position < current)
+
+    chapter = query.first()
+    if chapter is None:
+        return None
+
+    return next(
+        (c for c in load_chapters(book_url) if c.title == chapter.title),
+        None,
+    )
+
+
+def load_chapters(book_url: str) -> list[manager.Chapter]:
+    """Get the chapters of a book from the catalog."""
+    chapters = (
+        Chapter
+        .select(Chapter.id, Chapter.title, Chapter.viewed, Chapter.site_id)
+        .join(Book)
+        .where(Book.url == book_url)
+        .order_by(Chapter.position)
+        .tuples()
+    )
+    options = (
+        Option
+        .select(
+            Option.id,
+            Option.chapter,
+            Option.date,
+            Option.lang,
+            Option.chapter_url,
+        )
+        .join(Chapter)
+        .join(Book)
+        .where(Book.url == book_url)
+        .order_by(Option.id)
+        .tuples()
+    )
+    groups = (
+        OptionGroup
+        .select(OptionGroup.option, Group.title, Group.url)
+        .join(Group)
+        .switch(OptionGroup)
+        .join(Option)
+        .join(Chapter)
+        .join(Book)
+        .where(Book.url == book_url)
+        .order_by(OptionGroup.id)
+        .tuples()
+    )
+
+    option_groups: dict[int, list[manager.Group]] = {}
+    for option_id, title, url in groups:
+        option_groups.setdefault(option_id, []).append(
+            manager.Group(title, url)
+        )
+
+    chapter_options: dict[int, list[manager.Option]] = {}
+    for option_id, chapter_id, date, lang, chapter_url in options:
+        chapter_options.setdefault(chapter_id, []).append(
+            manager.Option(
+                option_groups.get(option_id, []),
+                date,
+                lang,
+                chapter_url,
+            )
+        )
+
+    return [
+        manager.Chapter(
+            title,
+            viewed,
+            chapter_options.get(chapter_id, []),
+            site_id,
+        )
+        for chapter_id, title, viewed, site_id in chapters
+    ]
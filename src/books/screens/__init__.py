@@ -1,2 +1,3 @@
 from src.books.screens.book import BookScreen, StencilAnchorLayout
 from src.books.screens.book_list import BookListScreen
+from src.books.screens.search import SearchScreen
@@ -1,13 +1,18 @@
+from pathlib import Path
+from typing import TYPE_CHECKING
+
 from kivy import platform
 from kivy.app import App
 from kivy.clock import Clock, mainthread
-from kivy.properties import ObjectProperty  # pylint: disable=no-name-in-module
+from kivy.logger import Logger
+from kivy.properties import (ObjectProperty,  # pylint: disable=no-name-in-module
+                             StringProperty)
 from kivy.uix.anchorlayout import AnchorLayout
 from kivy.uix.screenmanager import Screen
 from kivy.uix.stencilview import StencilView
 
-if platform == 'android':
-    from src.utils.webview import WebView, bytes_to_texture
+if TYPE_CHECKING:
+    from src.utils.manager import Chapter
 
 
 class StencilAnchorLayout(AnchorLayout, StencilView):
@@ -16,9 +21,13 @@ class StencilAnchorLayout(AnchorLayout, StencilView):
 
 class BookScreen(Screen):
     browser: "WebView | None" = ObjectProperty(None)
+    status = StringProperty('')
 
     def view_google(self):
         if platform == 'android':
+            # The WebView loads many java classes, only when first used.
+            from src.utils.webview import WebView
+
             self.browser = WebView(
                 'https://www.google.com',
                 enable_javascript=True,
@@ -28,13 +37,81 @@ class BookScreen(Screen):
 
             Clock.schedule_once(self.capture, 3)
 
+    def chapter_url(self, chapter: 'Chapter | None') -> str | None:
+        """Get where to read a chapter: its downloaded pages when there
+        are, else the viewer of the site."""
+        from src.books.downloads import choose_option
+
+        downloads = App.get_running_app().downloads
+        option = chapter and choose_option(chapter, downloads.langs)
+        if not option:
+            return None
+        path = downloads.reader_path(option.chapter_url)
+        return Path(path).as_uri() if path else option.chapter_url
+
+    def read(self, chapter: 'Chapter', next_chapter: 'Chapter' = None):
+        """Open a chapter, offline when it was downloaded, else logged in
+        as the app; `next_chapter` is loaded hidden meanwhile."""
+        url = self.chapter_url(chapter)
+        if url is None:
+            return
+
+        if platform != 'android':
+            import webbrowser
+            webbrowser.open(url)
+            return
+
+        from src.utils.webview import WebView
+
+        app = App.get_running_app()
+        self.browser = WebView(
+            url,
+            enable_javascript=True,
+            enable_zoom=True,
+            cookies=app.session.webview_cookies(),
+            next_url=self.chapter_url(next_chapter),
+        )
+
+    def choose_library(self):
+        """Pick a snapshot of another device to import."""
+        from plyer import filechooser
+
+        filechooser.open_file(
+            title='Import a library',
+            filters=['*.gz'],
+            on_selection=self.import_library,
+        )
+
+    @mainthread
+    def import_library(self, selection: list[str]):
+        # The file chooser may answer from another thread.
+        if not selection:
+            return
+        from src.books.snapshot import import_library
+
+        self.status = 'Importing the library…'
+        App.get_running_app().worker.submit(
+            import_library,
+            selection[0],
+            key='import_library',
+            on_result=self.on_library_imported,
+            on_error=self.on_library_error,
+        )
+
+    def on_library_imported(self, counts: tuple[int, int]):
+        self.status = '{} books and {} chapters imported'.format(*counts)
+
+    def on_library_error(self, error: Exception):
+        Logger.warning('Library import failed: %s', error)
+        self.status = f'Import failed: {error}'
+
     def capture(self, dt):
         if self.browser:
             self.browser.capture(self.set_image)
 
-    @mainthread
-    def set_image(self, size, data):
-        self.ids['book_image'].texture = bytes_to_texture(size, data)
+    def set_image(self, texture):
+        self.ids['book_image'].texture = texture
+        self.ids['book_image'].canvas.ask_update()
 
     def on_pause(self):
         if self.browser:
@@ -1,15 +1,140 @@
-from kivy.uix.screenmanager import Screen
-from kivy.properties import ListProperty
 from kivy.app import App
+from kivy.properties import (BooleanProperty, ListProperty, OptionProperty,
+                             StringProperty)
+from kivy.uix.screenmanager import Screen
+
+from src.books.index import SORTS, ChapterIndex
+from src.books.models import load_book, load_chapters, save_chapters
+from src.books.sync import sync_chapters
+from src.books.viewed import mark_viewed
+from src.utils.covers import CoverImage  # noqa: F401, used in the kv file
 
 
 class BookListScreen(Screen):
     books = ListProperty([])
+    book_url = StringProperty('https://visortmo.com/library/manga/10465/Solanin')
+    title = StringProperty('')
+    cover_url = StringProperty('')
+    search = StringProperty('')
+    unread_only = BooleanProperty(False)
+    langs = ListProperty([])
+    groups = ListProperty([])
+    # The languages and groups of the chapters, for the filters.
+    lang_names = ListProperty([])
+    group_names = ListProperty([])
+    sort = OptionProperty('position', options=SORTS)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.index = ChapterIndex()
+        # The chapters of the index rows.
+        self.chapters = []
+        self.fbind('search', self.apply_filters)
+        self.fbind('unread_only', self.apply_filters)
+        self.fbind('langs', self.apply_filters)
+        self.fbind('groups', self.apply_filters)
+        self.fbind('sort', self.apply_filters)
 
     def on_pre_enter(self):
-        self.books.extend(
-            {"text": chapter.title} 
-            for chapter in App.get_running_app().client_manager.get_chapters_from_url(
-                'https://visortmo.com/library/manga/10465/Solanin',
+        book = load_book(self.book_url)
+        self.title = book.title if book else ''
+        self.cover_url = (book and book.image) or ''
+        # The filters of the previous book may name none of these.
+        self.langs = []
+        self.groups = []
+        self.show_chapters(load_chapters(self.book_url))
+        app = App.get_running_app()
+
+        # Stored chapters are only checked, the filters may hide them.
+        if self.chapters:
+            app.worker.submit(
+                sync_chapters,
+                app.client_manager,
+                self.book_url,
+                key=('sync', self.book_url),
+                owner=self,
+                on_result=self.on_synced,
+            )
+        else:
+            app.worker.submit_iter(
+                app.client_manager.iter_chapters_from_url,
+                self.book_url,
+                key=('chapters', self.book_url),
+                owner=self,
+                on_items=self.add_chapters,
+                on_result=self.on_chapters,
             )
+
+    def on_leave(self):
+        App.get_running_app().worker.cancel(self)
+
+    def on_synced(self, diff):
+        if diff:
+            self.show_chapters(load_chapters(self.book_url))
+
+    def on_chapters(self, chapters):
+        App.get_running_app().worker.submit(
+            save_chapters,
+            self.book_url,
+            chapters,
+        )
+
+    def add_chapters(self, chapters):
+        self.chapters.extend(chapters)
+        self.index.extend(chapters)
+        self.update_filter_names()
+        self.apply_filters()
+
+    def show_chapters(self, chapters):
+        self.chapters = list(chapters)
+        self.index = ChapterIndex(chapters)
+        self.update_filter_names()
+        self.apply_filters()
+
+    def update_filter_names(self):
+        self.lang_names = sorted(self.index.langs)
+        self.group_names = sorted(self.index.groups)
+
+    def open_chapter(self, row: int):
+        """Read a chapter, downloading the next unread one meanwhile.
+
+        The chapter itself is not downloaded, it is read from the site
+        when it was not downloaded before.
+        """
+        chapter = self.chapters[row]
+        app = App.get_running_app()
+
+        app.worker.submit(
+            app.downloads.prefetch_next,
+            self.book_url,
+            chapter.title,
+            key=('prefetch', self.book_url, chapter.title),
+        )
+        # Newer chapters come first, the next one to read is above.
+        next_chapter = next(
+            (
+                self.chapters[above]
+                for above in range(row - 1, -1, -1)
+                if not self.index.viewed >> above & 1
+            ),
+            None,
+        )
+        self.manager.get_screen('book').read(chapter, next_chapter)
+
+    def set_viewed(self, row: int, viewed: bool = True):
+        """Mark a chapter viewed, or not, and send it to the site soon."""
+        self.index.set_viewed(row, viewed)
+        self.apply_filters()
+
+        # A small write, done here to keep the toggles in order.
+        mark_viewed(self.book_url, [self.index.titles[row]], viewed)
+        App.get_running_app().send_viewed_later()
+
+    def apply_filters(self, *args):
+        self.books = self.index.data(
+            langs=self.langs,
+            groups=self.groups,
+            viewed=False if self.unread_only else None,
+            search=self.search.strip(),
+            sort=self.sort,
         )
@@ -0,0 +1,37 @@
+from functools import partial
+
+from kivy.clock import Clock
+from kivy.properties import ListProperty, StringProperty
+from kivy.uix.screenmanager import Screen
+
+from src.books.search import SearchResult, search
+from src.utils.covers import CoverImage  # noqa: F401, used in the kv file
+
+
+class SearchScreen(Screen):
+    """Find books and chapters of the library while typing."""
+
+    query = StringProperty('')
+    results = ListProperty([])
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # One search a frame, however fast the typing.
+        self.__trigger = Clock.create_trigger(self.refresh)
+        self.fbind('query', self.__trigger)
+
+    def refresh(self, *args):
+        self.results = [
+            {
+                'text': result.text,
+                'cover_url': result.book_image or '',
+                'on_release': partial(self.open, result),
+            }
+            for result in search(self.query)
+        ]
+
+    def open(self, result: SearchResult):
+        book_list = self.manager.get_screen('book_list')
+        book_list.book_url = result.book_url
+        book_list.search = result.chapter_title or ''
+        self.manager.current = 'book_list'
@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+
+from src.books.models import (Book, Chapter, SearchEntry, SearchVocab,
+                              has_search, search_text)
+
+# Share of the trigrams of the query a typo tolerant match must have.
+MIN_SIMILARITY = 0.5
+# Rows of the rare trigrams ranked to find a typo.
+MAX_RANKED = 2000
+
+
+@dataclass(frozen=True, slots=True)
+class SearchResult:
+    book_url: str
+    book_title: str
+    chapter_title: str | None = None
+    book_image: str | None = None
+
+    @property
+    def text(self) -> str:
+        if self.chapter_title is None:
+            return self.book_title
+        return f'{self.book_title} - {self.chapter_title}'
+
+
+def trigrams(value: str) -> set[str]:
+    return {value[start:start + 3] for start in range(len(value) - 2)}
+
+
+def phrase(value: str) -> str:
+    return f'"{value}"'
+
+
+def document_counts(grams: set[str]) -> dict[str, int]:
+    """Get how many rows have each trigram, from the index vocabulary."""
+    return dict(
+        SearchVocab
+        .select(SearchVocab.term, SearchVocab.doc)
+        .where(SearchVocab.term.in_(list(grams)))
+        .tuples()
+    )
+
+
+def score(rowid: int, text: str, words: list[str]) -> tuple:
+    """Sort key of a candidate: words matched from their start first,
+    then books, then shorter texts."""
+    starts = sum(f' {word}' in text for word in words)
+    return (-starts, rowid > 0, len(text))
+
+
+def match_rows(words: list[str], limit: int) -> list[int]:
+    """Get the rows containing every word, best first.
+
+    The candidates come in index order, books first, and are only
+    scored: bm25, and the vocabulary counts that would decide when to
+    use it, read every row of a common trigram and took most of the time
+    of a search.
+    """
+    long_words = [word for word in words if len(word) >= 3]
+    query = SearchEntry.select(SearchEntry.rowid, SearchEntry.text)
+
+    if long_words:
+        query = query.where(
+            SearchEntry.match(' '.join(map(phrase, long_words)))
+        )
+    # The index matches three characters or more, shorter words filter
+    # what it found.
+    for word in words:
+        if len(word) < 3:
+            query = query.where(SearchEntry.text.contains(word))
+
+    rows = query.limit(limit * 4).tuples()
+    ranked = sorted(rows, key=lambda row: score(*row, words))
+    return [rowid for rowid, _ in ranked[:limit]]
+
+
+def similar_rows(words: list[str], limit: int) -> list[int]:
+    """Get the rows sharing most of the trigrams of the words, so a typo
+    still finds them."""
+    grams = set().union(*(
+        trigrams(f' {word} ') for word in words if len(word) >= 3
+    ))
+    counts = document_counts(grams)
+    if not counts:
+        return []
+
+    # The rarest trigrams find the rows, the common ones would only make
+    # the ranking slower.
+    rare, total = [], 0
+    for gram in sorted(counts, key=counts.get):
+        if rare and total + counts[gram] > MAX_RANKED:
+            break
+        rare.append(gram)
+        total += counts[gram]
+
+    query = (
+        SearchEntry
+        .select(SearchEntry.rowid, SearchEntry.text)
+        .where(SearchEntry.match(' OR '.join(map(phrase, rare))))
+    )
+    if total <= MAX_RANKED:
+        query = query.order_by(SearchEntry.rank())
+
+    scored = []
+    for rowid, text in query.limit(limit * 4).tuples():
+        similarity = sum(gram in text for gram in grams) / len(grams)
+        if similarity >= MIN_SIMILARITY:
+            scored.append((-similarity, rowid > 0, len(text), rowid))
+    return [row[-1] for row in sorted(scored)[:limit]]
+
+
+def like_rows(words: list[str], limit: int) -> list[int]:
+    """Find the rows without the index, for SQLite builds lacking it."""
+    books = Book.select(Book.id)
+    chapters = Chapter.select(Chapter.id)
+    for word in words:
+        books = books.where(Book.title.contains(word))
+        chapters = chapters.where(Chapter.title.contains(word))
+
+    rowids = [-book_id for book_id, in books.limit(limit).tuples()]
+    rowids.extend(chapter_id for chapter_id, in chapters.limit(limit).tuples())
+    return rowids[:limit]
+
+
+def load_results(rowids: list[int]) -> list[SearchResult]:
+    """Get the books and chapters of the rows, in their order. Rows of
+    deleted books or chapters are left out."""
+    book_ids = [-rowid for rowid in rowids if rowid < 0]
+    chapter_ids = [rowid for rowid in rowids if rowid > 0]
+
+    results = {}
+    if book_ids:
+        for book_id, title, url, image in (
+            Book
+            .select(Book.id, Book.title, Book.url, Book.image)
+            .where(Book.id.in_(book_ids))
+            .tuples()
+        ):
+            results[-book_id] = SearchResult(url, title, book_image=image)
+    if chapter_ids:
+        for chapter_id, title, book_title, url, image in (
+            Chapter
+            .select(Chapter.id, Chapter.title, Book.title, Book.url, Book.image)
+            .join(Book)
+            .where(Chapter.id.in_(chapter_ids))
+            .tuples()
+        ):
+            results[chapter_id] = SearchResult(url, book_title, title, image)
+
+    return [results[rowid] for rowid in rowids if rowid in results]
+
+
+def search(text: str, limit: int = 50) -> list[SearchResult]:
+    """Find the books, by title or list, and the chapters, by title or
+    group, containing the words of `text`.
+
+    Words match anywhere, so a prefix is enough while typing, and case
+    and accents are ignored. When nothing contains every word the rows
+    most alike are returned, for typos.
+    """
+    words = search_text(text).split()
+    if not words:
+        return []
+
+    if not has_search():
+        return load_results(like_rows(words, limit))
+
+    rowids = match_rows(words, limit)
+    if not rowids:
+        rowids = similar_rows(words, limit)
+    return load_results(rowids)
@@ -0,0 +1,247 @@
+import argparse
+import gzip
+import json
+import logging
+import time
+from typing import IO, Iterator
+
+from peewee import JOIN, fn
+
+from src.books.models import (Book, Chapter, Group, Option, OptionGroup,
+                              create_tables, database, save_books)
+from src.utils import manager
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 'library'
+# A new major version changes what the records mean, a new minor one
+# only adds records or fields, older readers skip them.
+VERSION = 1
+MINOR_VERSION = 0
+# Chapters saved together by an import, what it keeps in memory.
+IMPORT_BATCH = 5000
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot this version can read."""
+
+
+def chapter_rows() -> Iterator[tuple]:
+    """Get a row per option of every chapter, by book and position."""
+    return (
+        Chapter
+        .select(
+            Chapter.book,
+            Chapter.id,
+            Chapter.title,
+            Chapter.viewed,
+            Chapter.site_id,
+            Option.date,
+            Option.lang,
+            Option.chapter_url,
+            fn.GROUP_CONCAT(OptionGroup.group).coerce(False),
+        )
+        .join(Option, JOIN.LEFT_OUTER)
+        .join(OptionGroup, JOIN.LEFT_OUTER)
+        .group_by(Chapter.id, Option.id)
+        .order_by(Chapter.book, Chapter.position, Chapter.id, Option.id)
+        .tuples()
+        .iterator()
+    )
+
+
+def export_records() -> Iterator[dict]:
+    """Get the records of the catalog: a header, the groups and a book
+    with its chapters at a time."""
+    yield {'format': FORMAT, 'version': VERSION, 'minor': MINOR_VERSION}
+
+    for group in (
+        Group
+        .select(Group.id, Group.title, Group.url)
+        .order_by(Group.id)
+        .tuples()
+        .iterator()
+    ):
+        yield {'group': group}
+
+    rows = chapter_rows()
+    row = next(rows, None)
+
+    for book_id, *book in (
+        Book
+        .select(
+            Book.id,
+            Book.title,
+            Book.url,
+            Book.image,
+            Book.list_name,
+            Book.etag,
+            Book.last_modified,
+            Book.digest,
+            Book.poll_interval,
+        )
+        .order_by(Book.id)
+        .tuples()
+        .iterator()
+    ):
+        chapters = []
+        chapter_id = None
+
+        while row is not None and row[0] == book_id:
+            _, row_chapter, title, viewed, site_id, *option = row
+            if row_chapter != chapter_id:
+                chapter_id = row_chapter
+                chapters.append([title, viewed, site_id, []])
+
+            date, lang, chapter_url, groups = option
+            if chapter_url is not None:
+                chapters[-1][3].append([
+                    date and date.isoformat(),
+                    lang,
+                    chapter_url,
+                    [int(group) for group in groups.split(',')]
+                    if groups else [],
+                ])
+            row = next(rows, None)
+
+        yield {'book': book, 'chapters': chapters}
+
+
+def write_records(records: Iterator[dict], file: IO[str]) -> int:
+    lines = 0
+    for record in records:
+        file.write(json.dumps(
+            record,
+            ensure_ascii=False,
+            separators=(',', ':'),
+        ))
+        file.write('\n')
+        lines += 1
+    return lines
+
+
+def read_records(file: IO[str]) -> Iterator[dict]:
+    """Get the records after the header, refusing a file of another
+    format or of a newer major version."""
+    try:
+        header = json.loads(next(file, '') or '{}')
+    except ValueError as error:
+        raise SnapshotError(f'Not a snapshot: {error}') from error
+    if header.get('format') != FORMAT:
+        raise SnapshotError('Not a snapshot of the library')
+    if header.get('version', 0) > VERSION:
+        raise SnapshotError(
+            f'Snapshot version {header["version"]} is newer than {VERSION}'
+        )
+
+    for line in file:
+        yield json.loads(line)
+
+
+def book_from_record(record: dict, groups: dict) -> manager.Book:
+    # Fields after the known ones come from a newer minor version.
+    title, url, image, list_name, *_ = record['book']
+    return manager.Book(title, url, image, list_name, [
+        manager.Chapter(
+            title,
+            viewed,
+            [
+                manager.Option(
+                    [groups[group] for group in option_groups],
+                    date,
+                    lang,
+                    chapter_url,
+                )
+                for date, lang, chapter_url, option_groups, *_ in options
+            ],
+            site_id,
+        )
+        for title, viewed, site_id, options, *_ in record['chapters']
+    ])
+
+
+def save_records(records: list[dict], groups: dict):
+    """Save a batch of book records in a transaction of its own."""
+    with database.atomic():
+        save_books([book_from_record(record, groups) for record in records])
+
+        for record in records:
+            book = record['book']
+            etag, last_modified, digest, interval = book[4:8]
+            Book.update(
+                etag=etag,
+                last_modified=last_modified,
+                digest=digest,
+                poll_interval=interval,
+            ).where(Book.url == book[1]).execute()
+
+
+def export_library(path: str) -> int:
+    """Write the catalog to a gzipped JSON lines file, a record at a
+    time; return the number of records."""
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as file:
+        # A read transaction, the snapshot is consistent while syncing.
+        with database.atomic():
+            return write_records(export_records(), file)
+
+
+def import_library(path: str) -> tuple[int, int]:
+    """Load a snapshot into the catalog, replacing the chapters of the
+    books in it; return the numbers of books and chapters.
+
+    The file is read a record at a time and saved in batches of about
+    `IMPORT_BATCH` chapters, each committed on its own so the writes of
+    the app and the sync service wait for a batch, not for the whole
+    file. An interrupted import keeps the books saved, importing the
+    file again completes it. `SnapshotError` is raised for a file that
+    is not a snapshot this version reads.
+    """
+    groups: dict[int, manager.Group] = {}
+    batch: list[dict] = []
+    books = chapters = pending = 0
+
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        for record in read_records(file):
+            if 'group' in record:
+                group_id, title, url, *_ = record['group']
+                groups[group_id] = manager.Group(title, url)
+            elif 'book' in record:
+                batch.append(record)
+                books += 1
+                chapters += len(record['chapters'])
+                pending += len(record['chapters'])
+                if pending >= IMPORT_BATCH:
+                    save_records(batch, groups)
+                    batch.clear()
+                    pending = 0
+            # Other records come from a newer minor version, skipped.
+
+        save_records(batch, groups)
+
+    return books, chapters
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(
+        description='Export the library to a file or import it.',
+    )
+    parser.add_argument('action', choices=('export', 'import'))
+    parser.add_argument('path')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    create_tables()
+    start = time.perf_counter()
+
+    if args.action == 'export':
+        records = export_library(args.path)
+        logger.info('%d records exported in %.1f s',
+                    records, time.perf_counter() - start)
+    else:
+        books, chapters = import_library(args.path)
+        logger.info('%d books and %d chapters imported in %.1f s',
+                    books, chapters, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+import logging
+import time
+from dataclasses import dataclass, field
+
+from src.books.models import (Book, BookList, ListEntry, batched, database,
+                              delete_books, load_chapters, missing_books,
+                              save_books, save_chapters, search_text)
+from src.utils import manager as scraper
+from src.utils.manager import Chapter, ChapterPage, Manager, Option
+from src.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+
+# Lists rarely changing, by their name on the site or in the app.
+LIST_INTERVALS = {
+    'pendiente': DAY,
+    'pending': DAY,
+    'wish': DAY,
+    'leido': 7 * DAY,
+    'terminado': 7 * DAY,
+    'abandonado': 7 * DAY,
+    'completed': 7 * DAY,
+    'dropped': 7 * DAY,
+}
+# A list losing more than this share of its books at once, or all of
+# them, is taken as a bad page: the books it lost are not deleted.
+MAX_LIST_LOSS = 0.5
+
+
+@dataclass
+class ListPolicy:
+    """How often the members of a list are checked, by its name. The
+    books of a list are only checked for chapters with the list, so the
+    finished or dropped series cost nothing most days."""
+
+    interval: float = 60 * 60
+    intervals: dict[str, float] = field(
+        default_factory=lambda: dict(LIST_INTERVALS),
+    )
+
+    def interval_of(self, name: str) -> float:
+        for key, interval in self.intervals.items():
+            if search_text(key) == search_text(name):
+                return interval
+        return self.interval
+
+
+@dataclass
+class ListDiff:
+    # The books of the lists checked, the others are left for later.
+    books: list[scraper.Book] = field(default_factory=list)
+    # The urls of the books new to a list of the account.
+    changed: list[str] = field(default_factory=list)
+    # The urls of the books no longer in any list at two checks, deleted.
+    removed: list[str] = field(default_factory=list)
+    checked: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ChapterDiff:
+    book_url: str
+    new_chapters: list[Chapter] = field(default_factory=list)
+    new_options: list[tuple[Chapter, Option]] = field(default_factory=list)
+    viewed: list[Chapter] = field(default_factory=list)
+    # No chapters were stored before: a new book, a first sync or an
+    # import. Its chapters are not news.
+    first_sync: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.new_chapters or self.new_options or self.viewed)
+
+
+def diff_chapters(
+    book_url: str,
+    old: list[Chapter],
+    new: list[Chapter],
+) -> ChapterDiff:
+    """Compare the stored chapters of a book with the scraped ones."""
+    diff = ChapterDiff(book_url)
+    old_chapters = {chapter.title: chapter for chapter in old}
+
+    for chapter in new:
+        old_chapter = old_chapters.get(chapter.title)
+
+        if old_chapter is None:
+            diff.new_chapters.append(chapter)
+            continue
+
+        if old_chapter.viewed != chapter.viewed:
+            diff.viewed.append(chapter)
+
+        old_urls = {option.chapter_url for option in old_chapter.options}
+        diff.new_options.extend(
+            (chapter, option)
+            for option in chapter.options
+            if option.chapter_url not in old_urls
+        )
+
+    return diff
+
+
+def fetch_chapters(manager: Manager, book_url: str) -> ChapterPage:
+    """Get the chapter page of a book when it changed, without writing."""
+    book = Book.get_or_none(Book.url == book_url)
+    return manager.get_chapters_if_changed(
+        book_url,
+        etag=book and book.etag,
+        last_modified=book and book.last_modified,
+        digest=book and book.digest,
+    )
+
+
+def apply_chapters(book_url: str, page: ChapterPage) -> ChapterDiff:
+    """Save a fetched chapter page and get what it changed."""
+    with database.atomic():
+        if page.modified:
+            old = load_chapters(book_url)
+            # Saving keeps the viewed changes not sent yet in the chapters.
+            save_chapters(book_url, page.chapters)
+            if old:
+                diff = diff_chapters(book_url, old, page.chapters)
+            else:
+                diff = ChapterDiff(book_url, first_sync=True)
+        else:
+            diff = ChapterDiff(book_url)
+
+        Book.update(
+            etag=page.etag,
+            last_modified=page.last_modified,
+            digest=page.digest,
+        ).where(Book.url == book_url).execute()
+
+    return diff
+
+
+def sync_chapters(manager: Manager, book_url: str) -> ChapterDiff:
+    """Refresh the chapters of a book, skipping unchanged pages."""
+    return apply_chapters(book_url, fetch_chapters(manager, book_url))
+
+
+def stored_members(account: str, list_urls: list[str]) -> dict[int, str]:
+    """Get the ids and urls of the books stored in the lists."""
+    return dict(
+        ListEntry
+        .select(Book.id, Book.url)
+        .join(Book)
+        .switch(ListEntry)
+        .join(BookList)
+        .where(
+            (BookList.account == account)
+            & BookList.url.in_(list_urls)
+        )
+        .tuples()
+    )
+
+
+def apply_lists(
+    account: str,
+    states: dict[str, str],
+    fetched: dict[str, list[scraper.Book]],
+    policy: ListPolicy,
+    now: float,
+) -> ListDiff:
+    """Save the members of the fetched lists and get what changed."""
+    diff = ListDiff(
+        books=[book for books in fetched.values() for book in books],
+        checked=[name for name, url in states.items() if url in fetched],
+    )
+
+    # The books lost by lists that look badly fetched.
+    kept = set()
+
+    with database.atomic():
+        old_members = stored_members(account, list(fetched))
+
+        # Books new to a list of this account, new to the account or
+        # moved between its lists, get their chapters checked now,
+        # whatever their next poll. `Book.list_name` is shared by the
+        # accounts listing a book, only shown.
+        old_entries = set(
+            ListEntry
+            .select(BookList.url, Book.url)
+            .join(Book)
+            .switch(ListEntry)
+            .join(BookList)
+            .where(
+                (BookList.account == account)
+                & BookList.url.in_(list(fetched))
+            )
+            .tuples()
+        )
+        diff.changed = list(dict.fromkeys(
+            book.url
+            for url, books in fetched.items()
+            for book in books
+            if (url, book.url) not in old_entries
+        ))
+
+        save_books(diff.books)
+        for batch in batched(diff.changed):
+            Book.update(next_poll=None).where(Book.url.in_(batch)).execute()
+
+        for name, url in states.items():
+            if url not in fetched:
+                continue
+
+            BookList.insert(
+                account=account,
+                name=name,
+                url=url,
+                checked_at=now,
+                next_check=now + policy.interval_of(name),
+            ).on_conflict(
+                conflict_target=[BookList.account, BookList.url],
+                preserve=[
+                    BookList.name,
+                    BookList.checked_at,
+                    BookList.next_check,
+                ],
+            ).execute()
+            list_id = BookList.get(
+                (BookList.account == account) & (BookList.url == url)
+            ).id
+
+            book_ids = set()
+            for batch in batched(book.url for book in fetched[url]):
+                book_ids.update(
+                    book_id for book_id, in Book
+                    .select(Book.id)
+                    .where(Book.url.in_(batch))
+                    .tuples()
+                )
+            old_ids = {
+                book_id for book_id, in ListEntry
+                .select(ListEntry.book)
+                .where(ListEntry.book_list == list_id)
+                .tuples()
+            }
+            lost = old_ids - book_ids
+            if lost and (
+                not book_ids or len(lost) > len(old_ids) * MAX_LIST_LOSS
+            ):
+                logger.warning(
+                    'List %s lost %d of %d books, they are kept',
+                    name, len(lost), len(old_ids),
+                )
+                kept.update(lost)
+
+            for batch in batched(lost):
+                ListEntry.delete().where(
+                    (ListEntry.book_list == list_id)
+                    & ListEntry.book.in_(batch)
+                ).execute()
+            for batch in batched(book_ids - old_ids):
+                ListEntry.insert_many(
+                    [(list_id, book_id) for book_id in batch],
+                    fields=[ListEntry.book_list, ListEntry.book],
+                ).execute()
+
+        # Books left in no list of any account are marked missing.
+        left = set(old_members) - set(
+            stored_members(account, list(fetched))
+        )
+        listed = set()
+        for batch in batched(left):
+            listed.update(
+                book_id for book_id, in ListEntry
+                .select(ListEntry.book)
+                .where(ListEntry.book.in_(batch))
+                .tuples()
+            )
+        for batch in batched(left - listed - kept):
+            Book.update(missing_since=now).where(
+                Book.id.in_(batch) & Book.missing_since.is_null()
+            ).execute()
+
+        Book.update(missing_since=None).where(
+            Book.missing_since.is_null(False)
+            & Book.id.in_(ListEntry.select(ListEntry.book))
+        ).execute()
+
+        # Only once every list was fetched a missing book cannot be in
+        # one not checked. Books with viewed states to send are kept.
+        if set(states.values()) <= set(fetched):
+            removed = missing_books(now)
+            diff.removed = sorted(removed.values())
+            delete_books(sorted(removed))
+
+    tracer.count('lists_checked', len(diff.checked))
+    tracer.count('list_books_changed', len(diff.changed))
+    tracer.count('list_books_removed', len(diff.removed))
+    return diff
+
+
+def sync_lists(
+    manager: Manager,
+    account: str = '',
+    policy: ListPolicy = None,
+    now: float = None,
+) -> ListDiff:
+    """Refresh the lists of the user that are due and get the books
+    added, moved or removed.
+
+    When a list lost books, or books are missing since the last check,
+    the lists not due are fetched too, a book moved to one of them is
+    not taken as removed.
+    """
+    policy = policy or ListPolicy()
+    now = now or time.time()
+    states = manager.get_url_state()
+    next_checks = dict(
+        BookList
+        .select(BookList.url, BookList.next_check)
+        .where(BookList.account == account)
+        .tuples()
+    )
+    fetched: dict[str, list[scraper.Book]] = {}
+
+    def fetch(name: str, url: str):
+        books = list(manager.get_iter_books_from_list(url))
+        for book in books:
+            book.list_name = name
+        fetched[url] = books
+
+    for name, url in states.items():
+        next_check = next_checks.get(url)
+        if next_check is not None and next_check > now:
+            tracer.count('lists_deferred')
+            continue
+        fetch(name, url)
+
+    members = {book.url for books in fetched.values() for book in books}
+    if (
+        set(stored_members(account, list(fetched)).values()) - members
+        or Book.select().where(Book.missing_since.is_null(False)).exists()
+    ):
+        for name, url in states.items():
+            if url not in fetched:
+                fetch(name, url)
+
+    return apply_lists(account, states, fetched, policy, now)
+
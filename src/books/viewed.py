@@ -0,0 +1,168 @@
+import logging
+import time
+
+from peewee import JOIN
+
+from src.books.models import Book, Chapter, ViewedChange, batched, database
+from src.utils.manager import Manager
+from src.utils.ratelimit import TokenBucket
+from src.utils.resilience import AuthError, ClientError
+from src.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20
+# A change the site keeps refusing is dropped after this many tries.
+MAX_ATTEMPTS = 5
+
+
+def mark_viewed(book_url: str, titles: list[str], viewed: bool = True):
+    """Set the viewed state of chapters now and queue it for the site.
+
+    Toggling a chapter again replaces its queued change, and going back
+    to the state of the site drops it.
+    """
+    now = time.time()
+
+    with database.atomic():
+        for batch in batched(titles):
+            rows = (
+                Chapter
+                .select(Chapter.id, Chapter.viewed, ViewedChange.site_viewed)
+                .join(Book)
+                .switch(Chapter)
+                .join(ViewedChange, JOIN.LEFT_OUTER)
+                .where((Book.url == book_url) & Chapter.title.in_(batch))
+                .tuples()
+            )
+
+            changes, unchanged = [], []
+            for chapter_id, current, site_viewed in rows:
+                if site_viewed is None:
+                    site_viewed = current
+                if viewed == site_viewed:
+                    unchanged.append(chapter_id)
+                else:
+                    changes.append({
+                        ViewedChange.chapter: chapter_id,
+                        ViewedChange.viewed: viewed,
+                        ViewedChange.site_viewed: site_viewed,
+                        ViewedChange.changed_at: now,
+                    })
+
+            if changes:
+                ViewedChange.insert_many(changes).on_conflict(
+                    conflict_target=[ViewedChange.chapter],
+                    preserve=[ViewedChange.viewed, ViewedChange.changed_at],
+                    update={ViewedChange.attempts: 0},
+                ).execute()
+            if unchanged:
+                ViewedChange.delete().where(
+                    ViewedChange.chapter.in_(unchanged)
+                ).execute()
+
+            Chapter.update(viewed=viewed).where(
+                Chapter.id.in_(
+                    [change[ViewedChange.chapter] for change in changes]
+                    + unchanged
+                )
+            ).execute()
+
+
+def pending_count() -> int:
+    return ViewedChange.select().count()
+
+
+def send_change(manager: Manager, change: tuple) -> bool:
+    """Send a change, counting a try when the site refuses it. An
+    `AuthError` is raised as is, the change was not at fault."""
+    change_id, viewed, changed_at, site_id = change
+    try:
+        manager.set_chapter_viewed(site_id, viewed)
+    except AuthError:
+        raise
+    except ClientError as error:
+        logger.warning('Viewed state of %s refused: %s', site_id, error)
+        with database.atomic():
+            ViewedChange.update(
+                attempts=ViewedChange.attempts + 1,
+            ).where(ViewedChange.id == change_id).execute()
+            ViewedChange.delete().where(
+                (ViewedChange.id == change_id)
+                & (ViewedChange.attempts >= MAX_ATTEMPTS)
+            ).execute()
+        return False
+
+    tracer.count('viewed_sent')
+    with database.atomic():
+        # The site has `viewed` now, the change is done unless it was
+        # toggled again while sending.
+        ViewedChange.update(site_viewed=viewed).where(
+            ViewedChange.id == change_id
+        ).execute()
+        ViewedChange.delete().where(
+            (ViewedChange.id == change_id)
+            & (
+                (ViewedChange.changed_at == changed_at)
+                | (ViewedChange.viewed == ViewedChange.site_viewed)
+            )
+        ).execute()
+    return True
+
+
+def flush_viewed(
+    manager: Manager,
+    bucket: TokenBucket = None,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Send the queued changes to the site, oldest first, in batches read
+    from the database; return how many were sent.
+
+    The batches are pages of the queue only: the site takes one
+    request per chapter, throttled by `bucket`, a request every two
+    seconds by default, so 200 changes take nearly 7 minutes. Every
+    change is tried once per flush, a refused one waits for the next
+    flush. Network and server errors stop the flush after the
+    retries of the request policy, and an `AuthError`, a login the
+    manager could not renew, stops it too; the changes stay queued.
+    """
+    bucket = bucket or TokenBucket(1 / 2)
+    sent = 0
+    # Where the previous batch ended, the refused changes stay behind.
+    after = (float('-inf'), 0)
+
+    while True:
+        changed_at, change_id = after
+        batch = list(
+            ViewedChange
+            .select(
+                ViewedChange.id,
+                ViewedChange.viewed,
+                ViewedChange.changed_at,
+                Chapter.site_id,
+            )
+            .join(Chapter)
+            # Chapters saved before their id was scraped wait for a sync.
+            .where(
+                Chapter.site_id.is_null(False)
+                & (
+                    (ViewedChange.changed_at > changed_at)
+                    | (
+                        (ViewedChange.changed_at == changed_at)
+                        & (ViewedChange.id > change_id)
+                    )
+                )
+            )
+            .order_by(ViewedChange.changed_at, ViewedChange.id)
+            .limit(batch_size)
+            .tuples()
+        )
+        if not batch:
+            break
+
+        for change in batch:
+            bucket.acquire()
+            sent += send_change(manager, change)
+        after = (batch[-1][2], batch[-1][0])
+
+    return sent
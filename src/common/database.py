@@ -1,15 +1,87 @@
+import sqlite3
+from functools import lru_cache
 from os.path import join
 
 from peewee import Model as PeeweeModel
 from peewee import SqliteDatabase
+from playhouse.migrate import SqliteMigrator, migrate
+from playhouse.sqlite_ext import FTS5Model, VirtualModel
 
 from src.utils.path import app_storage_path
 
 database = SqliteDatabase(
     join(app_storage_path(), "database.db"),
+    pragmas={
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'foreign_keys': 1,
+        'cache_size': -8 * 1024,
+    },
 )
 
 
 class Model(PeeweeModel):
     class Meta:
         database = database
+
+
+class SearchModel(FTS5Model):
+    """Full-text index, matching substrings of three or more characters."""
+
+    class Meta:
+        database = database
+        options = {'tokenize': 'trigram'}
+
+
+@lru_cache
+def has_search() -> bool:
+    """Whether SQLite has FTS5 with the trigram tokenizer, from 3.34."""
+    connection = sqlite3.connect(':memory:')
+    try:
+        connection.execute(
+            "CREATE VIRTUAL TABLE test USING fts5(text, tokenize='trigram')"
+        )
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+    return True
+
+
+def create_tables(models: list[type[Model]]):
+    """Create the tables and bring the columns of older versions up to
+    date: missing columns are added and nullable ones lose NOT NULL."""
+    database.create_tables(models, safe=True)
+
+    migrator = SqliteMigrator(database)
+    operations = []
+    for model in models:
+        if issubclass(model, VirtualModel):
+            # Virtual tables can not be altered.
+            continue
+        table = model._meta.table_name
+        columns = {
+            column.name: column
+            for column in database.get_columns(table)
+        }
+        for field in model._meta.sorted_fields:
+            column = columns.get(field.column_name)
+            if column is None:
+                operations.append(
+                    migrator.add_column(table, field.column_name, field)
+                )
+            elif field.null and not column.null:
+                operations.append(
+                    migrator.drop_not_null(table, field.column_name)
+                )
+
+    if not operations:
+        return
+
+    # Changing a column rebuilds its table, which must not cascade.
+    database.pragma('foreign_keys', 0)
+    try:
+        with database.atomic():
+            migrate(*operations)
+    finally:
+        database.pragma('foreign_keys', 1)
@@ -0,0 +1,37 @@
+from importlib import import_module
+from os.path import exists, splitext
+
+from kivy.lang import Builder
+from kivy.properties import DictProperty
+from kivy.uix.screenmanager import ScreenManager
+
+
+class LazyScreenManager(ScreenManager):
+    """Screen manager building each screen the first time it is needed.
+
+    `screen_classes` maps the screen names to `module:Class`; the kv file
+    next to the module is loaded with it, so neither is paid for at
+    startup.
+    """
+
+    screen_classes = DictProperty({})
+
+    def build_screen(self, name: str):
+        module_name, _, class_name = self.screen_classes[name].partition(':')
+        module = import_module(module_name)
+
+        kv_file = splitext(module.__file__)[0] + '.kv'
+        if exists(kv_file) and kv_file not in Builder.files:
+            Builder.load_file(kv_file)
+
+        screen = getattr(module, class_name)(name=name)
+        self.add_widget(screen)
+        return screen
+
+    def get_screen(self, name: str):
+        if not super().has_screen(name) and name in self.screen_classes:
+            return self.build_screen(name)
+        return super().get_screen(name)
+
+    def has_screen(self, name: str) -> bool:
+        return name in self.screen_classes or super().has_screen(name)
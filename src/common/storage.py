@@ -1,9 +1,175 @@
-from os.path import join
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from os.path import exists, join
 
-from kivy.storage.dictstore import DictStore
+from peewee import CharField, TextField
 
+from src.common.database import Model, database
 from src.utils.path import app_storage_path
 
-storage = DictStore(
-    join(app_storage_path(), "storage.data"),
+logger = logging.getLogger(__name__)
+
+DELETED = object()
+# Under the 999 parameters of older SQLite builds, two a row.
+BATCH_SIZE = 400
+
+
+class KeyValue(Model):
+    key = CharField(primary_key=True)
+    value = TextField()
+
+
+class SqliteStore:
+    """Key-value store in the app database, with the API of the Kivy
+    stores it replaces.
+
+    Reads come from memory. Writes are coalesced in memory and flushed
+    together, in one transaction, by a background thread `delay` seconds
+    after the first one; `flush` writes them at once, for `on_pause`.
+    """
+
+    def __init__(self, legacy_path: str = None, delay: float = 0.5):
+        self.legacy_path = legacy_path
+        self.delay = delay
+        self.__values: dict[str, dict] | None = None
+        self.__pending: dict[str, object] = {}
+        self.__batches = 0
+        self.__wakeup = threading.Event()
+        self.__flusher: threading.Thread | None = None
+        self.__lock = threading.RLock()
+        self.__flush_lock = threading.Lock()
+
+    @property
+    def values(self) -> dict[str, dict]:
+        with self.__lock:
+            if self.__values is None:
+                database.create_tables([KeyValue], safe=True)
+                self.migrate_legacy()
+                self.__values = {
+                    row.key: json.loads(row.value)
+                    for row in KeyValue.select()
+                }
+            return self.__values
+
+    def migrate_legacy(self):
+        """Copy the entries of the old DictStore file, once."""
+        if not self.legacy_path or not exists(self.legacy_path):
+            return
+
+        from kivy.storage.dictstore import DictStore
+
+        legacy = DictStore(self.legacy_path)
+        rows = [
+            {'key': key, 'value': json.dumps(legacy.get(key))}
+            for key in legacy.keys()
+        ]
+        with database.atomic():
+            for start in range(0, len(rows), BATCH_SIZE):
+                KeyValue.insert_many(
+                    rows[start:start + BATCH_SIZE]
+                ).on_conflict_ignore().execute()
+        os.replace(self.legacy_path, f'{self.legacy_path}.migrated')
+
+    def exists(self, key: str) -> bool:
+        return key in self.values
+
+    def get(self, key: str) -> dict:
+        return dict(self.values[key])
+
+    def keys(self) -> list[str]:
+        return list(self.values)
+
+    def count(self) -> int:
+        return len(self.values)
+
+    def put(self, key: str, **values):
+        self.put_many({key: values})
+
+    def put_many(self, items: dict[str, dict]):
+        with self.__lock:
+            for key, values in items.items():
+                self.values[key] = dict(values)
+                self.__pending[key] = dict(values)
+            self.__schedule()
+
+    def delete(self, key: str):
+        with self.__lock:
+            del self.values[key]
+            self.__pending[key] = DELETED
+            self.__schedule()
+
+    @contextmanager
+    def batch(self):
+        """Hold the flushes until the block ends, its writes are saved
+        in a single transaction."""
+        with self.__lock:
+            self.__batches += 1
+        try:
+            yield self
+        finally:
+            with self.__lock:
+                self.__batches -= 1
+                self.__schedule()
+
+    def __schedule(self):
+        if self.__batches or not self.__pending:
+            return
+        if self.__flusher is None:
+            self.__flusher = threading.Thread(target=self.__run, daemon=True)
+            self.__flusher.start()
+        self.__wakeup.set()
+
+    def __run(self):
+        # One thread keeps one database connection for every flush.
+        while True:
+            self.__wakeup.wait()
+            # The writes arriving meanwhile go in the same transaction.
+            time.sleep(self.delay)
+            self.__wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Storage flush failed, kept for the next')
+
+    def flush(self):
+        """Write the pending changes now."""
+        with self.__flush_lock:
+            with self.__lock:
+                pending, self.__pending = self.__pending, {}
+
+            if not pending:
+                return
+
+            rows = [
+                {'key': key, 'value': json.dumps(values)}
+                for key, values in pending.items()
+                if values is not DELETED
+            ]
+            deleted = [
+                key for key, values in pending.items() if values is DELETED
+            ]
+
+            try:
+                with database.atomic():
+                    for start in range(0, len(rows), BATCH_SIZE):
+                        KeyValue.insert_many(
+                            rows[start:start + BATCH_SIZE]
+                        ).on_conflict_replace().execute()
+                    for start in range(0, len(deleted), BATCH_SIZE):
+                        KeyValue.delete().where(
+                            KeyValue.key.in_(deleted[start:start + BATCH_SIZE])
+                        ).execute()
+            except Exception:
+                with self.__lock:
+                    # Newer writes of the same keys win.
+                    self.__pending = {**pending, **self.__pending}
+                raise
+
+
+storage = SqliteStore(
+    legacy_path=join(app_storage_path(), "storage.data"),
 )
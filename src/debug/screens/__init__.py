@@ -0,0 +1 @@
+from src.debug.screens.trace import TraceScreen
@@ -0,0 +1,49 @@
+from kivy.app import App
+from kivy.clock import Clock
+from kivy.properties import ListProperty, StringProperty
+from kivy.uix.screenmanager import Screen
+
+from src.utils.tracing import tracer
+
+
+class TraceScreen(Screen):
+    """Where the time of the syncs goes, refreshed while shown."""
+
+    summary = StringProperty('')
+    counters = StringProperty('')
+    spans = ListProperty([])
+    previous = StringProperty('book_list')
+
+    def on_pre_enter(self):
+        self.refresh()
+        self.__event = Clock.schedule_interval(self.refresh, 1)
+
+    def on_leave(self):
+        self.__event.cancel()
+
+    def refresh(self, *args):
+        sink = App.get_running_app().trace_sink
+
+        self.summary = '\n'.join(
+            f'{kind}: {total["count"]} in {total["seconds"] * 1000:.0f} ms'
+            for kind, total in sorted(sink.summary().items())
+        )
+        self.counters = '\n'.join(
+            f'{name}: {value}'
+            for name, value in sorted(tracer.snapshot().items())
+        )
+        self.spans = [
+            {
+                'text': f'{span.kind} {span.name} '
+                        f'{span.duration * 1000:.1f} ms',
+            }
+            for span in reversed(sink.recent())
+        ]
+
+    def clear(self):
+        App.get_running_app().trace_sink.clear()
+        tracer.reset()
+        self.refresh()
+
+    def close(self):
+        self.manager.current = self.previous
@@ -0,0 +1,247 @@
+import heapq
+import logging
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Iterator
+from urllib.parse import urlsplit
+
+from src.books.models import Book, Chapter, batched
+from src.books.sync import (ChapterDiff, ListPolicy, apply_chapters,
+                            fetch_chapters, sync_lists)
+from src.utils import manager as scraper
+from src.utils.manager import ChapterPage, Manager
+from src.utils.ratelimit import HostRateLimiter
+from src.utils.resilience import ClientError, ScraperError
+from src.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PollPolicy:
+    """How often a book is checked: a check finding new chapters halves
+    its interval and one finding nothing doubles it, so the polling goes
+    where the updates are and finished series are left alone. A check
+    with nothing to compare to, `updated` None, keeps the interval."""
+
+    initial_interval: float = 3 * 60 * 60
+    min_interval: float = 60 * 60
+    max_interval: float = 14 * 24 * 60 * 60
+    factor: float = 2.0
+
+    def next_interval(
+        self,
+        interval: float | None,
+        updated: bool | None,
+    ) -> float:
+        if interval is None:
+            interval = self.initial_interval
+        if updated:
+            interval /= self.factor
+        elif updated is not None:
+            interval *= self.factor
+        return min(self.max_interval, max(self.min_interval, interval))
+
+
+@dataclass
+class Account:
+    name: str
+    base_url: str
+    manager: Manager
+
+    @property
+    def site(self) -> str:
+        return urlsplit(self.base_url).netloc
+
+
+@dataclass(order=True)
+class PollTask:
+    # Unread chapters first, then the books updating the most often.
+    priority: tuple
+    book: scraper.Book = field(compare=False)
+
+
+class CrawlScheduler:
+    """Refresh the books of several accounts, or mirrors, side by side.
+
+    Every account has a queue of its due books. A site runs at most
+    `site_concurrency` requests at a time and its free slots go to its
+    accounts in turn, so a large library does not starve the others.
+    Only the books of the lists due by `list_policy` are planned.
+    """
+
+    def __init__(
+        self,
+        accounts: list[Account],
+        policy: PollPolicy = None,
+        site_concurrency: int = 2,
+        rate: float = 1 / 5,
+        list_policy: ListPolicy = None,
+    ):
+        self.accounts = accounts
+        self.policy = policy or PollPolicy()
+        self.list_policy = list_policy or ListPolicy()
+        self.site_concurrency = site_concurrency
+        self.limiter = HostRateLimiter(rate)
+        self.queues: dict[str, list[PollTask]] = {
+            account.name: [] for account in accounts
+        }
+        self.errors: dict[str, ScraperError] = {}
+        self.__planned: set[str] = set()
+        self.__turns = deque(accounts)
+
+    def plan(
+        self,
+        account: Account,
+        books: list[scraper.Book],
+        now: float = None,
+    ) -> int:
+        """Queue the due books of the account, return how many."""
+        now = now or time.time()
+        polls = {}
+        unread = set()
+
+        for batch in batched(book.url for book in books):
+            polls.update(
+                (url, (interval, next_poll))
+                for url, interval, next_poll in Book
+                .select(Book.url, Book.poll_interval, Book.next_poll)
+                .where(Book.url.in_(batch))
+                .tuples()
+            )
+            unread.update(
+                url for url, in Chapter
+                .select(Book.url)
+                .join(Book)
+                .where(Book.url.in_(batch) & ~Chapter.viewed)
+                .distinct()
+                .tuples()
+            )
+
+        queue = self.queues[account.name]
+        queued = 0
+        for book in books:
+            interval, next_poll = polls.get(book.url, (None, None))
+            if book.url in self.__planned:
+                continue
+            if next_poll is not None and next_poll > now:
+                tracer.count('polls_deferred')
+                continue
+
+            self.__planned.add(book.url)
+            heapq.heappush(queue, PollTask(
+                (book.url not in unread, interval or 0.0, book.url),
+                book,
+            ))
+            queued += 1
+
+        return queued
+
+    def reschedule(
+        self,
+        book_url: str,
+        updated: bool | None,
+        now: float = None,
+    ):
+        now = now or time.time()
+        interval = self.policy.next_interval(
+            Book.select(Book.poll_interval).where(Book.url == book_url).scalar(),
+            updated,
+        )
+        Book.update(
+            poll_interval=interval,
+            next_poll=now + interval,
+        ).where(Book.url == book_url).execute()
+
+    def __fetch(self, account: Account, book: scraper.Book) -> ChapterPage:
+        self.limiter.acquire(account.base_url)
+        return fetch_chapters(account.manager, book.url)
+
+    def __dispatch(
+        self,
+        executor: ThreadPoolExecutor,
+        running: dict[str, int],
+        futures: dict[Future, tuple[Account, PollTask]],
+    ):
+        """Give the free slots of the sites to their accounts in turn."""
+        idle = 0
+        while idle < len(self.__turns):
+            account = self.__turns[0]
+            self.__turns.rotate(-1)
+            queue = self.queues[account.name]
+
+            if (
+                not queue
+                or running.get(account.site, 0) >= self.site_concurrency
+            ):
+                idle += 1
+                continue
+
+            task = heapq.heappop(queue)
+            running[account.site] = running.get(account.site, 0) + 1
+            future = executor.submit(self.__fetch, account, task.book)
+            futures[future] = account, task
+            idle = 0
+
+    def run(self) -> Iterator[tuple[Account, scraper.Book, ChapterDiff]]:
+        """Refresh the due lists of every account and the chapters of
+        their due books.
+
+        The pages are fetched by the workers and saved by the caller's
+        thread. A failing account is left for the next run, its error in
+        `errors`; the others go on.
+        """
+        for account in self.accounts:
+            try:
+                lists = sync_lists(
+                    account.manager,
+                    account.name,
+                    self.list_policy,
+                )
+                self.plan(account, lists.books)
+            except ScraperError as error:
+                logger.warning('Skipping %s: %s', account.name, error)
+                self.errors[account.name] = error
+
+        sites = {account.site for account in self.accounts}
+        running: dict[str, int] = {}
+        futures: dict[Future, tuple[Account, PollTask]] = {}
+
+        with ThreadPoolExecutor(
+            max_workers=self.site_concurrency * len(sites) or 1,
+        ) as executor:
+            while True:
+                self.__dispatch(executor, running, futures)
+                if not futures:
+                    break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    account, task = futures.pop(future)
+                    running[account.site] -= 1
+                    book_url = task.book.url
+
+                    try:
+                        page = future.result()
+                    except ClientError as error:
+                        # A removed or private book, checked again later.
+                        logger.warning('Skipping %s: %s', book_url, error)
+                        diff = ChapterDiff(book_url)
+                    except ScraperError as error:
+                        # The site is failing, its books wait for the
+                        # next run.
+                        logger.warning('Stopping %s: %s', account.name, error)
+                        self.errors[account.name] = error
+                        self.queues[account.name].clear()
+                        continue
+                    else:
+                        diff = apply_chapters(book_url, page)
+
+                    self.reschedule(
+                        book_url,
+                        None if diff.first_sync else
+                        bool(diff.new_chapters or diff.new_options),
+                    )
+                    yield account, task.book, diff
@@ -0,0 +1,322 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from os.path import join
+from urllib.parse import urlsplit
+
+from kivy import platform
+from kivy.logger import Logger
+
+from src.auth.models import User
+from src.auth.session import Session
+from src.books.models import create_tables
+from src.books.sync import LIST_INTERVALS, ChapterDiff, ListPolicy
+from src.books.viewed import flush_viewed
+from src.sync.scheduler import Account, CrawlScheduler
+from src.utils.manager import Book
+from src.utils.path import app_storage_path
+from src.utils.ratelimit import TokenBucket
+from src.utils.resilience import ScraperError
+from src.utils.tracing import JsonLinesSink, tracer
+
+
+@dataclass
+class SyncOptions:
+    base_url: str = 'https://visortmo.com'
+    # Other sites of the same library, every account is used on each.
+    mirrors: list[str] = field(default_factory=list)
+    site_concurrency: int = 2
+    interval: float = 3 * 60 * 60
+    # Seconds between the checks of a list, by its name, over the
+    # defaults of `LIST_INTERVALS`.
+    list_intervals: dict[str, float] = field(default_factory=dict)
+    max_backoff: float = 24 * 60 * 60
+    rate: float = 1 / 5
+    min_battery: float = 20.0
+    unmetered_only: bool = False
+    once: bool = False
+    trace_path: str | None = None
+
+    @classmethod
+    def from_json(cls, value: str) -> 'SyncOptions':
+        return cls(**json.loads(value or '{}'))
+
+
+def is_network_available(unmetered_only: bool = False) -> bool:
+    if platform != 'android':
+        return True
+
+    from jnius import autoclass  # pylint: disable=import-error
+
+    Context = autoclass('android.content.Context')
+    PythonService = autoclass('org.kivy.android.PythonService')
+    connectivity = PythonService.mService.getSystemService(
+        Context.CONNECTIVITY_SERVICE,
+    )
+    info = connectivity.getActiveNetworkInfo()
+
+    if info is None or not info.isConnected():
+        return False
+
+    return not (unmetered_only and connectivity.isActiveNetworkMetered())
+
+
+def keep_service_running():
+    """Have Android restart the service when it is killed, its
+    foreground notification is shown by python-for-android."""
+    if platform != 'android':
+        return
+
+    from jnius import autoclass  # pylint: disable=import-error
+
+    PythonService = autoclass('org.kivy.android.PythonService')
+    PythonService.mService.setAutoRestartService(True)
+
+
+def is_battery_available(min_battery: float) -> bool:
+    from plyer import battery
+
+    try:
+        status = battery.status
+    except NotImplementedError:
+        return True
+
+    if status.get('isCharging'):
+        return True
+
+    percentage = status.get('percentage')
+    return percentage is None or percentage >= min_battery
+
+
+def notify_new_chapters(book: Book, diff: ChapterDiff):
+    from plyer import notification
+
+    count = len(diff.new_chapters)
+    message = (
+        diff.new_chapters[0].title
+        if count == 1 else
+        f'{count} new chapters'
+    )
+
+    try:
+        notification.notify(title=book.title, message=message)
+    except NotImplementedError:
+        Logger.info(f'SyncService: {book.title}: {message}')
+
+
+def cookies_path(base_url: str, email: str, default: bool = False) -> str:
+    """Get where the cookies of an account are kept, the default one
+    shares them with the app."""
+    if default:
+        return join(app_storage_path(), 'cookies.json')
+
+    key = hashlib.sha1(f'{urlsplit(base_url).netloc}:{email}'.encode())
+    return join(app_storage_path(), f'cookies-{key.hexdigest()[:12]}.json')
+
+
+def account_name(user: User, base_url: str) -> str:
+    return f'{user.email}@{urlsplit(base_url).netloc}'
+
+
+class SyncService:
+    """Poll the lists of the users and notify about new chapters."""
+
+    def __init__(self, options: SyncOptions, users: list[User], notify=None):
+        self.options = options
+        self.users = users
+        self.notify = notify or notify_new_chapters
+        self.failures = 0
+        self.running = True
+
+    def can_sync(self) -> bool:
+        return (
+            is_network_available(self.options.unmetered_only)
+            and is_battery_available(self.options.min_battery)
+        )
+
+    def login(self, stack: ExitStack) -> list[Account]:
+        """Open a session for every user on every site, skipping the
+        ones failing to login."""
+        accounts = []
+
+        for base_url in [self.options.base_url, *self.options.mirrors]:
+            for user in self.users:
+                default = (
+                    base_url == self.options.base_url
+                    and user is self.users[0]
+                )
+                session = Session(
+                    base_url,
+                    cookies_path(base_url, user.email, default),
+                )
+                stack.enter_context(session.client)
+                name = account_name(user, base_url)
+
+                try:
+                    session.ensure_login(user)
+                except ScraperError as e:
+                    Logger.warning(f'SyncService: {name}: login failed: {e}')
+                    continue
+                accounts.append(Account(name, base_url, session.manager))
+
+        if not accounts:
+            raise ScraperError('No account could login')
+        return accounts
+
+    def sync(self) -> list[ChapterDiff]:
+        diffs = []
+
+        counters = tracer.snapshot()
+
+        with ExitStack() as stack, tracer.span('sync', 'sync') as span:
+            accounts = self.login(stack)
+            self.send_viewed(accounts)
+
+            scheduler = CrawlScheduler(
+                accounts,
+                site_concurrency=self.options.site_concurrency,
+                rate=self.options.rate,
+                list_policy=ListPolicy(intervals={
+                    **LIST_INTERVALS,
+                    **self.options.list_intervals,
+                }),
+            )
+
+            # The next check of a book is saved once it is done, an
+            # interrupted sync resumes with the books still due.
+            for _, book, diff in scheduler.run():
+                if diff.new_chapters:
+                    self.notify(book, diff)
+                diffs.append(diff)
+
+            span.attributes['accounts'] = len(scheduler.accounts)
+            span.attributes['books'] = len(diffs)
+            span.attributes.update(tracer.since(counters))
+
+        if scheduler.errors and not diffs:
+            raise next(iter(scheduler.errors.values()))
+        for name, error in scheduler.errors.items():
+            Logger.warning(f'SyncService: {name}: sync interrupted: {error}')
+
+        return diffs
+
+    def send_viewed(self, accounts: list[Account]):
+        """Send the viewed states set in the app before syncing, so the
+        sync finds them on the site.
+
+        They are the states of the user of the app, only sent through
+        its account on the main site.
+        """
+        name = account_name(self.users[0], self.options.base_url)
+        account = next(
+            (account for account in accounts if account.name == name),
+            None,
+        )
+        if account is None:
+            Logger.warning(
+                f'SyncService: viewed states kept queued, {name} is not '
+                'logged in'
+            )
+            return
+
+        try:
+            sent = flush_viewed(account.manager, TokenBucket(self.options.rate))
+        except ScraperError as e:
+            Logger.warning(f'SyncService: viewed states kept queued: {e}')
+        else:
+            if sent:
+                Logger.info(f'SyncService: {sent} viewed states sent')
+
+    def next_delay(self) -> float:
+        if not self.failures:
+            return self.options.interval
+
+        backoff = self.options.interval * 2 ** (self.failures - 1)
+        delay = min(self.options.max_backoff, backoff)
+        return random.uniform(delay / 2, delay)
+
+    def run_once(self):
+        if not self.can_sync():
+            Logger.info('SyncService: waiting for network or battery')
+            return
+
+        try:
+            diffs = self.sync()
+        except ScraperError as e:
+            # The books checked keep their next poll, the next run
+            # resumes with the ones still due.
+            self.failures += 1
+            Logger.warning(f'SyncService: sync interrupted: {e}')
+        except Exception as e:
+            self.failures += 1
+            Logger.exception(f'SyncService: sync failed: {e}')
+        else:
+            self.failures = 0
+            Logger.info(f'SyncService: {len(diffs)} books synced')
+
+    def run(self):
+        create_tables()
+        if not self.options.once:
+            keep_service_running()
+
+        while self.running:
+            self.run_once()
+
+            if self.options.once:
+                break
+
+            time.sleep(self.next_delay())
+
+
+def main(argv: list[str] = None):
+    # On android the options arrive as the service argument.
+    options = SyncOptions.from_json(
+        os.environ.get('PYTHON_SERVICE_ARGUMENT')
+    )
+
+    parser = argparse.ArgumentParser(description='Sync the book lists.')
+    parser.add_argument('--base-url', default=options.base_url)
+    parser.add_argument('--interval', type=float, default=options.interval)
+    parser.add_argument('--once', action='store_true', default=options.once)
+    parser.add_argument('--mirror', action='append', dest='mirrors')
+    parser.add_argument('--email')
+    parser.add_argument('--password')
+    parser.add_argument(
+        '--account',
+        action='append',
+        nargs=2,
+        default=[],
+        metavar=('EMAIL', 'PASSWORD'),
+        help='another user to sync, can be repeated',
+    )
+    parser.add_argument('--trace', default=options.trace_path)
+    args = parser.parse_args(argv)
+
+    options = SyncOptions(**{
+        **asdict(options),
+        'base_url': args.base_url,
+        'interval': args.interval,
+        'once': args.once,
+        'mirrors': args.mirrors or options.mirrors,
+        'trace_path': args.trace,
+    })
+
+    if options.trace_path:
+        tracer.add_sink(JsonLinesSink(options.trace_path))
+
+    if args.email:
+        users = [User(args.email, args.password)]
+    else:
+        users = [User.load()]
+    users.extend(User(email, password) for email, password in args.account)
+
+    SyncService(options, users).run()
+
+
+if __name__ == '__main__':
+    main()
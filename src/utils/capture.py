@@ -0,0 +1,157 @@
+import time
+from typing import Callable
+
+Region = tuple[int, int, int, int]
+
+
+class CaptureBackend:
+    """Source of rgba pixels, rows top first, for a region of a page."""
+
+    def content_size(self) -> tuple[int, int]:
+        """Get the size of the whole page in pixels."""
+        raise NotImplementedError
+
+    def viewport(self) -> Region:
+        """Get the region of the page currently on screen."""
+        raise NotImplementedError
+
+    def capture(self, region: Region) -> memoryview:
+        """Draw `region` into a reused buffer and return a view of it.
+
+        The view is only valid until the next call.
+        """
+        raise NotImplementedError
+
+
+class FakeCaptureBackend(CaptureBackend):
+    """Backend copying from an in-memory page, to benchmark off device."""
+
+    def __init__(self, width: int = 1080, height: int = 20000):
+        self.width = width
+        self.height = height
+        self.page = bytearray(range(256)) * (width * height * 4 // 256 + 1)
+        self.buffer = bytearray()
+
+    def content_size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def viewport(self) -> Region:
+        return 0, 0, self.width, min(self.height, 2400)
+
+    def draw(self, region: Region, output: memoryview):
+        x, y, width, height = region
+        stride = self.width * 4
+        if x == 0 and width == self.width:
+            output[:] = self.page[y * stride:(y + height) * stride]
+            return
+        for row in range(height):
+            start = (y + row) * stride + x * 4
+            output[row * width * 4:(row + 1) * width * 4] = (
+                self.page[start:start + width * 4]
+            )
+
+    def capture(self, region: Region) -> memoryview:
+        _, _, width, height = region
+        size = width * height * 4
+        if len(self.buffer) < size:
+            self.buffer = bytearray(size)
+
+        view = memoryview(self.buffer)[:size]
+        self.draw(region, view)
+        return view
+
+
+def iter_tiles(
+    content_size: tuple[int, int],
+    tile_height: int,
+    region: Region = None,
+):
+    """Split a region of the page, the whole page by default, in tiles."""
+    x, y, width, height = region or (0, 0, *content_size)
+    for top in range(y, y + height, tile_height):
+        yield x, top, width, min(tile_height, y + height - top)
+
+
+class TextureSink:
+    """Blit captured tiles into textures kept between captures."""
+
+    def __init__(self):
+        self.textures = {}
+
+    def texture(self, index: int, size: tuple[int, int]):
+        from kivy.graphics.texture import Texture
+
+        texture = self.textures.get(index)
+        if texture is None or tuple(texture.size) != tuple(size):
+            texture = Texture.create(size=size, colorfmt='rgba')
+            # The rows arrive top first, flip the coordinates once
+            # instead of the pixels on every capture.
+            texture.flip_vertical()
+            self.textures[index] = texture
+        return texture
+
+    def __call__(self, index: int, region: Region, data: memoryview):
+        _, _, width, height = region
+        texture = self.texture(index, (width, height))
+        texture.blit_buffer(data, colorfmt='rgba', bufferfmt='ubyte')
+        return texture
+
+
+class CapturePipeline:
+    """Capture a page region by region without copying the pixels.
+
+    The backend reuses its buffer and the sink its textures, so a
+    capture allocates nothing once warm.
+    """
+
+    def __init__(
+        self,
+        backend: CaptureBackend,
+        sink: Callable[[int, Region, memoryview], object] = None,
+        tile_height: int = 2048,
+    ):
+        self.backend = backend
+        self.sink = sink or TextureSink()
+        self.tile_height = tile_height
+
+    def capture(self, region: Region = None):
+        """Capture a region, the viewport by default."""
+        region = region or self.backend.viewport()
+        return self.sink(0, region, self.backend.capture(region))
+
+    def capture_page(self, region: Region = None) -> list:
+        """Capture a tall region, the whole page by default, in tiles."""
+        return [
+            self.sink(index, tile, self.backend.capture(tile))
+            for index, tile in enumerate(iter_tiles(
+                self.backend.content_size(),
+                self.tile_height,
+                region,
+            ))
+        ]
+
+
+def legacy_capture(backend: FakeCaptureBackend) -> bytes:
+    """The copies `WebView.capture` used to make, for comparison."""
+    width, height = backend.content_size()
+    bitmap = bytearray(width * height * 4)
+    backend.draw((0, 0, width, height), memoryview(bitmap))
+    buffer = bytearray(bitmap)
+    return bytes(buffer)
+
+
+if __name__ == '__main__':
+    backend = FakeCaptureBackend()
+    width, height = backend.content_size()
+    pipeline = CapturePipeline(backend, sink=lambda index, region, data: data)
+
+    for name, capture in (
+        ('legacy copies', lambda: legacy_capture(backend)),
+        ('tiled pipeline', pipeline.capture_page),
+    ):
+        capture()
+        start = time.perf_counter()
+        for _ in range(10):
+            capture()
+        elapsed = (time.perf_counter() - start) / 10
+        print(f'{name}: {elapsed * 1000:.1f} ms for {width}x{height}')
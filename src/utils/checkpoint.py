@@ -0,0 +1,83 @@
+import json
+import os
+import time
+from os.path import exists
+
+
+class Checkpoint:
+    """Progress of a long run appended to a JSON lines file after every
+    step, so an interrupted run resumes instead of starting over.
+
+    The first line holds when the run started; a checkpoint older than
+    `max_age` seconds is dropped as too stale to resume. A line cut by a
+    crash is ignored.
+    """
+
+    def __init__(self, path: str, max_age: float = 24 * 60 * 60):
+        self.path = path
+        self.max_age = max_age
+        self.started = time.time()
+        self.values: dict = {}
+        self.done: dict = {}
+        self.load()
+
+    def load(self):
+        if not exists(self.path):
+            return
+
+        with open(self.path) as file:
+            lines = file.read().splitlines()
+
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, ValueError):
+            header = {'started': 0}
+        if time.time() - header['started'] > self.max_age:
+            os.remove(self.path)
+            return
+
+        self.started = header['started']
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if 'done' in entry:
+                self.done[entry['done']] = entry.get('value')
+            else:
+                self.values[entry['key']] = entry.get('value')
+
+    def append(self, entry: dict):
+        if not exists(self.path):
+            with open(self.path, 'w') as file:
+                file.write(json.dumps({'started': self.started}) + '\n')
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(entry, default=str) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.done or self.values)
+
+    def get(self, key: str, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key: str, value=True):
+        self.values[key] = value
+        self.append({'key': key, 'value': value})
+
+    def is_done(self, key: str) -> bool:
+        return key in self.done
+
+    def mark_done(self, key: str, value=None):
+        self.done[key] = value
+        self.append({'done': key, 'value': value})
+
+    def clear(self):
+        """End the run, the next one starts from the beginning."""
+        self.started = time.time()
+        self.values.clear()
+        self.done.clear()
+        if exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from os.path import exists, getsize, join
+
+from httpx import Client
+from kivy.graphics.texture import Texture
+from kivy.properties import ListProperty, StringProperty
+from kivy.uix.image import Image
+
+from src.utils.executor import Worker
+from src.utils.manager import RandomUserAgent
+from src.utils.tracing import tracer
+
+
+class DiskCache:
+    """Files named by the hash of their key, evicting the least used."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(
+            getsize(join(directory, name))
+            for name in os.listdir(directory)
+            if not name.endswith('.tmp')
+        )
+
+    def path(self, key: str) -> str:
+        return join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key: str) -> bytes | None:
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        # The modification time orders the entries for the eviction.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted since it was read.
+            pass
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self.path(key)
+        # One file per thread, two loads of a key may write together.
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+
+        with self.__lock:
+            if exists(path):
+                self.size -= getsize(path)
+            os.replace(tmp_path, path)
+            self.size += len(data)
+            self.evict()
+
+    def evict(self):
+        if self.size <= self.max_bytes:
+            return
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            # Files still being written are not in the size yet.
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        for _, size, path in sorted(entries):
+            if self.size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.size -= size
+
+
+class TextureCache:
+    """Least recently used textures, bounded by their decoded size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.textures: OrderedDict[tuple, Texture] = OrderedDict()
+
+    def get(self, key: tuple) -> Texture | None:
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.textures.move_to_end(key)
+        return texture
+
+    def put(self, key: tuple, texture: Texture):
+        if key in self.textures:
+            self.size -= self.texture_size(self.textures.pop(key))
+        self.textures[key] = texture
+        self.size += self.texture_size(texture)
+
+        while self.size > self.max_bytes and len(self.textures) > 1:
+            _, evicted = self.textures.popitem(last=False)
+            self.size -= self.texture_size(evicted)
+
+    @staticmethod
+    def texture_size(texture: Texture) -> int:
+        width, height = texture.size
+        return width * height * 4
+
+
+def make_thumbnail(data: bytes, size: tuple[int, int]) -> bytes:
+    """Downscale an image to fit `size`, encoded as jpeg."""
+    from PIL import Image as PILImage
+
+    image = PILImage.open(BytesIO(data))
+    image.draft('RGB', size)
+    image = image.convert('RGB')
+    image.thumbnail(size)
+
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=85)
+    return output.getvalue()
+
+
+def decode_thumbnail(data: bytes) -> tuple[tuple[int, int], bytes]:
+    """Decode a thumbnail into rgba pixels, bottom row first for Kivy."""
+    from PIL import Image as PILImage
+
+    image = PILImage.open(BytesIO(data)).convert('RGBA')
+    image = image.transpose(PILImage.Transpose.FLIP_TOP_BOTTOM)
+    return image.size, image.tobytes()
+
+
+class CoverCache:
+    """Download covers once, keep downscaled copies on disk and textures
+    of the visible ones in memory."""
+
+    def __init__(
+        self,
+        client: Client,
+        worker: Worker,
+        directory: str,
+        disk_bytes: int = 64 * 1024 * 1024,
+        memory_bytes: int = 32 * 1024 * 1024,
+    ):
+        self.client = client
+        self.worker = worker
+        self.disk = DiskCache(directory, disk_bytes)
+        self.memory = TextureCache(memory_bytes)
+
+    def load_pixels(self, url: str, size: tuple[int, int]):
+        key = f'{size[0]}x{size[1]}:{url}'
+        thumbnail = self.disk.get(key)
+
+        if thumbnail is None:
+            tracer.count('cover_downloads')
+            response = self.client.get(
+                url,
+                headers={'User-Agent': RandomUserAgent()},
+            )
+            response.raise_for_status()
+            thumbnail = make_thumbnail(response.content, size)
+            self.disk.put(key, thumbnail)
+        else:
+            tracer.count('cover_disk_hits')
+
+        return decode_thumbnail(thumbnail)
+
+    def load(self, url: str, size: tuple[int, int], callback, owner=None):
+        """Call `callback` on the main thread with the cover texture."""
+        size = tuple(int(value) for value in size)
+        texture = self.memory.get((url, size))
+
+        if texture is not None:
+            tracer.count('cover_memory_hits')
+            callback(texture)
+            return
+
+        def on_pixels(pixels):
+            texture = self.memory.get((url, size))
+            if texture is None:
+                texture_size, data = pixels
+                texture = Texture.create(size=texture_size, colorfmt='rgba')
+                texture.blit_buffer(data, colorfmt='rgba', bufferfmt='ubyte')
+                self.memory.put((url, size), texture)
+            callback(texture)
+
+        self.worker.submit(
+            self.load_pixels,
+            url,
+            size,
+            key=('cover', url, size),
+            owner=owner,
+            on_result=on_pixels,
+        )
+
+    def cancel(self, owner):
+        self.worker.cancel(owner)
+
+
+class CoverImage(Image):
+    """Image showing the cover of `url`, usable as a RecycleView view."""
+
+    url = StringProperty('')
+    thumbnail_size = ListProperty([180, 270])
+
+    def on_url(self, instance, url):
+        from kivy.app import App
+
+        covers: CoverCache = App.get_running_app().covers
+        # Recycled views change url before older loads finish.
+        covers.cancel(self)
+        self.texture = None
+
+        if url:
+            covers.load(
+                url,
+                self.thumbnail_size,
+                lambda texture: self.set_cover(url, texture),
+                owner=self,
+            )
+
+    def set_cover(self, url: str, texture: Texture):
+        if url == self.url:
+            self.texture = texture
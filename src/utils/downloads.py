@@ -0,0 +1,131 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from os.path import exists, getsize
+
+from httpx import Client
+
+from src.utils.manager import RandomUserAgent
+from src.utils.ratelimit import TokenBucket
+from src.utils.tracing import tracer
+
+re_content_range = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+class DownloadError(Exception):
+    pass
+
+
+@dataclass
+class DownloadItem:
+    url: str
+    path: str
+    sha256: str | None = None
+    size: int | None = None
+
+    @property
+    def part_path(self) -> str:
+        return f'{self.path}.part'
+
+    def is_complete(self) -> bool:
+        """Whether the file exists and matches the recorded checksum."""
+        if not exists(self.path):
+            return False
+        if self.size is not None and getsize(self.path) != self.size:
+            return False
+        return self.sha256 is None or file_sha256(self.path) == self.sha256
+
+
+def file_sha256(path: str, hasher=None) -> str:
+    hasher = hasher or hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(1024 * 1024):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class Downloader:
+    """Download files concurrently, resuming partial ones with Range."""
+
+    def __init__(
+        self,
+        client: Client,
+        concurrency: int = 4,
+        bucket: TokenBucket = None,
+        chunk_size: int = 64 * 1024,
+    ):
+        self.client = client
+        self.concurrency = concurrency
+        self.bucket = bucket
+        self.chunk_size = chunk_size
+
+    def download(self, item: DownloadItem, headers: dict = None) -> DownloadItem:
+        if item.is_complete():
+            return item
+
+        os.makedirs(os.path.dirname(item.path) or '.', exist_ok=True)
+        offset = getsize(item.part_path) if exists(item.part_path) else 0
+        headers = {'User-Agent': RandomUserAgent(), **(headers or {})}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+
+        if self.bucket:
+            self.bucket.acquire()
+
+        with tracer.span(item.url, 'download') as span, self.client.stream(
+            'GET',
+            item.url,
+            headers=headers,
+        ) as response:
+            span.attributes['status'] = response.status_code
+            if response.status_code == 416:
+                # The part file already holds the whole content.
+                total = offset
+            elif response.status_code == 206:
+                total = self.__check_range(response, offset)
+            elif response.status_code == 200:
+                offset = 0
+                length = response.headers.get('Content-Length')
+                total = int(length) if length else None
+            else:
+                raise DownloadError(
+                    f'{item.url}: unexpected status {response.status_code}'
+                )
+
+            if response.status_code != 416:
+                with open(item.part_path, 'ab' if offset else 'wb') as file:
+                    for chunk in response.iter_bytes(self.chunk_size):
+                        file.write(chunk)
+                tracer.count('download_bytes', response.num_bytes_downloaded)
+
+        size = getsize(item.part_path)
+        if total is not None and size != total:
+            raise DownloadError(f'{item.url}: got {size} of {total} bytes')
+
+        item.size = size
+        item.sha256 = file_sha256(item.part_path)
+        os.replace(item.part_path, item.path)
+        return item
+
+    def download_all(
+        self,
+        items: list[DownloadItem],
+        headers: dict = None,
+    ) -> list[DownloadItem]:
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(
+                lambda item: self.download(item, headers),
+                items,
+            ))
+
+    @staticmethod
+    def __check_range(response, offset: int) -> int | None:
+        matches = re_content_range.match(
+            response.headers.get('Content-Range', '')
+        )
+        if not matches or int(matches.group(1)) != offset:
+            raise DownloadError(f'{response.url}: bad range for {offset}')
+        total = matches.group(3)
+        return None if total == '*' else int(total)
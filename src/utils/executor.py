@@ -0,0 +1,187 @@
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Iterable
+
+from kivy.clock import Clock
+
+
+class Callback:
+    def __init__(self, owner, on_result=None, on_error=None, on_items=None):
+        self.owner = owner
+        self.on_result = on_result
+        self.on_error = on_error
+        self.on_items = on_items
+        self.active = True
+
+
+class Task:
+    """A running call shared by every caller that asked for the same key."""
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.future: Future = None
+        self.cancelled = threading.Event()
+        self.callbacks: list[Callback] = []
+
+
+class Worker:
+    """Run blocking calls off the Kivy main thread.
+
+    Callbacks are dispatched back on the main thread through `Clock`.
+    Calls sharing a `key` while one is in flight are coalesced into the
+    same task, and `cancel(owner)` drops the callbacks registered by an
+    owner, typically a screen being left.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.__executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='worker',
+        )
+        self.__lock = threading.Lock()
+        self.__tasks: dict[Hashable, Task] = {}
+        self.__callbacks: set[Callback] = set()
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        key: Hashable = None,
+        owner: Any = None,
+        on_result: Callable[[Any], None] = None,
+        on_error: Callable[[Exception], None] = None,
+        **kwargs,
+    ) -> Future:
+        """Call `fn` in the pool, `on_result` gets its return value."""
+        return self.__submit(
+            key,
+            Callback(owner, on_result, on_error),
+            lambda task: fn(*args, **kwargs),
+        )
+
+    def submit_iter(
+        self,
+        fn: Callable[..., Iterable],
+        *args,
+        key: Hashable = None,
+        owner: Any = None,
+        on_items: Callable[[list], None] = None,
+        on_result: Callable[[list], None] = None,
+        on_error: Callable[[Exception], None] = None,
+        batch_size: int = 50,
+        **kwargs,
+    ) -> Future:
+        """Consume the iterable returned by `fn` in the pool.
+
+        `on_items` gets the items in batches while they are produced and
+        `on_result` gets all of them at the end.
+        """
+
+        def consume(task: Task) -> list:
+            items, batch = [], []
+            for item in fn(*args, **kwargs):
+                if task.cancelled.is_set():
+                    raise CancelledError()
+                items.append(item)
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    self.__dispatch_items(task, batch)
+                    batch = []
+            if batch:
+                self.__dispatch_items(task, batch)
+            return items
+
+        return self.__submit(
+            key,
+            Callback(owner, on_result, on_error, on_items),
+            consume,
+        )
+
+    def cancel(self, owner: Any):
+        """Drop the callbacks of `owner`, stopping tasks nobody awaits."""
+        with self.__lock:
+            for callback in list(self.__callbacks):
+                if callback.owner is owner:
+                    callback.active = False
+                    self.__callbacks.discard(callback)
+
+            for task in list(self.__tasks.values()):
+                if not any(callback.active for callback in task.callbacks):
+                    task.cancelled.set()
+                    task.future.cancel()
+                    del self.__tasks[task.key]
+
+    def shutdown(self):
+        with self.__lock:
+            for task in self.__tasks.values():
+                task.cancelled.set()
+            self.__tasks.clear()
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def __submit(self, key: Hashable, callback: Callback, run: Callable) -> Future:
+        with self.__lock:
+            task = self.__tasks.get(key) if key is not None else None
+            created = task is None
+
+            if created:
+                task = Task(key if key is not None else object())
+                self.__tasks[task.key] = task
+
+            task.callbacks.append(callback)
+            self.__callbacks.add(callback)
+
+            if created:
+                task.future = self.__executor.submit(run, task)
+
+        if created:
+            # Runs right away when the call already finished.
+            task.future.add_done_callback(
+                lambda future: self.__done(task, future)
+            )
+
+        return task.future
+
+    def __done(self, task: Task, future: Future):
+        with self.__lock:
+            if self.__tasks.get(task.key) is task:
+                del self.__tasks[task.key]
+
+        cancelled = future.cancelled() or task.cancelled.is_set()
+
+        for callback in task.callbacks:
+            if cancelled:
+                fn, value = None, None
+            elif future.exception() is None:
+                fn, value = callback.on_result, future.result()
+            else:
+                fn, value = callback.on_error, future.exception()
+
+            if fn:
+                self.__schedule(callback, fn, value, final=True)
+            else:
+                self.__forget(callback)
+
+    def __dispatch_items(self, task: Task, items: list):
+        for callback in task.callbacks:
+            if callback.on_items:
+                self.__schedule(callback, callback.on_items, items)
+
+    def __schedule(
+        self,
+        callback: Callback,
+        fn: Callable,
+        value: Any,
+        final: bool = False,
+    ):
+        def dispatch(dt):
+            if final:
+                self.__forget(callback)
+            # The owner may have been left since the value was produced.
+            if callback.active:
+                fn(value)
+
+        Clock.schedule_once(dispatch)
+
+    def __forget(self, callback: Callback):
+        with self.__lock:
+            self.__callbacks.discard(callback)
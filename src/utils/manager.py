@@ -1,38 +1,96 @@
+import hashlib
+import logging
 import random
-import re
+import sys
+import threading
 import time
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Iterator
+from urllib.parse import unquote
 
-from bs4 import BeautifulSoup
-from faker import Faker
 from itertools import chain
-from httpx import Client
 
-re_url_style = re.compile(r'url\(([^)]+)\)')
+from src.utils.resilience import (AuthError, ClientError, RequestPolicy,
+                                  check_response, is_login_url)
+from src.utils.tracing import tracer
 
+if TYPE_CHECKING:
+    from httpx import Client, Response
 
-@dataclass
+    from src.utils.checkpoint import Checkpoint
+    from src.utils.parsers import Parser
+
+logger = logging.getLogger(__name__)
+
+# The requests of the chapter-viewed-icon script of the site. Not
+# verified against the site: the saved pages only have the icons, not
+# the script, and the paths are taken from what it was seen to send.
+# The site has no request for several chapters at once.
+VIEWED_URLS = {
+    True: '/chapter_viewed/{}',
+    False: '/chapter_unviewed/{}',
+}
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str) -> date | None:
+    """Parse an iso date once, sharing the object between options."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True, slots=True)
 class Group:
     title: str
     url: str
 
 
-@dataclass
+interned_groups: dict[Group, Group] = {}
+
+
+def intern_group(group: Group) -> Group:
+    """Get the shared instance of an equal group."""
+    return interned_groups.setdefault(group, group)
+
+
+@dataclass(frozen=True, slots=True)
 class Option:
-    groups: list[Group]
-    date: str
+    groups: tuple[Group, ...]
+    date: date | None
     lang: str
     chapter_url: str
 
+    def __post_init__(self):
+        # Options repeat the same groups, languages and dates across a
+        # library, keep one object of each.
+        object.__setattr__(
+            self,
+            'groups',
+            tuple(map(intern_group, self.groups)),
+        )
+        if isinstance(self.date, str):
+            object.__setattr__(self, 'date', parse_date(self.date))
+        object.__setattr__(self, 'lang', sys.intern(self.lang))
+
 
-@dataclass
+@dataclass(slots=True)
 class Chapter:
     title: str
     viewed: bool
-    options: list[Option]
+    options: tuple[Option, ...]
+    # The id of the chapter on the site, to mark it viewed.
+    site_id: str | None = None
 
+    def __post_init__(self):
+        self.options = tuple(self.options)
 
-@dataclass
+
+@dataclass(slots=True)
 class Book:
     title: str
     url: str
@@ -41,18 +99,69 @@ class Book:
     chapters: list[Chapter] = field(default_factory=list)
 
 
-class RandomUserAgent:
-    def __init__(self):
-        self.fake = Faker()
+@dataclass(slots=True)
+class BookPage:
+    books: list[Book]
+    next_page: str | None = None
+    page_links: list[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ChapterPage:
+    etag: str | None
+    last_modified: str | None
+    digest: str | None
+    chapters: list[Chapter] | None = None
+
+    @property
+    def modified(self) -> bool:
+        return self.chapters is not None
+
+
+def book_from_dict(data: dict) -> Book:
+    """Rebuild a book saved with `asdict`."""
+    return Book(
+        data['title'],
+        data['url'],
+        data['image'],
+        data['list_name'],
+        [
+            Chapter(chapter['title'], chapter['viewed'], [
+                Option(
+                    [Group(**group) for group in option['groups']],
+                    option['date'],
+                    option['lang'],
+                    option['chapter_url'],
+                )
+                for option in chapter['options']
+            ], chapter.get('site_id'))
+            for chapter in data['chapters']
+        ],
+    )
+
 
-    def encode(self, encoding: str):
-        """Return a random user agent."""
-        return self.fake.user_agent().encode(encoding)
+@lru_cache(maxsize=1)
+def user_agents(size: int = 64) -> tuple[str, ...]:
+    """Generate the pool of user agents once, Faker is slow to load."""
+    from faker import Faker
+
+    fake = Faker()
+    return tuple({fake.user_agent() for _ in range(size)})
+
+
+class RandomUserAgent(str):
+    """A user agent from the pool, a plain str for the header checks of
+    httpx."""
+
+    def __new__(cls):
+        return super().__new__(cls, random.choice(user_agents()))
 
 
 def random_wait(low: float, high: float):
     """Wait a random time."""
-    time.sleep(random.uniform(low, high))
+    seconds = random.uniform(low, high)
+    with tracer.span('random_wait', 'wait', seconds=seconds):
+        time.sleep(seconds)
 
 
 def random_wait_execute(low: float, high: float):
@@ -68,23 +177,171 @@ def random_wait_execute(low: float, high: float):
     return decorator
 
 
+def page_number(url: str) -> int:
+    from httpx import URL
+
+    try:
+        return int(URL(url).params.get('page', 1))
+    except ValueError:
+        return 0
+
+
+def get_page_urls(next_page: str, page_links: list[str]) -> list[str] | None:
+    """Get the urls of the pages from `next_page` to the last one linked.
+
+    None when the pagination does not tell how many pages there are.
+    """
+    last_page = max(map(page_number, page_links), default=0)
+    first_page = page_number(next_page)
+
+    if not first_page or last_page < first_page:
+        return None
+
+    from httpx import URL
+
+    url = URL(next_page)
+    return [
+        str(url.copy_set_param('page', page))
+        for page in range(first_page, last_page + 1)
+    ]
+
+
+def chapters_digest(text: str) -> str:
+    """Hash the chapter list markup of a book page.
+
+    Only the markup from the chapter list to the end of `main` is hashed,
+    the rest of the page changes on every request (csrf tokens, ads).
+    """
+    start = text.find('id="chapters"')
+    if start == -1:
+        start = 0
+    end = text.find('</main>', start)
+    if end == -1:
+        end = len(text)
+    return hashlib.sha1(text[start:end].encode()).hexdigest()
+
+
 class Manager:
-    def __init__(self, client: Client) -> None:
+    def __init__(
+        self,
+        client: 'Client',
+        parser: 'Parser' = None,
+        concurrency: int = 4,
+        policy: RequestPolicy = None,
+    ) -> None:
+        if parser is None:
+            from src.utils.parsers import get_parser
+            parser = get_parser()
         self.__client = client
-
-    def __get_soup(self, url: str, **kwargs) -> BeautifulSoup:
-        if not 'headers' in kwargs:
-            kwargs['headers'] = {'User-Agent': RandomUserAgent()}
-        response = self.__client.get(url, **kwargs)
-        assert response.status_code == 200, response.text
-        return BeautifulSoup(response.text, 'html.parser')
+        self.__parser = parser
+        self.__policy = policy or RequestPolicy()
+        self.concurrency = concurrency
+        # Called when the site dropped the login, to login again.
+        self.relogin: Callable[[], None] | None = None
+        self.__logins = 0
+        self.__login_lock = threading.Lock()
+
+    def __login_again(self, logins: int):
+        """Login again, once for the requests that failed together."""
+        with self.__login_lock:
+            if self.__logins == logins:
+                tracer.count('relogins')
+                self.relogin()
+                self.__logins += 1
+
+    def __attempt(
+        self,
+        url: str,
+        request: Callable[[], 'Response'],
+        expected: tuple[int, ...],
+        auth_statuses: tuple[int, ...] = (),
+    ) -> 'Response':
+        try:
+            response = self.__policy.send(
+                self.__client.base_url.join(url),
+                request,
+                expected=expected,
+            )
+        except ClientError as error:
+            if (
+                error.status_code in auth_statuses
+                and not isinstance(error, AuthError)
+            ):
+                raise AuthError(
+                    error.url,
+                    error.status_code,
+                    error.retry_after,
+                ) from error
+            raise
+        if response.history and is_login_url(response.url):
+            # A followed redirect landed on the login form.
+            raise AuthError(str(url), response.history[0].status_code)
+        return response
+
+    def __send(
+        self,
+        url: str,
+        request: Callable[[], 'Response'],
+        expected: tuple[int, ...] = (200,),
+        relogin: bool = True,
+        auth_statuses: tuple[int, ...] = (),
+    ) -> 'Response':
+        """Send with the request policy, when the login was dropped
+        login again and retry once. `auth_statuses` are taken as a
+        dropped login too."""
+        logins = self.__logins
+        try:
+            return self.__attempt(url, request, expected, auth_statuses)
+        except AuthError:
+            if not relogin or self.relogin is None:
+                raise
+        self.__login_again(logins)
+        return self.__attempt(url, request, expected, auth_statuses)
+
+    def __get(
+        self,
+        url: str,
+        expected: tuple[int, ...] = (200,),
+        relogin: bool = True,
+        **kwargs,
+    ) -> 'Response':
+        kwargs['headers'] = {
+            'User-Agent': RandomUserAgent(),
+            **kwargs.get('headers', {}),
+        }
+        with tracer.span(str(url), 'request') as span:
+            response = self.__send(
+                url,
+                lambda: self.__client.get(url, **kwargs),
+                expected=expected,
+                relogin=relogin,
+            )
+            span.attributes['status'] = response.status_code
+            span.attributes['bytes'] = response.num_bytes_downloaded
+        tracer.count('bytes', response.num_bytes_downloaded)
+        return response
+
+    def __get_text(self, url: str, **kwargs) -> str:
+        return self.__get(url, **kwargs).text
+
+    def __parse(self, method: str, text: str):
+        with tracer.span(
+            method,
+            'parse',
+            parser=self.__parser.name,
+            size=len(text),
+        ):
+            return getattr(self.__parser, method)(text)
 
     def login(self, email: str, password: str, remember: bool = False):
-        """Login to the website."""
-        soup = self.__get_soup('/login')
-        csrf_token = soup.find('input', {'name': '_token'})['value']
+        """Login to the website, raising `AuthError` when the site does
+        not take the credentials."""
+        csrf_token = self.__parse(
+            'csrf_token',
+            self.__get_text('/login', relogin=False),
+        )
 
-        return self.__client.post(
+        response = check_response('/login', self.__client.post(
             '/login',
             data={
                 'email': email,
@@ -94,58 +351,69 @@ class Manager:
             },
             headers={'User-Agent': RandomUserAgent()},
             follow_redirects=True,
-        )
+        ))
+        # A refused login redirects back to the form, answered with 200.
+        if is_login_url(response.url):
+            raise AuthError('/login', response.status_code)
+        return response
 
     def get_url_state(self):
-        soup = self.__get_soup("/profile/groups")
-        return {
-            group.find('small').text.strip(): group["href"]
-            for group in soup.select_one(
-                "#app "
-                "> section "
-                "> header "
-                "> section.element-header-bar "
-                "> div "
-                "> div "
-                "> div"
-            ).find_all("a")
-        }
+        return self.__parse('url_state', self.__get_text('/profile/groups'))
+
+    def set_chapter_viewed(self, site_id: str, viewed: bool = True):
+        """Mark a chapter viewed, or not, on the site. Setting a state
+        twice does nothing, so the request is safe to retry."""
+        url = VIEWED_URLS[viewed].format(site_id)
+
+        def request() -> 'Response':
+            # Read at every attempt, a new login changes the token.
+            return self.__client.post(url, headers={
+                'User-Agent': RandomUserAgent(),
+                'X-Requested-With': 'XMLHttpRequest',
+                # Laravel takes its XSRF-TOKEN cookie back as this header.
+                'X-XSRF-TOKEN': unquote(
+                    self.__client.cookies.get('XSRF-TOKEN') or ''
+                ),
+            })
+
+        with tracer.span(url, 'request') as span:
+            # A post with a stale token may be refused with 403 too.
+            response = self.__send(
+                url,
+                request,
+                expected=(200, 201, 204),
+                auth_statuses=(403,),
+            )
+            span.attributes['status'] = response.status_code
+        return response
 
     def get_iter_books_from_list(self, url: str):
         """Get books from a list url."""
-        soup = self.__get_soup(url)
-
-        while True:
-            for elm in soup.select_one(
-                "#app "
-                "> section "
-                "> main "
-                "> div "
-                "> div "
-                "> div.col-12.col-lg-8 "
-                "> div:nth-child(1)"
-            ).select("a[href]"):
-                url = elm["href"].strip()
-                title = elm.select_one('h4[title]')['title'].strip()
-                style = elm.find('style').text
-                matches = re_url_style.search(style)
-
-                if matches:
-                    image = matches.groups()[0]
-                    image = image.strip('\'"')
-                else:
-                    image = None
-
-                yield Book(title, url, image)
-
-            next_page_button = soup.select_one(
-                "a[class^='relative'][rel='next']"
-            )
-
-            if not next_page_button:
-                break
-
-            soup = self.__get_soup(next_page_button["href"])
+        page = self.__parse('books', self.__get_text(url))
+        yield from page.books
+
+        if not page.next_page:
+            return
+
+        urls = get_page_urls(page.next_page, page.page_links)
+        seen = {url, *(urls or ())}
+
+        if urls is not None:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                for page in executor.map(
+                    lambda url: self.__parse('books', self.__get_text(url)),
+                    urls,
+                ):
+                    yield from page.books
+
+        # The paginator may link a window of the pages only, the pages
+        # after the last one fetched are followed one by one.
+        url = page.next_page
+        while url and url not in seen:
+            seen.add(url)
+            page = self.__parse('books', self.__get_text(url))
+            yield from page.books
+            url = page.next_page
 
     def get_books_from_list(self, url: str):
         """Get books from a list url."""
@@ -153,42 +421,79 @@ class Manager:
 
     def get_chapters_from_url(self, book_url: str) -> list[Chapter]:
         """Get chapters from a book url."""
-        soup = self.__get_soup(book_url)
-        chapters = []
-
-        for chapter in soup.select("#chapters > ul > li, div#chapters-collapsed > li"):
-            title_elm = chapter.select_one('h4')
-
-            title = title_elm.find('a').text.strip()
-            viewed = 'viewed' in title_elm.select_one(
-                'span[class^="chapter-viewed-icon"]'
-            )['class']
-            options = []
-
-            for group in chapter.select('div > div > ul > li > div[class="row"]'):
-                groups = []
-                for group_elm in group.select('div:nth-child(1) > span > a[href]'):
-                    group_title = group_elm.text
-                    group_url = group_elm['href']
-                    groups.append(Group(group_title, group_url))
-
-                date_elm = group.select_one('div:nth-child(2)').find('span')
-                date = date_elm.text.strip()
-
-                lang_icon_elm = group.select_one(
-                    'div:nth-child(3) '
-                    '> i[class^="flag-icon"]'
-                )
-                lang = lang_icon_elm['class'][1].replace('flag-icon-', '')
+        return self.__parse('chapters', self.__get_text(book_url))
+
+    def iter_chapters_from_url(self, book_url: str) -> Iterator[Chapter]:
+        """Yield chapters from a book url while the page downloads."""
+        logins = self.__logins
+        try:
+            # Raised by the status check, before any chapter.
+            yield from self.__iter_chapters(book_url)
+            return
+        except AuthError:
+            if self.relogin is None:
+                raise
+        self.__login_again(logins)
+        yield from self.__iter_chapters(book_url)
+
+    def __iter_chapters(self, book_url: str) -> Iterator[Chapter]:
+        with self.__client.stream(
+            'GET',
+            book_url,
+            headers={'User-Agent': RandomUserAgent()},
+        ) as response:
+            check_response(book_url, response)
+            with tracer.span('iter_chapters', 'parse', stream=True):
+                yield from self.__parser.iter_chapters(response.iter_text())
+
+    def get_chapters_if_changed(
+        self,
+        book_url: str,
+        etag: str = None,
+        last_modified: str = None,
+        digest: str = None,
+    ) -> ChapterPage:
+        """Get chapters from a book url only when the page changed."""
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        # Only a conditional request can take a 304.
+        response = self.__get(
+            book_url,
+            expected=(200, 304) if headers else (200,),
+            headers=headers,
+        )
+
+        if response.status_code == 304:
+            return ChapterPage(etag, last_modified, digest)
+
+        page = ChapterPage(
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            chapters_digest(response.text),
+        )
 
-                url_elm = group.select_one('div:nth-child(6) > a[href]')
-                url = url_elm['href'].strip()
+        if page.digest != digest:
+            page.chapters = self.__parse('chapters', response.text)
+        else:
+            tracer.count('unchanged_pages')
 
-                options.append(Option(groups, date, lang, url))
+        return page
 
-            chapters.append(Chapter(title, viewed, options))
+    def get_chapter_images(self, chapter_url: str) -> tuple[str, list[str]]:
+        """Get the viewer url and the page images of a chapter option."""
+        response = self.__get(chapter_url, follow_redirects=True)
+        viewer_url = str(response.url)
 
-        return chapters
+        # The paginated viewer shows one page, the cascade one all of them.
+        if viewer_url.endswith('/paginated'):
+            viewer_url = viewer_url[:-len('/paginated')] + '/cascade'
+            response = self.__get(viewer_url, headers={'Referer': viewer_url})
+
+        return viewer_url, self.__parse('chapter_images', response.text)
 
     def get_chapters_from_book(self, book: Book) -> list[Chapter]:
         """Get chapters from a book."""
@@ -199,8 +504,8 @@ class Manager:
         book.chapters = self.get_chapters_from_book(book)
         return book
 
-    def get_all_books(self):
-        """Get all books."""
+    def get_listed_books(self) -> list[Book]:
+        """Get the books of every list of the user."""
         states = self.get_url_state()
         books: list[Book] = []
 
@@ -217,18 +522,44 @@ class Manager:
                 book.list_name = name
                 books.append(book)
 
-        for index, books in enumerate(
-            map(
-                random_wait_execute(5.0, 30.0)(self.load_chapters),
-                books,
-            )
-        ):
-            print(f"Book {index + 1}/{ len(books) }: {books.title}")
+        return books
 
+    def get_all_books(self, checkpoint: 'Checkpoint' = None):
+        """Get all books.
+
+        With a checkpoint, every loaded book is saved to it and a run
+        that was interrupted continues from the first book not loaded.
+        """
+        if checkpoint and checkpoint.get('books') is not None:
+            books = list(map(book_from_dict, checkpoint.get('books')))
+        else:
+            books = self.get_listed_books()
+            if checkpoint:
+                checkpoint.set('books', [asdict(book) for book in books])
+
+        load_chapters = random_wait_execute(5.0, 30.0)(self.load_chapters)
+
+        for index, book in enumerate(books):
+            if checkpoint and checkpoint.is_done(book.url):
+                book.chapters = book_from_dict(
+                    checkpoint.done[book.url]
+                ).chapters
+            else:
+                load_chapters(book)
+                if checkpoint:
+                    checkpoint.mark_done(book.url, asdict(book))
+            logger.info('Book %d/%d: %s', index + 1, len(books), book.title)
+
+        if checkpoint:
+            checkpoint.clear()
         return books
 
 
 if __name__ == '__main__':
+    from httpx import Client
+
+    logging.basicConfig(level=logging.INFO)
+
     with Client(
         base_url='https://visortmo.com',
         timeout=30,
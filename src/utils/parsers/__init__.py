@@ -0,0 +1,27 @@
+from src.utils.parsers.base import Parser
+
+PARSERS = {
+    'lxml': 'src.utils.parsers.lxml:LxmlParser',
+    'soup': 'src.utils.parsers.soup:SoupParser',
+}
+
+
+def load_parser(name: str) -> Parser:
+    from importlib import import_module
+
+    module, _, cls = PARSERS[name].partition(':')
+    return getattr(import_module(module), cls)()
+
+
+def get_parser(name: str = None) -> Parser:
+    """Get a parser by name, or the fastest one installed."""
+    if name is not None:
+        return load_parser(name)
+
+    for name in PARSERS:
+        try:
+            return load_parser(name)
+        except ImportError:
+            continue
+
+    raise ImportError('No html parser available')
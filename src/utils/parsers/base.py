@@ -0,0 +1,37 @@
+from typing import Iterable, Iterator
+
+from src.utils.manager import BookPage, Chapter
+
+
+class Parser:
+    """Turn the pages of the site into the scraped models."""
+
+    name: str = ''
+
+    def csrf_token(self, text: str) -> str:
+        """Get the csrf token from the login page."""
+        raise NotImplementedError
+
+    def url_state(self, text: str) -> dict[str, str]:
+        """Get the list names and urls from the profile groups page."""
+        raise NotImplementedError
+
+    def books(self, text: str) -> BookPage:
+        """Get the books and the pagination links from a list page."""
+        raise NotImplementedError
+
+    def chapters(self, text: str) -> list[Chapter]:
+        """Get the chapters from a book page."""
+        raise NotImplementedError
+
+    def chapter_images(self, text: str) -> list[str]:
+        """Get the page image urls from a chapter viewer page."""
+        raise NotImplementedError
+
+    def iter_chapters(self, chunks: Iterable[str]) -> Iterator[Chapter]:
+        """Get the chapters from a book page read in chunks.
+
+        Backends that can parse incrementally yield every chapter as soon
+        as its markup is complete, the rest parse the whole page.
+        """
+        yield from self.chapters(''.join(chunks))
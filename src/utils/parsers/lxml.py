@@ -0,0 +1,187 @@
+import re
+from typing import Iterable, Iterator
+
+from lxml import etree, html
+
+from src.utils.manager import Book, BookPage, Chapter, Group, Option
+from src.utils.parsers.base import Parser
+
+re_url_style = re.compile(r'url\(([^)]+)\)')
+
+HTMLElement = html.HtmlElement
+
+
+def has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+xpath_csrf_token = etree.XPath('//input[@name="_token"]/@value')
+xpath_url_state = etree.XPath(
+    '//*[@id="app"]'
+    '/section'
+    '/header'
+    f'/section[{has_class("element-header-bar")}]'
+    '/div'
+    '/div'
+    '/div'
+)
+xpath_books = etree.XPath(
+    '//*[@id="app"]'
+    '/section'
+    '/main'
+    '/div'
+    '/div'
+    f'/div[{has_class("col-12")} and {has_class("col-lg-8")}]'
+    '/*[1][self::div]'
+)
+xpath_next_page = etree.XPath(
+    '//a[starts-with(@class, "relative")][@rel="next"]/@href'
+)
+xpath_page_links = etree.XPath(
+    '//a[starts-with(@class, "relative")]/@href'
+)
+xpath_chapter_images = etree.XPath(f'//img[{has_class("viewer-img")}]')
+xpath_chapters = etree.XPath(
+    '//*[@id="chapters"]/ul/li | //div[@id="chapters-collapsed"]/li'
+)
+xpath_options = etree.XPath(
+    './/li[parent::ul[parent::div[parent::div]]]/div[@class="row"]'
+)
+
+
+def is_chapter(elm: HTMLElement) -> bool:
+    parent = elm.getparent()
+    if parent is None:
+        return False
+    if parent.tag == 'div' and parent.get('id') == 'chapters-collapsed':
+        return True
+    grandparent = parent.getparent()
+    return (
+        parent.tag == 'ul'
+        and grandparent is not None
+        and grandparent.get('id') == 'chapters'
+    )
+
+
+def children(elm: HTMLElement) -> list[HTMLElement]:
+    """Get the child elements, skipping comments like `:nth-child` does."""
+    return [child for child in elm if isinstance(child.tag, str)]
+
+
+def classes(elm: HTMLElement) -> list[str]:
+    return elm.get('class', '').split()
+
+
+def first(elms: list):
+    return elms[0] if elms else None
+
+
+class LxmlParser(Parser):
+    """Parser built on lxml, walks the chapter rows in a single pass."""
+
+    name = 'lxml'
+
+    def get_tree(self, text: str) -> HTMLElement:
+        return html.document_fromstring(text)
+
+    def csrf_token(self, text: str) -> str:
+        return xpath_csrf_token(self.get_tree(text))[0]
+
+    def url_state(self, text: str) -> dict[str, str]:
+        header = xpath_url_state(self.get_tree(text))[0]
+        return {
+            group.find('.//small').text_content().strip(): group.get('href')
+            for group in header.iter('a')
+        }
+
+    def books(self, text: str) -> BookPage:
+        tree = self.get_tree(text)
+        books = []
+
+        for elm in xpath_books(tree)[0].iterfind('.//a[@href]'):
+            url = elm.get('href').strip()
+            title = elm.find('.//h4[@title]').get('title').strip()
+            style = elm.find('.//style').text_content()
+            matches = re_url_style.search(style)
+
+            if matches:
+                image = matches.groups()[0]
+                image = image.strip('\'"')
+            else:
+                image = None
+
+            books.append(Book(title, url, image))
+
+        return BookPage(
+            books,
+            first(xpath_next_page(tree)),
+            [str(url) for url in xpath_page_links(tree)],
+        )
+
+    def chapter_images(self, text: str) -> list[str]:
+        return [
+            (elm.get('data-src') or elm.get('src')).strip()
+            for elm in xpath_chapter_images(self.get_tree(text))
+        ]
+
+    def chapter(self, elm: HTMLElement) -> Chapter:
+        title_elm = elm.find('.//h4')
+
+        title = title_elm.find('.//a').text_content().strip()
+        viewed_elm = next(
+            span for span in title_elm.iter('span')
+            if span.get('class', '').startswith('chapter-viewed-icon')
+        )
+        viewed = 'viewed' in classes(viewed_elm)
+        options = []
+
+        for row in xpath_options(elm):
+            columns = children(row)
+
+            groups = [
+                Group(group_elm.text_content(), group_elm.get('href'))
+                for group_elm in columns[0].iterfind('span/a[@href]')
+            ]
+
+            date = columns[1].find('.//span').text_content().strip()
+
+            lang_icon_elm = next(
+                icon for icon in columns[2].iterfind('i')
+                if icon.get('class', '').startswith('flag-icon')
+            )
+            lang = classes(lang_icon_elm)[1].replace('flag-icon-', '')
+
+            url = columns[5].find('a[@href]').get('href').strip()
+
+            options.append(Option(groups, date, lang, url))
+
+        return Chapter(title, viewed, options, viewed_elm.get('data-chapter'))
+
+    def chapters(self, text: str) -> list[Chapter]:
+        return [
+            self.chapter(elm)
+            for elm in xpath_chapters(self.get_tree(text))
+        ]
+
+    def iter_chapters(self, chunks: Iterable[str]) -> Iterator[Chapter]:
+        parser = etree.HTMLPullParser(events=('end',), tag='li')
+        parser.set_element_class_lookup(html.HtmlElementClassLookup())
+
+        def read_chapters():
+            for _, elm in parser.read_events():
+                if not is_chapter(elm):
+                    continue
+
+                yield self.chapter(elm)
+
+                # Drop the rows already parsed to keep the memory flat.
+                elm.clear()
+                while elm.getprevious() is not None:
+                    del elm.getparent()[0]
+
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from read_chapters()
+
+        parser.close()
+        yield from read_chapters()
@@ -0,0 +1,157 @@
+import re
+
+from bs4 import BeautifulSoup
+
+from src.utils.manager import Book, BookPage, Chapter, Group, Option
+from src.utils.parsers.base import Parser
+
+re_url_style = re.compile(r'url\(([^)]+)\)')
+
+
+def parse_csrf_token(soup: BeautifulSoup) -> str:
+    """Get the csrf token from the login form."""
+    return soup.find('input', {'name': '_token'})['value']
+
+
+def parse_url_state(soup: BeautifulSoup) -> dict[str, str]:
+    """Get the list names and urls from the profile groups page."""
+    return {
+        group.find('small').text.strip(): group["href"]
+        for group in soup.select_one(
+            "#app "
+            "> section "
+            "> header "
+            "> section.element-header-bar "
+            "> div "
+            "> div "
+            "> div"
+        ).find_all("a")
+    }
+
+
+def parse_books(soup: BeautifulSoup) -> list[Book]:
+    """Get the books from a list page."""
+    books = []
+
+    for elm in soup.select_one(
+        "#app "
+        "> section "
+        "> main "
+        "> div "
+        "> div "
+        "> div.col-12.col-lg-8 "
+        "> div:nth-child(1)"
+    ).select("a[href]"):
+        url = elm["href"].strip()
+        title = elm.select_one('h4[title]')['title'].strip()
+        style = elm.find('style').text
+        matches = re_url_style.search(style)
+
+        if matches:
+            image = matches.groups()[0]
+            image = image.strip('\'"')
+        else:
+            image = None
+
+        books.append(Book(title, url, image))
+
+    return books
+
+
+def parse_next_page(soup: BeautifulSoup) -> str | None:
+    """Get the url of the next page of a list page."""
+    next_page_button = soup.select_one(
+        "a[class^='relative'][rel='next']"
+    )
+
+    if not next_page_button:
+        return None
+
+    return next_page_button["href"]
+
+
+def parse_page_links(soup: BeautifulSoup) -> list[str]:
+    """Get the urls of the pagination of a list page."""
+    return [
+        elm["href"]
+        for elm in soup.select("a[class^='relative'][href]")
+    ]
+
+
+def parse_chapters(soup: BeautifulSoup) -> list[Chapter]:
+    """Get the chapters from a book page."""
+    chapters = []
+
+    for chapter in soup.select("#chapters > ul > li, div#chapters-collapsed > li"):
+        title_elm = chapter.select_one('h4')
+
+        title = title_elm.find('a').text.strip()
+        viewed_elm = title_elm.select_one(
+            'span[class^="chapter-viewed-icon"]'
+        )
+        viewed = 'viewed' in viewed_elm['class']
+        options = []
+
+        for group in chapter.select('div > div > ul > li > div[class="row"]'):
+            groups = []
+            for group_elm in group.select('div:nth-child(1) > span > a[href]'):
+                group_title = group_elm.text
+                group_url = group_elm['href']
+                groups.append(Group(group_title, group_url))
+
+            date_elm = group.select_one('div:nth-child(2)').find('span')
+            date = date_elm.text.strip()
+
+            lang_icon_elm = group.select_one(
+                'div:nth-child(3) '
+                '> i[class^="flag-icon"]'
+            )
+            lang = lang_icon_elm['class'][1].replace('flag-icon-', '')
+
+            url_elm = group.select_one('div:nth-child(6) > a[href]')
+            url = url_elm['href'].strip()
+
+            options.append(Option(groups, date, lang, url))
+
+        chapters.append(
+            Chapter(title, viewed, options, viewed_elm.get('data-chapter'))
+        )
+
+    return chapters
+
+
+def parse_chapter_images(soup: BeautifulSoup) -> list[str]:
+    """Get the page images of a chapter viewer page."""
+    return [
+        (elm.get('data-src') or elm['src']).strip()
+        for elm in soup.select('img.viewer-img')
+    ]
+
+
+class SoupParser(Parser):
+    """Pure python parser, always available."""
+
+    name = 'soup'
+
+    def get_soup(self, text: str) -> BeautifulSoup:
+        return BeautifulSoup(text, 'html.parser')
+
+    def csrf_token(self, text: str) -> str:
+        return parse_csrf_token(self.get_soup(text))
+
+    def url_state(self, text: str) -> dict[str, str]:
+        return parse_url_state(self.get_soup(text))
+
+    def books(self, text: str) -> BookPage:
+        soup = self.get_soup(text)
+        return BookPage(
+            parse_books(soup),
+            parse_next_page(soup),
+            parse_page_links(soup),
+        )
+
+    def chapters(self, text: str) -> list[Chapter]:
+        return parse_chapters(self.get_soup(text))
+
+    def chapter_images(self, text: str) -> list[str]:
+        return parse_chapter_images(self.get_soup(text))
@@ -0,0 +1,57 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Allow `rate` operations per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def __refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated) * self.rate,
+        )
+        self.updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take the tokens and return how long to wait before using them."""
+        with self.__lock:
+            self.__refill()
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until the tokens are available."""
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+
+class HostRateLimiter:
+    """Keep one token bucket per host."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets: dict[str, TokenBucket] = {}
+        self.__lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(str(url)).netloc
+        with self.__lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.capacity)
+            return self.buckets[host]
+
+    def acquire(self, url: str, tokens: float = 1.0):
+        self.bucket(url).acquire(tokens)
@@ -0,0 +1,281 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Callable
+from urllib.parse import urlsplit
+
+from src.utils.tracing import tracer
+
+if TYPE_CHECKING:
+    from httpx import Response
+
+RETRY_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504))
+# Laravel answers 419 when the session of the csrf token expired.
+AUTH_STATUSES = frozenset((401, 419))
+
+
+class ScraperError(Exception):
+    pass
+
+
+class NetworkError(ScraperError):
+    """The request failed before a response arrived."""
+
+
+class StatusError(ScraperError):
+    """The site answered with an unexpected status."""
+
+    def __init__(self, url: str, status_code: int, retry_after: float = None):
+        super().__init__(f'{url}: status {status_code}')
+        self.url = url
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class ClientError(StatusError):
+    pass
+
+
+class AuthError(ClientError):
+    """The site dropped the login, the request needs a new one."""
+
+
+class RateLimitedError(StatusError):
+    pass
+
+
+class ServerError(StatusError):
+    pass
+
+
+class CircuitOpenError(ScraperError):
+    """Too many requests to the host failed, it is left alone a while."""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f'{host}: circuit open for {retry_in:.0f} s')
+        self.host = host
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Get the seconds to wait from a Retry-After header."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_login_url(url: str) -> bool:
+    return urlsplit(str(url)).path.rstrip('/').endswith('/login')
+
+
+def status_error(url: str, response: 'Response') -> StatusError:
+    status_code = response.status_code
+    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+
+    if status_code in AUTH_STATUSES or (
+        response.is_redirect
+        and is_login_url(response.headers.get('Location', ''))
+    ):
+        cls = AuthError
+    elif status_code == 429:
+        cls = RateLimitedError
+    elif status_code >= 500:
+        cls = ServerError
+    else:
+        cls = ClientError
+    return cls(url, status_code, retry_after)
+
+
+def check_response(
+    url: str,
+    response: 'Response',
+    expected: tuple[int, ...] = (200,),
+) -> 'Response':
+    """Raise the typed error of an unexpected status."""
+    if response.status_code not in expected:
+        raise status_error(url, response)
+    return response
+
+
+class CircuitBreaker:
+    """Stop calling a host after `threshold` failures in a row, then let
+    one request through every `reset_timeout` seconds to probe it."""
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 60.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.__lock = threading.Lock()
+
+    def allow(self, host: str = ''):
+        with self.__lock:
+            if self.opened_at is None:
+                return
+            retry_in = self.opened_at + self.reset_timeout - time.monotonic()
+            if retry_in > 0:
+                raise CircuitOpenError(host, retry_in)
+            # Half open: this request probes the host, the next ones
+            # wait for its result.
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self.__lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.__lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                tracer.count('circuit_opened')
+
+
+class HostCircuitBreakers:
+    """Keep one circuit breaker per host."""
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 60.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.__lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self.__lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(
+                    self.threshold,
+                    self.reset_timeout,
+                )
+            return self.breakers[host]
+
+
+class RetryBudget:
+    """Allow retries for a fraction of the requests, so a failing site
+    does not get every request several times."""
+
+    def __init__(self, ratio: float = 0.2, minimum: float = 10.0):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.tokens = minimum
+        self.__lock = threading.Lock()
+
+    def deposit(self):
+        with self.__lock:
+            self.tokens = min(self.tokens + self.ratio, self.minimum * 10)
+
+    def withdraw(self) -> bool:
+        with self.__lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    # Longer Retry-After values end the sync, the next one resumes it.
+    max_retry_after: float = 300.0
+
+    def delay(self, attempt: int, error: ScraperError) -> float | None:
+        """Get how long to wait before the next attempt, None to give up."""
+        if attempt + 1 >= self.max_attempts:
+            return None
+        if isinstance(error, StatusError):
+            if error.status_code not in RETRY_STATUSES:
+                return None
+            if error.retry_after is not None:
+                if error.retry_after > self.max_retry_after:
+                    return None
+                return error.retry_after
+        elif not isinstance(error, NetworkError):
+            return None
+
+        # Full jitter keeps the clients from retrying all at once.
+        return random.uniform(
+            0,
+            min(self.max_delay, self.base_delay * 2 ** attempt),
+        )
+
+
+class RequestPolicy:
+    """Send requests with retries, a retry budget and a circuit breaker
+    per host, raising the typed errors."""
+
+    def __init__(
+        self,
+        retry: RetryPolicy = None,
+        budget: RetryBudget = None,
+        breakers: HostCircuitBreakers = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.retry = retry or RetryPolicy()
+        self.budget = budget or RetryBudget()
+        self.breakers = breakers or HostCircuitBreakers()
+        self.sleep = sleep
+
+    def __attempt(self, url: str, response: 'Response', expected) -> bool:
+        """Record the outcome of an attempt, True when it succeeded."""
+        breaker = self.breakers.breaker(urlsplit(str(url)).netloc)
+        if response.status_code in expected:
+            breaker.record_success()
+            self.budget.deposit()
+            return True
+
+        error = status_error(url, response)
+        if isinstance(error, ClientError) and error.status_code != 408:
+            # The host is fine, the request is not.
+            breaker.record_success()
+        elif not isinstance(error, RateLimitedError):
+            # A 429 is the host up and pacing us, its Retry-After paces
+            # the retries; counted, a burst of them would open the
+            # circuit over a host that answers.
+            breaker.record_failure()
+        raise error
+
+    def __next_delay(self, attempt: int, error: ScraperError) -> float:
+        delay = self.retry.delay(attempt, error)
+        if delay is None or not self.budget.withdraw():
+            raise error
+        tracer.count('retries')
+        return delay
+
+    def send(
+        self,
+        url: str,
+        request: Callable[[], 'Response'],
+        expected: tuple[int, ...] = (200,),
+    ) -> 'Response':
+        from httpx import TransportError
+
+        host = urlsplit(str(url)).netloc
+        attempt = 0
+        while True:
+            self.breakers.breaker(host).allow(host)
+            try:
+                try:
+                    response = request()
+                except TransportError as error:
+                    self.breakers.breaker(host).record_failure()
+                    raise NetworkError(f'{url}: {error!r}') from error
+                self.__attempt(url, response, expected)
+                return response
+            except (NetworkError, StatusError) as error:
+                delay = self.__next_delay(attempt, error)
+
+            with tracer.span('retry', 'wait', seconds=delay, attempt=attempt):
+                self.sleep(delay)
+            attempt += 1
@@ -1,2 +1,41 @@
+import json
+
+from kivy import platform
+
+
 def get_service_name() -> str:
     return 'manga'
+
+
+def get_service_class():
+    from jnius import autoclass  # pylint: disable=import-error
+
+    PythonActivity = autoclass('org.kivy.android.PythonActivity')
+    package = PythonActivity.mActivity.getPackageName()
+    return autoclass(
+        f'{package}.Service{get_service_name().capitalize()}'
+    )
+
+
+def start_service(**options):
+    """Start the background service, `options` reach it as json."""
+    if platform == 'android':
+        from jnius import autoclass  # pylint: disable=import-error
+
+        PythonActivity = autoclass('org.kivy.android.PythonActivity')
+        # A foreground service, shown with this notification.
+        get_service_class().start(
+            PythonActivity.mActivity,
+            '',
+            'Manga',
+            'Checking your lists for new chapters',
+            json.dumps(options),
+        )
+
+
+def stop_service():
+    if platform == 'android':
+        from jnius import autoclass  # pylint: disable=import-error
+
+        PythonActivity = autoclass('org.kivy.android.PythonActivity')
+        get_service_class().stop(PythonActivity.mActivity)
@@ -0,0 +1,24 @@
+import os
+import time
+
+# Imported first by main.py, the closest to the start of the app.
+MAIN_START = time.perf_counter()
+
+
+def process_uptime() -> float | None:
+    """Seconds since the process started, None without /proc."""
+    try:
+        with open('/proc/self/stat') as file:
+            stat = file.read()
+        with open('/proc/uptime') as file:
+            uptime = float(file.read().split()[0])
+    except OSError:
+        return None
+
+    # The start time is the 22nd field, the command name may hold spaces.
+    start_ticks = int(stat.rsplit(')', 1)[1].split()[19])
+    return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+
+
+def since_main() -> float:
+    return time.perf_counter() - MAIN_START
@@ -0,0 +1,240 @@
+"""Spans and counters for the time spent syncing.
+
+`tracer` is shared by the scraper, the http clients and the caches.
+Spans go to the sinks added to it: in memory for the debug screen, a
+JSON lines file for the service, or a logger.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from httpx import AsyncClient, Client, Request, Response
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    kind: str
+    start: float
+    duration: float = 0.0
+    attributes: dict = field(default_factory=dict)
+
+
+class Sink:
+    def emit(self, span: Span):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemorySink(Sink):
+    """Keep the last spans and the totals of every kind."""
+
+    def __init__(self, maxlen: int = 500):
+        self.spans: deque[Span] = deque(maxlen=maxlen)
+        self.totals: dict[str, list] = defaultdict(lambda: [0, 0.0])
+        self.__lock = threading.Lock()
+
+    def emit(self, span: Span):
+        with self.__lock:
+            self.spans.append(span)
+            total = self.totals[span.kind]
+            total[0] += 1
+            total[1] += span.duration
+
+    def summary(self) -> dict[str, dict]:
+        """Get the count and the seconds spent of every kind."""
+        with self.__lock:
+            return {
+                kind: {'count': count, 'seconds': seconds}
+                for kind, (count, seconds) in self.totals.items()
+            }
+
+    def recent(self, count: int = 50) -> list[Span]:
+        with self.__lock:
+            return list(self.spans)[-count:]
+
+    def clear(self):
+        with self.__lock:
+            self.spans.clear()
+            self.totals.clear()
+
+
+class JsonLinesSink(Sink):
+    """Append the spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.__file = open(path, 'a', buffering=1)
+        self.__lock = threading.Lock()
+
+    def emit(self, span: Span):
+        line = json.dumps(asdict(span), default=str)
+        with self.__lock:
+            self.__file.write(line + '\n')
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+class LogSink(Sink):
+    def __init__(self, logger: logging.Logger = None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger('tracing')
+        self.level = level
+
+    def emit(self, span: Span):
+        self.logger.log(
+            self.level,
+            '%s %s %.1f ms %s',
+            span.kind,
+            span.name,
+            span.duration * 1000,
+            span.attributes,
+        )
+
+
+class Tracer:
+    """Time spans and count events, sending the spans to the sinks."""
+
+    def __init__(self, sinks: list[Sink] = ()):
+        self.sinks: list[Sink] = list(sinks)
+        self.counters: dict[str, int] = defaultdict(int)
+        self.__lock = threading.Lock()
+
+    def add_sink(self, sink: Sink) -> Sink:
+        self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink: Sink):
+        self.sinks.remove(sink)
+        sink.close()
+
+    def emit(self, span: Span):
+        for sink in self.sinks:
+            sink.emit(span)
+
+    @contextmanager
+    def span(self, name: str, kind: str = 'span', **attributes):
+        """Time the block; the yielded span takes more attributes."""
+        span = Span(name, kind, time.time(), attributes=attributes)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as error:
+            span.attributes['error'] = type(error).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            if self.sinks:
+                self.emit(span)
+
+    def count(self, name: str, value: int = 1):
+        with self.__lock:
+            self.counters[name] += value
+
+    def snapshot(self) -> dict[str, int]:
+        with self.__lock:
+            return dict(self.counters)
+
+    def since(self, snapshot: dict[str, int]) -> dict[str, int]:
+        """Get how much every counter grew after `snapshot`."""
+        return {
+            name: value - snapshot.get(name, 0)
+            for name, value in self.snapshot().items()
+        }
+
+    def reset(self):
+        with self.__lock:
+            self.counters.clear()
+
+
+tracer = Tracer()
+
+
+class HttpTimings:
+    """Trace extension of httpcore noting when each phase of a request
+    ends, in seconds since the request started.
+
+    The connection phase includes the name resolution, httpcore does
+    not report it apart.
+    """
+
+    PHASES = {
+        'connection.connect_tcp.complete': 'connect',
+        'connection.start_tls.complete': 'tls',
+        'http11.send_request_body.complete': 'sent',
+        'http2.send_request_body.complete': 'sent',
+        'http11.receive_response_headers.complete': 'ttfb',
+        'http2.receive_response_headers.complete': 'ttfb',
+    }
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        self.phases: dict[str, float] = {}
+
+    def __call__(self, name: str, info: dict):
+        phase = self.PHASES.get(name)
+        if phase is not None:
+            self.phases[phase] = time.perf_counter() - self.start
+
+
+class AsyncHttpTimings(HttpTimings):
+    async def __call__(self, name: str, info: dict):
+        super().__call__(name, info)
+
+
+def on_request(request: 'Request', timings: type[HttpTimings]):
+    request.extensions['trace'] = timings()
+    tracer.count('requests')
+
+
+def on_response(response: 'Response'):
+    timings = response.request.extensions.get('trace')
+    if not isinstance(timings, HttpTimings):
+        return
+
+    if response.status_code == 304:
+        tracer.count('not_modified')
+    if tracer.sinks:
+        tracer.emit(Span(
+            response.request.url.path,
+            'http',
+            timings.wall_start,
+            time.perf_counter() - timings.start,
+            {
+                'method': response.request.method,
+                'status': response.status_code,
+                'http_version': response.http_version,
+                **timings.phases,
+            },
+        ))
+
+
+def instrument_client(client: 'Client | AsyncClient'):
+    """Add hooks to a client timing the phases of its requests."""
+    from httpx import AsyncClient
+
+    if isinstance(client, AsyncClient):
+        async def request_hook(request):
+            on_request(request, AsyncHttpTimings)
+
+        async def response_hook(response):
+            on_response(response)
+    else:
+        def request_hook(request):
+            on_request(request, HttpTimings)
+
+        response_hook = on_response
+
+    client.event_hooks['request'].append(request_hook)
+    client.event_hooks['response'].append(response_hook)
+    return client
@@ -1,15 +1,25 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from os.path import join
 from typing import Callable
 
 from android.runnable import run_on_ui_thread
 from jnius import PythonJavaClass, autoclass, cast, java_method
+from kivy.app import App
+from kivy.clock import Clock
 from kivy.uix.modalview import ModalView
-from kivy.graphics.texture import Texture
+
+from src.utils.capture import (CaptureBackend, Region, TextureSink,
+                               iter_tiles)
+from src.utils.webview_pool import WebViewBackend, WebViewPool
 
 WebViewAndroid = autoclass('android.webkit.WebView')
 WebViewClient = autoclass('android.webkit.WebViewClient')
 LayoutParams = autoclass('android.view.ViewGroup$LayoutParams')
 LinearLayout = autoclass('android.widget.LinearLayout')
 KeyEvent = autoclass('android.view.KeyEvent')
+View = autoclass('android.view.View')
 ViewGroup = autoclass('android.view.ViewGroup')
 DownloadManager = autoclass('android.app.DownloadManager')
 DownloadManagerRequest = autoclass('android.app.DownloadManager$Request')
@@ -18,6 +28,10 @@ Environment = autoclass('android.os.Environment')
 Context = autoclass('android.content.Context')
 PythonActivity = autoclass('org.kivy.android.PythonActivity')
 CookieManager = autoclass('android.webkit.CookieManager')
+Bitmap = autoclass('android.graphics.Bitmap')
+BitmapConfig = autoclass('android.graphics.Bitmap$Config')
+Canvas = autoclass('android.graphics.Canvas')
+ByteBuffer = autoclass('java.nio.ByteBuffer')
 
 
 class DownloadListener(PythonJavaClass):
@@ -81,12 +95,159 @@ class JavaScriptCallback(PythonJavaClass):
         self.callback(value)
 
 
-def bytes_to_texture(size: tuple[int], data: bytes) -> Texture:
-    # https://kivy.org/doc/stable/api-kivy.graphics.texture.html
-    texture = Texture.create(size=size)
-    texture.blit_buffer(data, colorfmt='rgba', bufferfmt='ubyte')
-    texture.flip_vertical()
-    return texture
+class AndroidCaptureBackend(CaptureBackend):
+    """Draw a WebView into a bitmap and buffer reused between captures."""
+
+    def __init__(self, webview):
+        self.webview = webview
+        self.bitmap = None
+        self.canvas = None
+        self.buffer = None
+
+    def content_size(self) -> tuple[int, int]:
+        webview = self.webview
+        height = webview.getContentHeight() * webview.getScale() + 0.5
+        return webview.getWidth(), int(height)
+
+    def viewport(self) -> Region:
+        webview = self.webview
+        return (
+            webview.getScrollX(),
+            webview.getScrollY(),
+            webview.getWidth(),
+            webview.getHeight(),
+        )
+
+    def allocate(self, width: int, height: int):
+        if (
+            self.bitmap is not None
+            and self.bitmap.getWidth() == width
+            and self.bitmap.getHeight() == height
+        ):
+            return
+
+        if self.bitmap is not None:
+            self.bitmap.recycle()
+        self.bitmap = Bitmap.createBitmap(width, height, BitmapConfig.ARGB_8888)
+        self.canvas = Canvas(self.bitmap)
+        self.buffer = ByteBuffer.allocate(self.bitmap.getByteCount())
+
+    def capture(self, region: Region) -> memoryview:
+        x, y, width, height = region
+        self.allocate(width, height)
+        webview = self.webview
+
+        self.bitmap.eraseColor(0)
+        self.canvas.save()
+        # `draw` already applies the scroll of the view.
+        self.canvas.translate(
+            webview.getScrollX() - x,
+            webview.getScrollY() - y,
+        )
+        webview.draw(self.canvas)
+        self.canvas.restore()
+
+        self.buffer.rewind()
+        self.bitmap.copyPixelsToBuffer(self.buffer)
+        array = self.buffer.array()
+
+        try:
+            return memoryview(array)
+        except TypeError:
+            # Older pyjnius byte arrays lack the buffer protocol.
+            return memoryview(bytes(array))
+
+    def release(self):
+        if self.bitmap is not None:
+            self.bitmap.recycle()
+        self.bitmap = self.canvas = self.buffer = None
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+@dataclass(slots=True)
+class AndroidView:
+    webview: object
+    layout: object
+
+
+class AndroidWebViewBackend(WebViewBackend):
+    """WebViews added hidden to the activity and kept across opens."""
+
+    def create(self) -> AndroidView:
+        mActivity = PythonActivity.mActivity
+        webview = WebViewAndroid(mActivity)
+        webview.setWebViewClient(WebViewClient())
+        webview.getSettings().setDisplayZoomControls(False)
+        webview.getSettings().setAllowFileAccess(True)  # default False api>29
+        layout = LinearLayout(mActivity)
+        layout.setOrientation(LinearLayout.VERTICAL)
+        layout.addView(webview, LayoutParams(-1, -1))
+        layout.setVisibility(View.GONE)
+        mActivity.addContentView(layout, LayoutParams(-1, -1))
+        return AndroidView(webview, layout)
+
+    def load(self, view: AndroidView, url: str):
+        view.webview.loadUrl(url)
+
+    def show(self, view: AndroidView):
+        view.layout.setVisibility(View.VISIBLE)
+        view.layout.bringToFront()
+        view.webview.onResume()
+
+    def hide(self, view: AndroidView):
+        view.layout.setVisibility(View.GONE)
+        view.webview.onPause()
+
+    def reset(self, view: AndroidView):
+        webview = view.webview
+        webview.stopLoading()
+        webview.loadUrl('about:blank')
+        webview.clearHistory()
+        webview.clearFormData()
+        webview.setOnKeyListener(None)
+        webview.setDownloadListener(None)
+
+    def destroy(self, view: AndroidView):
+        parent = cast(ViewGroup, view.layout.getParent())
+        if parent is not None:
+            parent.removeView(view.layout)
+        view.webview.destroy()
+
+    def cache_size(self) -> int:
+        context = PythonActivity.mActivity.getApplicationContext()
+        # Where Chromium keeps it, by WebView version.
+        paths = (
+            join(str(context.getCacheDir().getPath()), 'WebView'),
+            join(str(context.getDataDir().getPath()), 'app_webview', 'Cache'),
+        )
+        return sum(directory_size(path) for path in paths)
+
+    def clear_cache(self, view: AndroidView):
+        view.webview.clearCache(True)
+
+
+@lru_cache
+def webview_pool() -> WebViewPool:
+    return WebViewPool(AndroidWebViewBackend())
+
+
+@run_on_ui_thread
+def trim_cache(size: int):
+    webview_pool().trim_cache(size)
+
+
+@run_on_ui_thread
+def clear_pool():
+    """Destroy the hidden views, when memory is low."""
+    webview_pool().clear()
+
 
 class WebView(ModalView):
     # https://developer.android.com/reference/android/webkit/WebView
@@ -97,100 +258,178 @@ class WebView(ModalView):
         enable_javascript: bool = False,
         enable_downloads: bool = False,
         enable_zoom: bool = False,
-        cookies: dict = None,
+        cookies: dict | list[tuple[str, str]] = None,
+        next_url: str = None,
         **kwargs,
     ):
         super().__init__(**kwargs)
         self.url = url
+        self.next_url = next_url
         self.enable_javascript = enable_javascript
         self.enable_downloads = enable_downloads
         self.enable_zoom = enable_zoom
+        self.view = None
         self.webview = None
         self.enable_dismiss = True
         self.cookies = cookies
+        self.capturing = False
+        self.capture_backend = None
+        self.capture_sink = TextureSink()
         self.open()
 
+    def capture(self, callback: Callable[[object], None], region: Region = None):
+        """Capture a region, the visible one by default, into a texture.
+
+        The texture is reused by the next capture of the same size.
+        """
+        self.capture_page(
+            lambda textures: callback(textures[0]),
+            region,
+            tile_height=None,
+        )
+
+    def capture_page(
+        self,
+        callback: Callable[[list], None],
+        region: Region = None,
+        tile_height: int = 2048,
+    ):
+        """Capture a region, the whole page by default, in tiles."""
+        if self.capturing:
+            return
+        self.capturing = True
+        self._capture_tiles(callback, region, tile_height)
+
     @run_on_ui_thread
-    def capture(self, callback: Callable[[tuple[int], bytes], None]):
-        if self.webview:
-            Bitmap = autoclass("android.graphics.Bitmap")
-            Bitmap.Config = autoclass("android.graphics.Bitmap$Config")
-            Bitmap.CompressFormat = autoclass(
-                "android.graphics.Bitmap"
-                "$CompressFormat"
-            )
-            Canvas = autoclass("android.graphics.Canvas")
-            ByteBuffer = autoclass("java.nio.ByteBuffer")
-
-            webview = self.webview
-            scale = webview.getScale()
-            height = webview.getContentHeight() * scale + 0.5
-
-            bitmap = Bitmap.createBitmap(
-                webview.getWidth(),
-                height,
-                Bitmap.Config.ARGB_8888,
-            )
-            canvas = Canvas(bitmap)
-            webview.draw(canvas)
-
-            buffer = ByteBuffer.allocate(
-                bitmap.getByteCount()
-            )
-            bitmap.copyPixelsToBuffer(buffer)
-            data = (
-                bitmap.getWidth(),
-                bitmap.getHeight(),
-            ), bytes(buffer.array())
-
-            callback(*data)
+    def _capture_tiles(self, callback, region, tile_height):
+        if not self.webview:
+            self.capturing = False
+            return
+
+        try:
+            if self.capture_backend is None:
+                self.capture_backend = AndroidCaptureBackend(self.webview)
+            backend = self.capture_backend
+
+            if tile_height is None:
+                tiles = [region or backend.viewport()]
+            else:
+                tiles = list(iter_tiles(
+                    backend.content_size(),
+                    tile_height,
+                    region,
+                ))
+        except BaseException:
+            # A failed capture must not block the next ones.
+            self.capturing = False
+            raise
+
+        self._capture_tile(callback, tiles, 0, [])
 
     @run_on_ui_thread
-    def on_open(self):
-        mActivity = PythonActivity.mActivity
-        webview = WebViewAndroid(mActivity)
-        webview.setWebViewClient(WebViewClient())
+    def _capture_tile(self, callback, tiles, index, textures):
+        if not self.webview:
+            self.capturing = False
+            return
+
+        tile = tiles[index]
+        try:
+            data = self.capture_backend.capture(tile)
+        except BaseException:
+            self.capturing = False
+            raise
+
+        def blit(dt):
+            last = index + 1 == len(tiles)
+            try:
+                # The buffer is reused, blit it before drawing the next
+                # tile.
+                textures.append(self.capture_sink(index, tile, data))
+                if not last:
+                    self._capture_tile(callback, tiles, index + 1, textures)
+            except BaseException:
+                self.capturing = False
+                raise
+
+            if last:
+                # Cleared first, the callback may start another capture.
+                self.capturing = False
+                callback(textures)
+
+        Clock.schedule_once(blit)
+
+    def _configure(self, view: AndroidView):
+        webview = view.webview
         webview.getSettings().setJavaScriptEnabled(self.enable_javascript)
         webview.getSettings().setBuiltInZoomControls(self.enable_zoom)
-        webview.getSettings().setDisplayZoomControls(False)
-        webview.getSettings().setAllowFileAccess(True)  # default False api>29
-        layout = LinearLayout(mActivity)
-        layout.setOrientation(LinearLayout.VERTICAL)
-        layout.addView(webview, self.width, self.height)
-        mActivity.addContentView(layout, LayoutParams(-1, -1))
-        webview.setOnKeyListener(KeyListener(self._back_pressed))
 
-        if self.enable_downloads:
-            webview.setDownloadListener(DownloadListener())
-
-        self.webview = webview
-        self.layout = layout
+        # The view may come from the pool, configured by another one.
+        webview.setDownloadListener(
+            DownloadListener() if self.enable_downloads else None
+        )
 
         if self.cookies:
-            for key, value in self.cookies.items():
-                CookieManager.getInstance().setCookie(
-                    self.url, f'{key}={value}')
+            cookie_manager = CookieManager.getInstance()
+            if isinstance(self.cookies, dict):
+                cookies = [
+                    (self.url, f'{key}={value}')
+                    for key, value in self.cookies.items()
+                ]
+            else:
+                cookies = self.cookies
+            for url, value in cookies:
+                cookie_manager.setCookie(url, value)
+            cookie_manager.flush()
 
+    @run_on_ui_thread
+    def on_open(self):
+        # A warm view from the pool, already showing the page when it
+        # was preloaded.
+        pool = webview_pool()
         try:
-            webview.loadUrl(self.url)
+            view = pool.open(self.url, self._configure)
         except Exception as e:
             print('Webview.on_open(): ' + str(e))
             self.dismiss()
+            return
+
+        self.view = view
+        self.webview = view.webview
+        self.layout = view.layout
+        self.webview.setOnKeyListener(KeyListener(self._back_pressed))
+        self.on_size(self, self.size)
+
+        if self.next_url:
+            pool.preload(self.next_url, self._configure)
+
+    @run_on_ui_thread
+    def preload(self, url: str):
+        """Load a page hidden, the next WebView opening it shows it at
+        once."""
+        webview_pool().preload(url, self._configure)
 
     @run_on_ui_thread
     def on_dismiss(self):
-        if self.enable_dismiss:
+        if self.enable_dismiss and self.view:
             self.enable_dismiss = False
-            parent = cast(ViewGroup, self.layout.getParent())
-            if parent is not None:
-                parent.removeView(self.layout)
-            self.webview.clearHistory()
-            self.webview.clearCache(True)
-            self.webview.clearFormData()
-            self.webview.destroy()
+            if self.capture_backend:
+                self.capture_backend.release()
+                self.capture_backend = None
+            # The view and the http cache are kept for the next open.
+            pool = webview_pool()
+            pool.close(self.view)
+            self.view = None
             self.layout = None
             self.webview = None
 
+            # Walking the cache directories is slow, not for this thread.
+            if pool.cache_check_due():
+                App.get_running_app().worker.submit(
+                    pool.backend.cache_size,
+                    key='webview_cache_size',
+                    on_result=trim_cache,
+                )
+
     @run_on_ui_thread
     def on_size(self, instance, size):
         if self.webview:
@@ -0,0 +1,261 @@
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from src.utils.tracing import MemorySink, tracer
+
+
+class WebViewBackend:
+    """Platform side of the pool: creates, loads and shows the views.
+
+    Every method runs on the thread owning the views, the Android UI
+    thread on a device.
+    """
+
+    def create(self):
+        """Build a hidden view, the slow part of an open."""
+        raise NotImplementedError
+
+    def load(self, view, url: str):
+        raise NotImplementedError
+
+    def show(self, view):
+        raise NotImplementedError
+
+    def hide(self, view):
+        raise NotImplementedError
+
+    def reset(self, view):
+        """Forget the page and the history, keeping the http cache."""
+        raise NotImplementedError
+
+    def destroy(self, view):
+        raise NotImplementedError
+
+    def cache_size(self) -> int:
+        """Get the bytes of the http cache shared by the views."""
+        raise NotImplementedError
+
+    def clear_cache(self, view):
+        """Clear the http cache, through any of the views."""
+        raise NotImplementedError
+
+
+class FakeWebViewBackend(WebViewBackend):
+    """Backend sleeping like a WebView would, to run the pool off device.
+
+    Loading a url already in the cache is faster, as assets are not
+    fetched again.
+    """
+
+    def __init__(
+        self,
+        create_cost: float = 0.15,
+        load_cost: float = 0.08,
+        cached_load_cost: float = 0.02,
+        page_bytes: int = 2 * 1024 * 1024,
+    ):
+        self.create_cost = create_cost
+        self.load_cost = load_cost
+        self.cached_load_cost = cached_load_cost
+        self.page_bytes = page_bytes
+        self.cache: set[str] = set()
+        self.views: list[dict] = []
+        self.calls: list[tuple[str, object]] = []
+
+    def create(self):
+        time.sleep(self.create_cost)
+        view = {'url': None, 'shown': False, 'destroyed': False}
+        self.views.append(view)
+        self.calls.append(('create', None))
+        return view
+
+    def load(self, view, url: str):
+        time.sleep(
+            self.cached_load_cost if url in self.cache else self.load_cost
+        )
+        self.cache.add(url)
+        view['url'] = url
+        self.calls.append(('load', url))
+
+    def show(self, view):
+        view['shown'] = True
+        self.calls.append(('show', view['url']))
+
+    def hide(self, view):
+        view['shown'] = False
+        self.calls.append(('hide', view['url']))
+
+    def reset(self, view):
+        view['url'] = None
+
+    def destroy(self, view):
+        view['destroyed'] = True
+        self.calls.append(('destroy', None))
+
+    def cache_size(self) -> int:
+        return len(self.cache) * self.page_bytes
+
+    def clear_cache(self, view):
+        self.cache.clear()
+        self.calls.append(('clear_cache', None))
+
+
+class WebViewPool:
+    """Keep WebViews warm between opens instead of building and
+    destroying one every time.
+
+    A closed view is hidden and kept, with the http cache, for the next
+    open. `preload` loads a page in a hidden view, opening that url then
+    only shows it. At most `size` hidden views are kept, the oldest
+    preload is reused first. The cache is only cleared when it grows
+    past `max_cache_bytes`, measured at most every `cache_check_interval`
+    seconds by the caller, off the thread of the views.
+    """
+
+    def __init__(
+        self,
+        backend: WebViewBackend,
+        size: int = 2,
+        max_cache_bytes: int = 64 * 1024 * 1024,
+        cache_check_interval: float = 60.0,
+    ):
+        self.backend = backend
+        self.size = size
+        self.max_cache_bytes = max_cache_bytes
+        self.cache_check_interval = cache_check_interval
+        self.idle: list = []
+        self.preloaded: OrderedDict[str, object] = OrderedDict()
+        self.active = 0
+        self.__cache_checked = time.monotonic()
+
+    @property
+    def hidden(self) -> int:
+        return len(self.idle) + len(self.preloaded)
+
+    def __take(self, steal: bool = False):
+        if self.idle:
+            tracer.count('webview_reused')
+            return self.idle.pop()
+        if steal and self.preloaded and self.hidden >= self.size:
+            _, view = self.preloaded.popitem(last=False)
+            tracer.count('webview_preload_evicted')
+            self.backend.reset(view)
+            return view
+
+        tracer.count('webview_created')
+        return self.backend.create()
+
+    def open(self, url: str, configure: Callable = None):
+        """Show a view with the url, the preloaded one when there is.
+
+        `configure` is applied to a preloaded view too, it was configured
+        by whoever preloaded it.
+        """
+        with tracer.span(url, 'webview_open') as span:
+            view = self.preloaded.pop(url, None)
+            span.attributes['preloaded'] = view is not None
+
+            if view is None:
+                view = self.__take()
+                if configure:
+                    configure(view)
+                self.backend.load(view, url)
+            else:
+                tracer.count('webview_preload_hits')
+                if configure:
+                    configure(view)
+
+            self.backend.show(view)
+            self.active += 1
+        return view
+
+    def preload(self, url: str, configure: Callable = None):
+        """Load the url in a hidden view, for the next open."""
+        if url in self.preloaded:
+            self.preloaded.move_to_end(url)
+            return
+
+        with tracer.span(url, 'webview_preload'):
+            view = self.__take(steal=True)
+            if configure:
+                configure(view)
+            self.backend.load(view, url)
+            self.preloaded[url] = view
+
+        while self.hidden > self.size:
+            _, view = self.preloaded.popitem(last=False)
+            self.backend.destroy(view)
+
+    def close(self, view):
+        """Hide the view and keep it for the next open."""
+        with tracer.span('close', 'webview_close'):
+            self.active -= 1
+            self.backend.hide(view)
+            self.backend.reset(view)
+
+            if self.hidden < self.size:
+                self.idle.append(view)
+            else:
+                self.backend.destroy(view)
+
+    def cache_check_due(self) -> bool:
+        """Whether the cache should be measured, once per interval."""
+        now = time.monotonic()
+        if now - self.__cache_checked < self.cache_check_interval:
+            return False
+        self.__cache_checked = now
+        return True
+
+    def trim_cache(self, size: int):
+        """Clear the cache, through a hidden view, when `size` bytes,
+        measured by `backend.cache_size`, are past the limit."""
+        views = [*self.idle, *self.preloaded.values()]
+        if size > self.max_cache_bytes and views:
+            self.backend.clear_cache(views[0])
+            tracer.count('webview_cache_cleared')
+
+    def clear(self):
+        """Destroy the hidden views, when memory is low or on exit."""
+        for view in [*self.idle, *self.preloaded.values()]:
+            self.backend.destroy(view)
+        self.idle.clear()
+        self.preloaded.clear()
+
+
+def open_legacy(backend: WebViewBackend, url: str):
+    """What `WebView` did before the pool, for comparison."""
+    with tracer.span(url, 'webview_open'):
+        view = backend.create()
+        backend.load(view, url)
+        backend.show(view)
+    with tracer.span('close', 'webview_close'):
+        backend.hide(view)
+        backend.clear_cache(view)
+        backend.destroy(view)
+
+
+if __name__ == '__main__':
+    urls = [f'https://example.test/view_uploads/{number}' for number in range(10)]
+
+    for name in ('create and destroy', 'pool with preload'):
+        sink = tracer.add_sink(MemorySink())
+        backend = FakeWebViewBackend()
+        pool = WebViewPool(backend)
+
+        for index, url in enumerate(urls):
+            if name == 'create and destroy':
+                open_legacy(backend, url)
+                continue
+            view = pool.open(url)
+            # While the chapter is read.
+            if index + 1 < len(urls):
+                pool.preload(urls[index + 1])
+            pool.close(view)
+
+        summary = sink.summary()
+        tracer.remove_sink(sink)
+        for kind in ('webview_open', 'webview_close'):
+            total = summary[kind]
+            print(f'{name}: {kind} '
+                  f'{total["seconds"] / total["count"] * 1000:.1f} ms mean')
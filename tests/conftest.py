@@ -0,0 +1,19 @@
+import os
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+os.environ.setdefault('KIVY_NO_FILELOG', '1')
+
+import pytest  # noqa: E402
+
+from src.books.models import create_tables, database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Point the app database to an empty file of the test."""
+    database.close()
+    database.init(str(tmp_path / 'database.db'))
+    create_tables()
+    yield database
+    database.close()
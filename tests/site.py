@@ -0,0 +1,63 @@
+"""The fixture library of the benchmarks served through a mock transport,
+for the tests that sync against the site."""
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs
+
+import httpx
+
+from benchmarks import fixtures
+from src.utils.manager import Manager
+from src.utils.parsers import get_parser
+from src.utils.resilience import RequestPolicy, RetryPolicy
+
+BASE_URL = 'https://visortmo.com'
+
+
+@dataclass
+class Site:
+    library: fixtures.Library = field(default_factory=lambda: fixtures.Library(
+        BASE_URL, lists=1, pages=2, books=3, chapters=5,
+    ))
+    # Chapter counts of the books changed since the library was made.
+    chapters: dict[str, int] = field(default_factory=dict)
+    requests: list[httpx.Request] = field(default_factory=list)
+
+    def page(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path = request.url.path
+        parts = path.strip('/').split('/')
+        query = parse_qs(request.url.query.decode())
+
+        if path == '/login':
+            text = fixtures.login_page(self.library)
+        elif path == '/profile/groups':
+            text = fixtures.groups_page(self.library)
+        elif parts[:2] == ['profile', 'groups'] and len(parts) == 3:
+            text = fixtures.list_page(
+                self.library,
+                parts[2],
+                int(query.get('page', ['1'])[0]),
+            )
+        elif parts[:2] == ['library', 'manga'] and len(parts) >= 3:
+            library = self.library
+            if parts[2] in self.chapters:
+                library = fixtures.Library(
+                    **{**vars(library), 'chapters': self.chapters[parts[2]]}
+                )
+            text = fixtures.book_page(library, parts[2])
+        else:
+            return httpx.Response(404)
+        return httpx.Response(200, text=text)
+
+    def client(self) -> httpx.Client:
+        return httpx.Client(
+            base_url=BASE_URL,
+            transport=httpx.MockTransport(self.page),
+        )
+
+    def manager(self) -> Manager:
+        return Manager(
+            self.client(),
+            get_parser('lxml'),
+            policy=RequestPolicy(RetryPolicy(max_attempts=1)),
+        )
@@ -0,0 +1,29 @@
+import os
+
+from src.utils.covers import DiskCache
+
+
+def test_evict_keeps_files_being_written(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10)
+    writing = tmp_path / 'abc.123.tmp'
+    writing.write_bytes(b'x' * 100)
+
+    cache.put('a', b'1' * 8)
+    cache.put('b', b'2' * 8)
+
+    assert writing.exists()
+    assert cache.get('a') is None
+    assert cache.get('b') == b'2' * 8
+    assert cache.size == 8
+
+
+def test_get_of_an_entry_evicted_while_read(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    cache.put('a', b'data')
+
+    def utime(path):
+        os.remove(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, 'utime', utime)
+    assert cache.get('a') == b'data'
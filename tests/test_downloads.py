@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+from os.path import exists
+from pathlib import Path
+from types import SimpleNamespace
+
+from kivy.app import App
+
+from src.books.downloads import ChapterDownloads
+from src.books.screens.book import BookScreen
+from src.utils.downloads import DownloadItem
+from src.utils.manager import Chapter, Option
+
+
+class Site:
+    def get_chapter_images(self, chapter_url):
+        return f'{chapter_url}/cascade', [f'{chapter_url}/1.jpg']
+
+
+class BlockingDownloader:
+    """Write the pages once `release` is set."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def download_all(self, items: list[DownloadItem], headers=None):
+        self.started.set()
+        self.release.wait(5)
+        for item in items:
+            with open(item.path, 'wb') as file:
+                file.write(b'x' * 100)
+            item.size = 100
+        return items
+
+
+def downloaded(downloads: ChapterDownloads, chapter_url: str, size: int):
+    directory = downloads.chapter_directory(chapter_url)
+    os.makedirs(directory)
+    with open(os.path.join(directory, '0000.jpg'), 'wb') as file:
+        file.write(b'x' * size)
+    downloads.save_manifest(chapter_url, {
+        'chapter_url': chapter_url,
+        'viewer_url': chapter_url,
+        'complete': True,
+        'pages': [],
+    })
+
+
+def test_enforce_quota_skips_running_downloads(tmp_path):
+    downloader = BlockingDownloader()
+    downloads = ChapterDownloads(
+        Site(), downloader, str(tmp_path), quota_bytes=50,
+    )
+    downloaded(downloads, '/view/old', 100)
+
+    thread = threading.Thread(target=downloads.download, args=('/view/new',))
+    thread.start()
+    downloader.started.wait(5)
+
+    downloads.enforce_quota()
+    assert exists(downloads.manifest_path('/view/new'))
+    assert not exists(downloads.chapter_directory('/view/old'))
+
+    downloader.release.set()
+    thread.join(5)
+    with open(downloads.manifest_path('/view/new')) as file:
+        assert json.load(file)['complete']
+
+
+def test_reader_path_shows_the_downloaded_pages(tmp_path):
+    downloads = ChapterDownloads(Site(), BlockingDownloader(), str(tmp_path))
+    assert downloads.reader_path('/view/1') is None
+
+    downloads.downloader.release.set()
+    downloads.download('/view/1')
+    path = downloads.reader_path('/view/1')
+
+    with open(path) as file:
+        assert '<img src="0000.jpg">' in file.read()
+    assert exists(os.path.join(os.path.dirname(path), '0000.jpg'))
+
+
+def test_read_opens_a_downloaded_chapter_offline(tmp_path, monkeypatch):
+    downloads = ChapterDownloads(Site(), BlockingDownloader(), str(tmp_path))
+    downloads.downloader.release.set()
+    downloads.download('/view/1')
+    monkeypatch.setattr(
+        App, 'get_running_app', lambda: SimpleNamespace(downloads=downloads),
+    )
+    opened = []
+    monkeypatch.setattr('webbrowser.open', opened.append)
+
+    screen = BookScreen()
+    for url in ('/view/1', '/view/2'):
+        screen.read(Chapter('1', False, [Option([], None, 'es', url)]))
+
+    assert opened == [
+        Path(downloads.reader_path('/view/1')).as_uri(),
+        '/view/2',
+    ]
@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+from kivy.app import App
+
+from src.books.index import ChapterIndex
+from src.books.models import save_chapters
+from src.books.screens.book_list import BookListScreen
+from src.utils.manager import Chapter, Group, Option
+
+BOOK_URL = 'https://example.com/library/manga/1/book'
+
+
+def chapter(title: str, viewed: bool, lang: str, group: str, date: str):
+    return Chapter(title, viewed, [
+        Option([Group(group, f'/groups/{group}')], date, lang, f'/view/{title}'),
+    ])
+
+
+CHAPTERS = [
+    chapter('Capítulo 10', False, 'es', 'Luna', '2024-03-01'),
+    chapter('Capítulo 2', True, 'en', 'Sol', '2024-01-01'),
+    chapter('Extra 1.5', False, 'es', 'Sol', '2024-02-01'),
+]
+
+
+def titles(index: ChapterIndex, **filters) -> list[str]:
+    return [row['text'] for row in index.data(**filters)]
+
+
+def test_filters_combine():
+    index = ChapterIndex(CHAPTERS)
+
+    assert titles(index, langs=['es']) == ['Capítulo 10', 'Extra 1.5']
+    assert titles(index, groups=['Sol']) == ['Capítulo 2', 'Extra 1.5']
+    assert titles(index, langs=['es'], groups=['Sol']) == ['Extra 1.5']
+    assert titles(index, viewed=False) == ['Capítulo 10', 'Extra 1.5']
+    assert titles(index, search='CAPÍ') == ['Capítulo 10', 'Capítulo 2']
+    assert titles(index, search='capí', viewed=True) == ['Capítulo 2']
+
+
+def test_search_narrowed_while_typing_and_widened_again():
+    index = ChapterIndex(CHAPTERS)
+
+    assert titles(index, search='ca') == ['Capítulo 10', 'Capítulo 2']
+    assert titles(index, search='capítulo 1') == ['Capítulo 10']
+    assert titles(index, search='e') == ['Extra 1.5']
+
+
+def test_sorts():
+    index = ChapterIndex(CHAPTERS)
+
+    assert titles(index, sort='number') == [
+        'Extra 1.5', 'Capítulo 2', 'Capítulo 10',
+    ]
+    assert titles(index, sort='date') == [
+        'Capítulo 2', 'Extra 1.5', 'Capítulo 10',
+    ]
+
+
+def test_set_viewed_and_extend():
+    index = ChapterIndex(CHAPTERS[:1])
+    index.set_viewed(0, True)
+    index.extend(CHAPTERS[1:])
+
+    assert [row['viewed'] for row in index.data()] == [True, True, False]
+    assert titles(index, sort='number') == [
+        'Extra 1.5', 'Capítulo 2', 'Capítulo 10',
+    ]
+
+
+def test_stored_chapters_hidden_by_filters_are_synced(db, monkeypatch):
+    submitted = []
+    worker = SimpleNamespace(
+        submit=lambda fn, *args, **kwargs: submitted.append(fn.__name__),
+        submit_iter=lambda fn, *args, **kwargs: submitted.append('stream'),
+    )
+    monkeypatch.setattr(
+        App,
+        'get_running_app',
+        lambda: SimpleNamespace(worker=worker, client_manager=None),
+    )
+    save_chapters(BOOK_URL, [
+        chapter('Capítulo 1', True, 'es', 'Luna', '2024-01-01'),
+    ])
+    screen = BookListScreen(book_url=BOOK_URL, unread_only=True)
+
+    screen.on_pre_enter()
+
+    assert submitted == ['sync_chapters']
+    assert screen.books == []
+    assert len(screen.index) == len(screen.chapters) == 1
+    assert screen.lang_names == ['es']
+
+
+def test_add_chapters_appends_rows():
+    screen = BookListScreen()
+    screen.add_chapters(CHAPTERS[:2])
+    screen.add_chapters(CHAPTERS[2:])
+
+    assert [row['row'] for row in screen.books] == [0, 1, 2]
+    assert [c.title for c in screen.chapters] == [
+        'Capítulo 10', 'Capítulo 2', 'Extra 1.5',
+    ]
+    assert screen.group_names == ['Luna', 'Sol']
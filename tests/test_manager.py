@@ -0,0 +1,154 @@
+from pathlib import Path
+
+import httpx
+import pytest
+
+from benchmarks import fixtures
+from src.utils.manager import Manager
+from src.utils.parsers import get_parser
+from src.utils.resilience import (AuthError, ClientError, RequestPolicy,
+                                  RetryPolicy)
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+GROUPS_PAGE = '''<div id="app"><section><header>
+<section class="element-header-bar"><div><div><div>
+<a href="/profile/groups/reading"><small> reading </small></a>
+</div></div></div></section></header></section></div>'''
+
+
+def make_manager(handler) -> Manager:
+    client = httpx.Client(
+        base_url='https://example.com',
+        transport=httpx.MockTransport(handler),
+    )
+    return Manager(
+        client,
+        get_parser('soup'),
+        policy=RequestPolicy(RetryPolicy(max_attempts=1)),
+    )
+
+
+def test_get_chapters_if_changed_takes_304():
+    manager = make_manager(lambda request: httpx.Response(304))
+
+    page = manager.get_chapters_if_changed('/book', etag='"1"', digest='d')
+
+    assert not page.modified
+    assert (page.etag, page.digest) == ('"1"', 'd')
+
+
+def test_unconditional_get_rejects_304():
+    manager = make_manager(lambda request: httpx.Response(304))
+
+    with pytest.raises(ClientError):
+        manager.get_chapter_images('/view/1')
+    with pytest.raises(ClientError):
+        manager.get_chapters_if_changed('/book')
+
+
+def test_relogin_once_when_the_session_expired():
+    logins = []
+
+    def handler(request):
+        if request.url.path == '/profile/groups' and not logins:
+            return httpx.Response(302, headers={'Location': '/login'})
+        return httpx.Response(200, text=GROUPS_PAGE)
+
+    manager = make_manager(handler)
+    manager.relogin = lambda: logins.append(True)
+
+    assert manager.get_url_state() == {'reading': '/profile/groups/reading'}
+    assert logins == [True]
+
+
+def test_relogin_after_419_and_followed_login_redirect():
+    logins = []
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        if request.url.path.startswith('/chapter_viewed') and not logins:
+            return httpx.Response(419)
+        if request.url.path == '/view/1' and len(logins) < 2:
+            return httpx.Response(302, headers={'Location': '/login'})
+        return httpx.Response(200, text='<html></html>')
+
+    manager = make_manager(handler)
+    manager.relogin = lambda: logins.append(True)
+
+    manager.set_chapter_viewed('1')
+    manager.get_chapter_images('/view/1')
+
+    assert logins == [True, True]
+    assert requests == [
+        '/chapter_viewed/1', '/chapter_viewed/1',
+        '/view/1', '/login', '/view/1',
+    ]
+
+
+def test_auth_error_without_relogin():
+    manager = make_manager(lambda request: httpx.Response(419))
+
+    with pytest.raises(AuthError):
+        manager.set_chapter_viewed('1')
+
+
+def test_viewed_post_refused_with_403_logs_in_again():
+    logins = []
+    manager = make_manager(
+        lambda request: httpx.Response(204 if logins else 403)
+    )
+    manager.relogin = lambda: logins.append(True)
+
+    manager.set_chapter_viewed('1')
+    assert logins == [True]
+
+
+def test_refused_login_raises_auth_error():
+    login_page = (FIXTURES / 'login.html').read_text(encoding='utf-8')
+
+    def handler(request):
+        if request.method == 'POST':
+            # Back to the form, with the errors in the session.
+            return httpx.Response(302, headers={'Location': '/login'})
+        return httpx.Response(200, text=login_page)
+
+    with pytest.raises(AuthError):
+        make_manager(handler).login('reader@example.com', 'wrong')
+
+
+def windowed_list_page(page: int, pages: int, window: int = 3) -> str:
+    """A list page whose paginator links only the pages around it."""
+    base_url = 'https://visortmo.com'
+    return fixtures.LIST_PAGE.format(
+        name='reading',
+        books=fixtures.LIST_BOOK.format(
+            base_url=base_url,
+            book_id=page,
+            slug=f'book-{page}',
+            title=f'Book {page}',
+        ),
+        links=''.join(
+            fixtures.PAGE_LINK.format(
+                base_url=base_url, name='reading', page=number,
+            )
+            for number in range(page, min(pages, page + window - 1) + 1)
+        ),
+        next_link=fixtures.NEXT_LINK.format(
+            base_url=base_url, name='reading', page=page + 1,
+        ) if page < pages else '',
+    )
+
+
+def test_list_pages_past_the_paginator_window():
+    def handler(request):
+        page = int(request.url.params.get('page', 1))
+        return httpx.Response(200, text=windowed_list_page(page, 7))
+
+    manager = make_manager(handler)
+
+    books = manager.get_books_from_list('/profile/groups/reading?page=1')
+
+    assert [book.title for book in books] == [
+        f'Book {page}' for page in range(1, 8)
+    ]
@@ -0,0 +1,40 @@
+from src.books.models import (Option, OptionGroup, load_chapters,
+                              save_chapters)
+from src.utils.manager import Chapter, Group
+from src.utils.manager import Option as ScrapedOption
+
+BOOK_URL = 'https://example.com/library/manga/1/book'
+
+
+def chapter(title: str, *urls: str) -> Chapter:
+    group = Group('Scans', 'https://example.com/groups/1/scans')
+    return Chapter(title, False, [
+        ScrapedOption([group], '2024-01-01', 'es', url) for url in urls
+    ])
+
+
+def test_save_chapters_removes_options_no_longer_listed(db):
+    save_chapters(BOOK_URL, [
+        chapter('Capítulo 2', '/view/2a', '/view/2b'),
+        chapter('Capítulo 1', '/view/1a'),
+    ])
+    save_chapters(BOOK_URL, [
+        chapter('Capítulo 2', '/view/2a'),
+        chapter('Capítulo 1', '/view/1a'),
+    ])
+
+    assert [
+        [option.chapter_url for option in c.options]
+        for c in load_chapters(BOOK_URL)
+    ] == [['/view/2a'], ['/view/1a']]
+    assert Option.select().count() == 2
+    assert OptionGroup.select().count() == 2
+
+
+def test_save_chapters_keeps_viewed_state(db):
+    save_chapters(BOOK_URL, [chapter('Capítulo 1', '/view/1a')])
+    scraped = chapter('Capítulo 1', '/view/1a')
+    scraped.viewed = True
+    save_chapters(BOOK_URL, [scraped])
+
+    assert [c.viewed for c in load_chapters(BOOK_URL)] == [True]
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import pytest
+
+from src.utils.parsers import get_parser
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding='utf-8')
+
+
+@pytest.fixture(scope='module')
+def parsers():
+    return get_parser('soup'), get_parser('lxml')
+
+
+@pytest.mark.parametrize('method, page', [
+    ('csrf_token', 'login.html'),
+    ('url_state', 'groups.html'),
+    ('books', 'list.html'),
+    ('chapters', 'book.html'),
+    ('chapter_images', 'viewer.html'),
+])
+def test_parsers_agree(parsers, method, page):
+    soup, lxml = parsers
+    text = fixture(page)
+
+    assert getattr(lxml, method)(text) == getattr(soup, method)(text)
+
+
+@pytest.mark.parametrize('size', [1, 7, 512, 4096, 1 << 20])
+def test_iter_chapters_matches_chapters(parsers, size):
+    soup, lxml = parsers
+    text = fixture('book.html')
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+
+    expected = soup.chapters(text)
+    assert list(lxml.iter_chapters(chunks)) == expected
+    assert list(soup.iter_chapters(chunks)) == expected
+
+
+def test_fixture_pages(parsers):
+    soup, _ = parsers
+
+    page = soup.books(fixture('list.html'))
+    assert len(page.books) == 5
+    assert page.books[-1].title == 'Sin portada & sin "fin"'
+    assert page.books[-1].image is None
+    assert page.next_page.endswith('page=3')
+
+    chapters = soup.chapters(fixture('book.html'))
+    assert len(chapters) == 13
+    extra = chapters[-1]
+    assert extra.title == 'Capítulo 0.50 & "Extra"'
+    assert extra.viewed and extra.site_id == '1234567'
+    assert [group.title for group in extra.options[0].groups] == [
+        'Traducciones Niño', 'Scan 8',
+    ]
+    assert extra.options[0].date is None
+    assert extra.options[0].chapter_url.endswith('/view_uploads/42')
+
+    assert soup.chapter_images(fixture('viewer.html')) == [
+        f'https://img.visortmo.com/uploads/42/00{page}.webp'
+        for page in (1, 2, 3)
+    ]
@@ -0,0 +1,50 @@
+from src.utils import ratelimit
+from src.utils.ratelimit import HostRateLimiter, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+def fake_time(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(ratelimit.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_the_rate(monkeypatch):
+    clock = fake_time(monkeypatch)
+    bucket = TokenBucket(rate=2, capacity=3)
+
+    assert [bucket.reserve() for _ in range(4)] == [0, 0, 0, 0.5]
+    clock.now += 0.5
+    # The token of the wait was taken already.
+    assert bucket.reserve() == 0.5
+
+
+def test_acquire_sleeps_until_the_token_is_there(monkeypatch):
+    clock = fake_time(monkeypatch)
+    bucket = TokenBucket(rate=1 / 2)
+
+    for _ in range(3):
+        bucket.acquire()
+
+    assert clock.now == 4
+
+
+def test_limiter_keeps_a_bucket_per_host(monkeypatch):
+    fake_time(monkeypatch)
+    limiter = HostRateLimiter(rate=1)
+
+    assert limiter.bucket('https://a.test/x') is limiter.bucket('https://a.test/y')
+    assert limiter.bucket('https://a.test/x').reserve() == 0
+    assert limiter.bucket('https://b.test/x').reserve() == 0
+    assert limiter.bucket('https://a.test/x').reserve() == 1
@@ -0,0 +1,218 @@
+import json
+from urllib.parse import urlsplit
+
+import httpx
+import pytest
+
+from src.utils import resilience
+from src.utils.checkpoint import Checkpoint
+from src.utils.resilience import (CircuitOpenError, ClientError,
+                                  HostCircuitBreakers, RateLimitedError,
+                                  RequestPolicy, RetryBudget, RetryPolicy,
+                                  ServerError)
+from tests.site import Site
+
+URL = 'https://example.com/page'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def fake_time(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, 'monotonic', clock.monotonic)
+    return clock
+
+
+def sender(*responses: httpx.Response):
+    """Get a request answering the responses in turn, the last one
+    again once they run out, and the list of the requests sent."""
+    client = httpx.Client(transport=httpx.MockTransport(
+        lambda request: responses[min(len(sent), len(responses)) - 1],
+    ))
+    sent = []
+
+    def request():
+        sent.append(None)
+        return client.get(URL)
+
+    return request, sent
+
+
+def make_policy(
+    sleeps: list,
+    retry: RetryPolicy = None,
+    budget: RetryBudget = None,
+    breakers: HostCircuitBreakers = None,
+) -> RequestPolicy:
+    return RequestPolicy(retry, budget, breakers, sleep=sleeps.append)
+
+
+def test_retry_waits_the_retry_after_of_the_site():
+    sleeps = []
+    request, sent = sender(
+        httpx.Response(503, headers={'Retry-After': '7'}),
+        httpx.Response(200),
+    )
+
+    assert make_policy(sleeps).send(URL, request).status_code == 200
+    assert sleeps == [7.0]
+    assert len(sent) == 2
+
+
+def test_a_too_long_retry_after_ends_the_request():
+    sleeps = []
+    request, sent = sender(
+        httpx.Response(429, headers={'Retry-After': '3600'}),
+    )
+
+    with pytest.raises(RateLimitedError) as error:
+        make_policy(sleeps).send(URL, request)
+    assert error.value.retry_after == 3600
+    assert sleeps == [] and len(sent) == 1
+
+
+def test_client_errors_are_not_retried():
+    sleeps = []
+    request, sent = sender(httpx.Response(404))
+
+    with pytest.raises(ClientError):
+        make_policy(sleeps).send(URL, request)
+    assert sleeps == [] and len(sent) == 1
+
+
+def test_retries_stop_when_the_budget_is_spent():
+    sleeps = []
+    policy = make_policy(
+        sleeps,
+        retry=RetryPolicy(max_attempts=10, base_delay=0),
+        budget=RetryBudget(ratio=0.5, minimum=2),
+    )
+    request, sent = sender(httpx.Response(503))
+
+    with pytest.raises(ServerError):
+        policy.send(URL, request)
+    assert len(sent) == 3
+
+    # Without tokens a failing request is sent once, successes earn
+    # them back at `ratio` a request.
+    with pytest.raises(ServerError):
+        policy.send(URL, request)
+    assert len(sent) == 4
+    ok, _ = sender(httpx.Response(200))
+    for _ in range(2):
+        policy.send(URL, ok)
+    assert policy.budget.withdraw()
+
+
+def test_circuit_opens_then_probes_the_host(monkeypatch):
+    clock = fake_time(monkeypatch)
+    sleeps = []
+    policy = make_policy(
+        sleeps,
+        retry=RetryPolicy(max_attempts=1),
+        breakers=HostCircuitBreakers(threshold=2, reset_timeout=60),
+    )
+    failing, sent = sender(httpx.Response(500))
+
+    for _ in range(2):
+        with pytest.raises(ServerError):
+            policy.send(URL, failing)
+    with pytest.raises(CircuitOpenError) as error:
+        policy.send(URL, failing)
+    assert error.value.retry_in == 60
+    assert len(sent) == 2
+
+    # Half open: one request probes the host, a failure opens the
+    # circuit again.
+    clock.now = 60
+    with pytest.raises(ServerError):
+        policy.send(URL, failing)
+    with pytest.raises(CircuitOpenError):
+        policy.send(URL, failing)
+    assert len(sent) == 3
+
+    # A probe holds the other requests off until its result, or the
+    # next timeout; a success closes the circuit.
+    clock.now = 120
+    breaker = policy.breakers.breaker('example.com')
+    breaker.allow()
+    ok, _ = sender(httpx.Response(200))
+    with pytest.raises(CircuitOpenError):
+        policy.send(URL, ok)
+    clock.now = 180
+    assert policy.send(URL, ok).status_code == 200
+    assert breaker.failures == 0 and breaker.opened_at is None
+
+
+def test_rate_limits_and_client_errors_do_not_open_the_circuit():
+    sleeps = []
+    policy = make_policy(
+        sleeps,
+        retry=RetryPolicy(max_attempts=1),
+        breakers=HostCircuitBreakers(threshold=2),
+    )
+
+    for status, error in ((429, RateLimitedError), (404, ClientError)):
+        request, _ = sender(httpx.Response(status))
+        for _ in range(3):
+            with pytest.raises(error):
+                policy.send(URL, request)
+    assert policy.breakers.breaker('example.com').opened_at is None
+
+
+def test_checkpoint_resumes_and_ignores_a_cut_line(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+    checkpoint = Checkpoint(path)
+    checkpoint.set('books', ['a', 'b'])
+    checkpoint.mark_done('a', 1)
+    with open(path, 'a') as file:
+        file.write('{"done": "b", "val')
+
+    resumed = Checkpoint(path)
+    assert resumed.resumed
+    assert resumed.get('books') == ['a', 'b']
+    assert resumed.is_done('a') and not resumed.is_done('b')
+
+    resumed.clear()
+    assert not Checkpoint(path).resumed
+
+
+def test_stale_checkpoint_is_dropped(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+    path.write_text(json.dumps({'started': 0}) + '\n{"done": "a"}\n')
+
+    assert not Checkpoint(str(path), max_age=60).resumed
+    assert not path.exists()
+
+
+def test_interrupted_crawl_resumes_from_the_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.utils.manager.random_wait', lambda *_: None)
+    path = str(tmp_path / 'checkpoint.jsonl')
+    site = Site()
+    book_urls = [book.url for book in site.manager().get_listed_books()]
+    paths = [urlsplit(url).path for url in book_urls]
+
+    page = site.page
+    site.page = lambda request: (
+        httpx.Response(500)
+        if request.url.path == paths[1] else
+        page(request)
+    )
+    with pytest.raises(ServerError):
+        site.manager().get_all_books(Checkpoint(path))
+
+    del site.page
+    site.requests.clear()
+    books = site.manager().get_all_books(Checkpoint(path))
+
+    # The lists and the first book come from the checkpoint.
+    assert [request.url.path for request in site.requests] == paths[1:]
+    assert [book.url for book in books] == book_urls
+    assert all(book.chapters for book in books)
+    assert not Checkpoint(path).resumed
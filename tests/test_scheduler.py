@@ -0,0 +1,167 @@
+import threading
+
+from src.books.models import Book, save_books
+from src.books.sync import ChapterDiff, ListDiff
+from src.sync import scheduler as scheduler_module
+from src.sync.scheduler import Account, CrawlScheduler, PollPolicy
+from src.utils import manager as scraper
+from src.utils.resilience import CircuitOpenError
+
+HOUR = 60 * 60
+
+
+def books(account: str, count: int) -> list[scraper.Book]:
+    return [
+        scraper.Book(f'{account} {n}', f'/library/manga/{account}{n}/x', '')
+        for n in range(count)
+    ]
+
+
+def make_scheduler(monkeypatch, listed: dict[str, list], fetch, **kwargs):
+    """Get a scheduler of an account per key of `listed`, on the site
+    given by its last letter, fetching the pages with `fetch`."""
+    monkeypatch.setattr(
+        scheduler_module,
+        'sync_lists',
+        lambda manager, name, policy: ListDiff(books=listed[name]),
+    )
+    monkeypatch.setattr(
+        scheduler_module,
+        'fetch_chapters',
+        lambda manager, book_url: fetch(book_url),
+    )
+    monkeypatch.setattr(
+        scheduler_module,
+        'apply_chapters',
+        lambda book_url, page: ChapterDiff(book_url),
+    )
+    accounts = [
+        Account(name, f'https://{name[-1]}.example.com', None)
+        for name in listed
+    ]
+    return CrawlScheduler(accounts, rate=1000, **kwargs)
+
+
+def test_poll_interval_grows_and_resets():
+    policy = PollPolicy()
+
+    assert policy.next_interval(None, None) == policy.initial_interval
+    interval = policy.initial_interval
+    for _ in range(10):
+        interval = policy.next_interval(interval, False)
+    assert interval == policy.max_interval
+
+    # New chapters bring the book back to frequent checks.
+    for _ in range(10):
+        interval = policy.next_interval(interval, True)
+    assert interval == policy.min_interval
+    assert policy.next_interval(4 * HOUR, None) == 4 * HOUR
+
+
+def test_reschedule_saves_the_next_poll(db):
+    save_books(books('a', 1))
+    url = '/library/manga/a0/x'
+    scheduler = CrawlScheduler([])
+
+    scheduler.reschedule(url, None, now=100)
+    assert Book.get().next_poll == 100 + 3 * HOUR
+    scheduler.reschedule(url, False, now=200)
+    assert (Book.get().poll_interval, Book.get().next_poll) == (
+        6 * HOUR, 200 + 6 * HOUR,
+    )
+    scheduler.reschedule(url, True, now=300)
+    assert Book.get().poll_interval == 3 * HOUR
+
+
+def test_books_not_due_are_not_planned(db):
+    save_books(books('a', 2))
+    Book.update(next_poll=1000).where(
+        Book.url == '/library/manga/a0/x'
+    ).execute()
+    account = Account('a', 'https://a.example.com', None)
+    scheduler = CrawlScheduler([account])
+
+    assert scheduler.plan(account, books('a', 2), now=500) == 1
+    # Once due it is planned, the other book only once.
+    assert scheduler.plan(account, books('a', 2), now=2000) == 1
+
+
+def test_accounts_of_a_site_take_turns(db, monkeypatch):
+    scheduler = make_scheduler(
+        monkeypatch,
+        {'a-x': books('a', 4), 'b-x': books('b', 2)},
+        lambda book_url: book_url,
+        site_concurrency=1,
+    )
+
+    assert [account.name for account, _, _ in scheduler.run()] == [
+        'a-x', 'b-x', 'a-x', 'b-x', 'a-x', 'a-x',
+    ]
+
+
+def test_open_circuit_stops_only_its_account(db, monkeypatch):
+    fetched = []
+
+    def fetch(book_url):
+        fetched.append(book_url)
+        if '/a' in book_url:
+            raise CircuitOpenError('a.example.com', 60)
+        return book_url
+
+    scheduler = make_scheduler(
+        monkeypatch,
+        {'a-x': books('a', 3), 'b-x': books('b', 3)},
+        fetch,
+        site_concurrency=1,
+    )
+
+    synced = [book.url for _, book, _ in scheduler.run()]
+    assert synced == [book.url for book in books('b', 3)]
+    assert list(scheduler.errors) == ['a-x']
+    # The books left of the failing account wait for the next run.
+    assert sum('/a' in url for url in fetched) == 1
+
+
+def test_slow_site_does_not_hold_the_others(db, monkeypatch):
+    release = threading.Event()
+    released = []
+
+    def fetch(book_url):
+        if '/a' in book_url:
+            released.append(release.wait(timeout=5))
+        return book_url
+
+    scheduler = make_scheduler(
+        monkeypatch,
+        {'a-x': books('a', 1), 'b-y': books('b', 3)},
+        fetch,
+        site_concurrency=1,
+    )
+
+    order = []
+    for account, _, _ in scheduler.run():
+        order.append(account.name)
+        if order.count('b-y') == 3:
+            release.set()
+
+    assert order == ['b-y', 'b-y', 'b-y', 'a-x']
+    assert released == [True]
+
+
+def test_failing_lists_skip_the_account(db, monkeypatch):
+    error = CircuitOpenError('x.example.com', 60)
+    scheduler = make_scheduler(
+        monkeypatch,
+        {'a-x': books('a', 1), 'b-x': books('b', 1)},
+        lambda book_url: book_url,
+    )
+
+    def sync_lists(manager, name, policy):
+        if name == 'a-x':
+            raise error
+        return ListDiff(books=books('b', 1))
+
+    monkeypatch.setattr(scheduler_module, 'sync_lists', sync_lists)
+
+    assert [account.name for account, _, _ in scheduler.run()] == ['b-x']
+    assert scheduler.errors == {'a-x': error}
@@ -0,0 +1,71 @@
+import pytest
+
+from src.books.models import (Book, SearchEntry, delete_books, has_search,
+                              save_books, save_chapters)
+from src.books.search import search
+from src.utils import manager as scraper
+
+URL = '/library/manga/1/kimetsu-no-yaiba'
+
+
+def chapter(title: str, *groups: str) -> scraper.Chapter:
+    return scraper.Chapter(title, False, [scraper.Option(
+        tuple(scraper.Group(group, f'/groups/{group}') for group in groups),
+        None,
+        'es',
+        f'/view/{title}',
+    )])
+
+
+@pytest.fixture
+def catalog(db):
+    if not has_search():
+        pytest.skip('SQLite without the FTS5 trigram tokenizer')
+    save_books([scraper.Book('Kimetsu no Yaiba', URL, '', 'Leyendo', [
+        chapter('Capítulo 1: Crueldad', 'Ñandú Scans'),
+        chapter('Capítulo 2: El Dragón', 'Ñandú Scans'),
+    ])])
+
+
+def texts(query: str) -> list[str]:
+    return [result.text for result in search(query)]
+
+
+def test_case_and_accents_are_ignored(catalog):
+    assert texts('DRAGON') == ['Kimetsu no Yaiba - Capítulo 2: El Dragón']
+    assert texts('dragón') == texts('Dragon')
+    assert len(texts('capitulo')) == 2
+    # The groups and the list are searched too.
+    assert len(texts('ñandu')) == 2
+    assert texts('LEYENDO') == ['Kimetsu no Yaiba']
+
+
+def test_words_shorter_than_a_trigram(catalog):
+    assert texts('no') == ['Kimetsu no Yaiba']
+    assert texts('2') == ['Kimetsu no Yaiba - Capítulo 2: El Dragón']
+    assert texts('el 2') == texts('2')
+    # A short word filters what the long ones found.
+    assert texts('capitulo 2') == texts('2')
+    assert texts(' ') == []
+
+
+def test_a_typo_still_finds_the_book(catalog):
+    assert texts('kimetsi')[0] == 'Kimetsu no Yaiba'
+
+
+def test_index_follows_the_saved_books(catalog):
+    save_books([scraper.Book('Demon Slayer', URL, '', 'Leyendo')])
+    assert texts('demon') == ['Demon Slayer']
+    assert texts('kimetsu') == []
+
+    save_chapters(URL, [chapter('Capítulo 3: Rengoku')])
+    assert texts('rengoku') == ['Demon Slayer - Capítulo 3: Rengoku']
+    assert texts('crueldad') == []
+    assert texts('nandu') == []
+
+
+def test_deleted_books_leave_the_index(catalog):
+    delete_books([Book.get(Book.url == URL).id])
+
+    assert texts('kimetsu') == texts('dragon') == []
+    assert SearchEntry.select().count() == 0
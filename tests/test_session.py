@@ -0,0 +1,51 @@
+import json
+from http.cookiejar import Cookie
+
+import httpx
+
+from src.auth.session import Session
+
+
+def session_cookie(value: str, name: str = 'tmo_session') -> Cookie:
+    return Cookie(
+        0, name, value, None, False, 'visortmo.com', True, False,
+        '/', True, True, None, True, None, None, {},
+    )
+
+
+def test_rotated_cookies_are_saved(tmp_path):
+    path = tmp_path / 'cookies.json'
+    session = Session('https://visortmo.com', str(path))
+
+    session.client.cookies.jar.set_cookie(session_cookie('first'))
+    session.on_response(httpx.Response(200, headers={'Set-Cookie': 'x'}))
+    assert [c['value'] for c in json.loads(path.read_text())] == ['first']
+
+    # A session cookie without expiry is kept across launches.
+    assert [
+        cookie.value
+        for cookie in Session('https://visortmo.com', str(path)).client.cookies.jar
+    ] == ['first']
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_only_the_remember_cookie_proves_a_login(tmp_path):
+    session = Session('https://visortmo.com', str(tmp_path / 'cookies.json'))
+
+    # Laravel sets the session cookie for guests too.
+    session.client.cookies.jar.set_cookie(session_cookie('guest'))
+    assert not session.is_logged_in
+
+    session.client.cookies.jar.set_cookie(
+        session_cookie('user', 'remember_web_59ba36'),
+    )
+    assert session.is_logged_in
+
+
+def test_responses_without_cookies_are_not_saved(tmp_path):
+    path = tmp_path / 'cookies.json'
+    session = Session('https://visortmo.com', str(path))
+
+    session.on_response(httpx.Response(200))
+
+    assert not path.exists()
@@ -0,0 +1,74 @@
+import gzip
+import json
+
+import pytest
+
+from src.books.models import load_chapters
+from src.books.snapshot import SnapshotError, import_library
+
+
+def write_snapshot(path, *records: dict):
+    with gzip.open(path, 'wt', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record) + '\n')
+
+
+def test_import_skips_what_a_newer_minor_version_adds(db, tmp_path):
+    path = tmp_path / 'library.jsonl.gz'
+    write_snapshot(
+        path,
+        {'format': 'library', 'version': 1, 'minor': 3},
+        {'group': [1, 'Scans', '/groups/1', 'extra']},
+        {'shelf': ['unknown']},
+        {
+            'book': ['Book', '/library/manga/1/x', '', 'reading',
+                     None, None, None, None, 'extra'],
+            'chapters': [[
+                'Capítulo 1', True, '10',
+                [['2024-01-01', 'es', '/view/1', [1], 'extra']],
+                'extra',
+            ]],
+        },
+    )
+
+    assert import_library(str(path)) == (1, 1)
+    [chapter] = load_chapters('/library/manga/1/x')
+    assert (chapter.title, chapter.viewed, chapter.site_id) == (
+        'Capítulo 1', True, '10',
+    )
+    assert [group.title for group in chapter.options[0].groups] == ['Scans']
+
+
+def test_import_refuses_a_newer_major_version(db, tmp_path):
+    path = tmp_path / 'library.jsonl.gz'
+    write_snapshot(path, {'format': 'library', 'version': 2})
+
+    with pytest.raises(SnapshotError):
+        import_library(str(path))
+
+
+def test_import_commits_each_batch(db, tmp_path, monkeypatch):
+    monkeypatch.setattr('src.books.snapshot.IMPORT_BATCH', 1)
+    path = tmp_path / 'library.jsonl.gz'
+    write_snapshot(
+        path,
+        {'format': 'library', 'version': 1},
+        *(
+            {
+                'book': [f'Book {n}', f'/library/manga/{n}/x', '', 'reading',
+                         None, None, None, None],
+                'chapters': [[f'Capítulo {n}', False, str(n),
+                              [['2024-01-01', 'es', f'/view/{n}', []]]]],
+            }
+            for n in (1, 2)
+        ),
+    )
+    with gzip.open(path, 'at', encoding='utf-8') as file:
+        file.write('{"book": [\n')
+
+    with pytest.raises(ValueError):
+        import_library(str(path))
+    # The batches read before the broken record stay saved.
+    assert [len(load_chapters(f'/library/manga/{n}/x')) for n in (1, 2)] == [
+        1, 1,
+    ]
@@ -0,0 +1,26 @@
+from src.auth import models
+from src.auth.models import User
+from src.common.storage import KeyValue, SqliteStore
+
+
+class Keystore:
+    def __init__(self):
+        self.keys = {}
+
+    def set_key(self, service, key, value):
+        self.keys[service, key] = value
+
+    def get_key(self, service, key):
+        return self.keys[service, key]
+
+
+def test_user_save_is_written_at_once(db, monkeypatch):
+    monkeypatch.setattr(models, 'storage', SqliteStore(delay=60))
+    monkeypatch.setattr(models, 'keystore', Keystore())
+
+    User('reader@example.com', 'secret').save()
+
+    # What another process, the sync service, reads right after.
+    assert [
+        key for key, in KeyValue.select(KeyValue.key).tuples()
+    ] == ['email']
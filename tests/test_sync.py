@@ -0,0 +1,164 @@
+from src.auth.models import User
+from src.books.models import Book, BookList, save_chapters
+from src.books.sync import ListPolicy, apply_lists
+from src.books.viewed import mark_viewed
+from src.sync.scheduler import Account
+from src.sync.service import SyncOptions, SyncService, account_name
+from src.utils import manager as scraper
+from tests.site import BASE_URL, Site
+
+
+READER = User('reader@example.com', 'secret')
+OTHER = User('other@example.com', 'secret')
+
+
+def make_service(
+    site: Site,
+    notified: list,
+    logged_in: list[User] = (READER,),
+) -> SyncService:
+    service = SyncService(
+        SyncOptions(base_url=BASE_URL, rate=1000.0, once=True),
+        [READER, OTHER],
+        notify=lambda book, diff: notified.append((book.url, diff)),
+    )
+    service.login = lambda stack: [
+        Account(account_name(user, BASE_URL), BASE_URL, site.manager())
+        for user in logged_in
+    ]
+    return service
+
+
+def test_first_sync_does_not_notify(db):
+    site = Site()
+    notified = []
+
+    diffs = make_service(site, notified).sync()
+
+    assert len(diffs) == site.library.lists * site.library.pages * 3
+    assert all(diff.first_sync and not diff.new_chapters for diff in diffs)
+    assert notified == []
+    # The poll intervals are not shortened by the chapters just found.
+    assert {
+        interval for interval, in Book.select(Book.poll_interval).tuples()
+    } == {3 * 60 * 60}
+
+
+def test_new_chapter_after_first_sync_notifies(db):
+    site = Site()
+    notified = []
+    make_service(site, notified).sync()
+
+    book_url = Book.select(Book.url).order_by(Book.url).scalar()
+    book_id = book_url.rstrip('/').split('/')[-2]
+    site.chapters[book_id] = site.library.chapters + 1
+    Book.update(next_poll=None).execute()
+    BookList.update(next_check=None).execute()
+
+    make_service(site, notified).sync()
+
+    assert [
+        (url, [chapter.title for chapter in diff.new_chapters])
+        for url, diff in notified
+    ] == [(book_url, ['Capítulo 6.00'])]
+
+
+def test_viewed_states_only_sent_through_the_app_account(db, monkeypatch):
+    flushed = []
+    monkeypatch.setattr(
+        'src.sync.service.flush_viewed',
+        lambda manager, bucket: flushed.append(manager) or 0,
+    )
+
+    make_service(Site(), [], logged_in=[OTHER]).sync()
+    assert flushed == []
+
+    make_service(Site(), [], logged_in=[OTHER, READER]).sync()
+    assert len(flushed) == 1
+
+
+STATES = {'reading': '/lists/reading', 'pending': '/lists/pending'}
+
+
+def listed(*numbers: int, name: str = 'reading') -> list[scraper.Book]:
+    return [
+        scraper.Book(f'Book {number}', f'/library/manga/{number}/x', '', name)
+        for number in numbers
+    ]
+
+
+def check(
+    reading: list, pending: list = (), now: float = 0.0, account: str = '',
+):
+    return apply_lists(
+        account,
+        STATES,
+        {'/lists/reading': reading, '/lists/pending': list(pending)},
+        ListPolicy(),
+        now,
+    )
+
+
+def stored_urls() -> list[str]:
+    return [url for url, in Book.select(Book.url).order_by(Book.url).tuples()]
+
+
+def test_book_deleted_when_missing_at_two_checks(db):
+    check(listed(1, 2, 3), now=1)
+
+    assert check(listed(1, 2), now=2).removed == []
+    assert len(stored_urls()) == 3
+    assert check(listed(1, 2), now=3).removed == ['/library/manga/3/x']
+    assert stored_urls() == ['/library/manga/1/x', '/library/manga/2/x']
+
+
+def test_book_listed_again_is_not_deleted(db):
+    check(listed(1, 2, 3), now=1)
+    check(listed(1, 2), now=2)
+    check(listed(1, 2, 3), now=3)
+
+    assert check(listed(1, 2, 3), now=4).removed == []
+    assert Book.get(Book.url == '/library/manga/3/x').missing_since is None
+
+
+def test_book_with_viewed_changes_to_send_is_kept(db):
+    check(listed(1, 2, 3), now=1)
+    save_chapters('/library/manga/3/x', [
+        scraper.Chapter('Capítulo 1', False, [], site_id='1'),
+    ])
+    mark_viewed('/library/manga/3/x', ['Capítulo 1'])
+
+    check(listed(1, 2), now=2)
+    assert check(listed(1, 2), now=3).removed == []
+    assert len(stored_urls()) == 3
+
+
+def test_books_of_an_emptied_list_are_kept(db):
+    check(listed(1, 2), listed(3, name='pending'), now=1)
+
+    for now in (2, 3):
+        assert check([], listed(3, name='pending'), now=now).removed == []
+    assert len(stored_urls()) == 3
+
+
+def test_book_moved_between_lists_is_changed(db):
+    check(listed(1, 2), now=1)
+    Book.update(next_poll=10).execute()
+
+    diff = check(listed(1), listed(2, name='pending'), now=2)
+    assert diff.changed == ['/library/manga/2/x']
+    assert Book.get(Book.url == '/library/manga/1/x').next_poll == 10
+    assert Book.get(Book.url == '/library/manga/2/x').next_poll is None
+
+
+def test_accounts_listing_a_book_differently_do_not_reset_it(db):
+    check(listed(1), now=1, account='a')
+    check([], listed(1, name='pending'), now=1, account='b')
+    Book.update(next_poll=10).execute()
+
+    for now in (2, 3):
+        assert check(listed(1), now=now, account='a').changed == []
+        assert check(
+            [], listed(1, name='pending'), now=now, account='b',
+        ).changed == []
+    assert Book.get().next_poll == 10
@@ -0,0 +1,54 @@
+import pytest
+
+from src.books.models import ViewedChange, save_chapters
+from src.books.viewed import flush_viewed, mark_viewed
+from src.utils.manager import Chapter
+from src.utils.ratelimit import TokenBucket
+from src.utils.resilience import AuthError, ClientError
+
+BOOK_URL = 'https://example.com/library/manga/1/book'
+
+
+class FakeManager:
+    def __init__(self, errors: dict[str, Exception]):
+        self.errors = errors
+        self.calls: list[str] = []
+
+    def set_chapter_viewed(self, site_id: str, viewed: bool = True):
+        self.calls.append(site_id)
+        if site_id in self.errors:
+            raise self.errors[site_id]
+
+
+@pytest.fixture
+def queued(db):
+    save_chapters(BOOK_URL, [
+        Chapter(f'Capítulo {number}', False, [], site_id=str(number))
+        for number in range(3, 0, -1)
+    ])
+    for number in (1, 2, 3):
+        mark_viewed(BOOK_URL, [f'Capítulo {number}'])
+
+
+def unlimited() -> TokenBucket:
+    return TokenBucket(1000, 1000)
+
+
+def test_refused_change_is_tried_once_per_flush(queued):
+    manager = FakeManager({'1': ClientError('/viewed/1', 422)})
+
+    assert flush_viewed(manager, unlimited(), batch_size=1) == 2
+    assert manager.calls == ['1', '2', '3']
+    assert [change.attempts for change in ViewedChange.select()] == [1]
+
+
+def test_auth_error_stops_the_flush_and_keeps_the_queue(queued):
+    manager = FakeManager({'2': AuthError('/viewed/2', 419)})
+
+    with pytest.raises(AuthError):
+        flush_viewed(manager, unlimited())
+    assert manager.calls == ['1', '2']
+    assert [
+        (change.chapter.site_id, change.attempts)
+        for change in ViewedChange.select()
+    ] == [('2', 0), ('3', 0)]
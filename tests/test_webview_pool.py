@@ -0,0 +1,39 @@
+from src.utils.webview_pool import FakeWebViewBackend, WebViewPool
+
+
+def fake_pool(**kwargs) -> WebViewPool:
+    return WebViewPool(
+        FakeWebViewBackend(0, 0, 0, page_bytes=1024),
+        **kwargs,
+    )
+
+
+def test_open_configures_a_preloaded_view():
+    pool = fake_pool()
+    pool.preload('/next', lambda view: view.update(settings='preload'))
+
+    view = pool.open('/next', lambda view: view.update(settings='open'))
+
+    assert view['settings'] == 'open'
+    assert pool.backend.calls.count(('load', '/next')) == 1
+
+
+def test_trim_cache_clears_through_a_hidden_view():
+    pool = fake_pool(max_cache_bytes=1024, cache_check_interval=0)
+    for url in ('/a', '/b'):
+        pool.close(pool.open(url))
+
+    assert pool.cache_check_due()
+    pool.trim_cache(pool.backend.cache_size())
+
+    assert ('clear_cache', None) in pool.backend.calls
+    assert not pool.backend.cache
+
+
+def test_trim_cache_keeps_a_small_cache():
+    pool = fake_pool(max_cache_bytes=4096)
+    pool.close(pool.open('/a'))
+
+    pool.trim_cache(pool.backend.cache_size())
+
+    assert pool.backend.cache == {'/a'}